@@ -0,0 +1,209 @@
+import threading
+import typing
+
+import numpy as np
+from bosdyn.api import image_pb2
+from bosdyn.client.frame_helpers import BODY_FRAME_NAME, get_a_tform_b
+
+from .image_decoding import DecodedImage, UnsupportedImageFormatError, decode_image
+
+
+def frame_tform_image_sensor(image: DecodedImage, frame_name: str) -> np.ndarray:
+    """Return the 4x4 transform from the image sensor frame of an image to another frame, at the time the image was
+    captured.
+
+    Args:
+        image: The decoded image
+        frame_name: Name of the frame in the transforms snapshot of the image, such as "body" or "odom"
+
+    Raises:
+        ValueError: The transforms snapshot has no path between the two frames
+    """
+    frame_tform_sensor = get_a_tform_b(
+        image.transforms_snapshot, frame_name, image.frame_name_image_sensor
+    )
+    if frame_tform_sensor is None:
+        raise ValueError(
+            f"No transform from {image.frame_name_image_sensor} to {frame_name} in the snapshot of "
+            f"{image.source_name}"
+        )
+    return frame_tform_sensor.to_matrix()
+
+
+class DepthProjector:
+    """Projects depth images to point clouds with NumPy.
+
+    The direction of the ray through each pixel, divided by the depth scale, only depends on the source, the resolution
+    and the intrinsics of the camera. It is computed once for each such combination and cached, so projecting a frame
+    takes a single multiplication of the rays by the raw depth values.
+    """
+
+    def __init__(self):
+        self._rays: typing.Dict[typing.Tuple, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _get_rays(self, image: DecodedImage) -> np.ndarray:
+        rows, cols = image.data.shape[:2]
+        key = (image.source_name, rows, cols, image.intrinsics, image.depth_scale)
+        rays = self._rays.get(key)
+        if rays is None:
+            intrinsics = image.intrinsics
+            v, u = np.mgrid[0:rows, 0:cols].astype(np.float32)
+            rays = np.empty((rows * cols, 3), dtype=np.float32)
+            rays[:, 0] = ((u - intrinsics.cx) / intrinsics.fx).ravel()
+            rays[:, 1] = ((v - intrinsics.cy) / intrinsics.fy).ravel()
+            rays[:, 2] = 1.0
+            rays /= image.depth_scale
+            with self._lock:
+                rays = self._rays.setdefault(key, rays)
+        return rays
+
+    def clear_cache(self):
+        """Forget the cached rays, for example after the cameras were recalibrated"""
+        with self._lock:
+            self._rays = {}
+
+    def project(
+        self,
+        image: DecodedImage,
+        frame_name: typing.Optional[str] = BODY_FRAME_NAME,
+        min_range: float = 0.0,
+        max_range: float = np.inf,
+    ) -> np.ndarray:
+        """Project a depth image to a point cloud.
+
+        Args:
+            image: Decoded depth image, such as from SpotImages.get_decoded_depth_images
+            frame_name: Frame to express the points in, such as "body" or "odom". If None, the points are expressed in
+                        the image sensor frame.
+            min_range: Pixels with a depth below this many meters are dropped
+            max_range: Pixels with a depth above this many meters are dropped
+
+        Returns:
+            Array of shape (N, 3) and type float32 holding a point for each pixel with a valid depth
+
+        Raises:
+            UnsupportedImageFormatError: The image is not a depth image or its source has no pinhole model
+            ValueError: The transforms snapshot has no path from the image sensor frame to frame_name
+        """
+        if not image.is_depth or image.intrinsics is None:
+            raise UnsupportedImageFormatError(
+                f"Cannot project {image.source_name}: it is not a depth image with pinhole intrinsics"
+            )
+        depth = image.data.reshape(-1)
+        # A raw depth of 0 means that there is no measurement
+        valid = depth > 0
+        if min_range > 0.0:
+            valid &= depth >= min_range * image.depth_scale
+        if max_range != np.inf:
+            valid &= depth <= max_range * image.depth_scale
+        indices = np.flatnonzero(valid)
+        points = self._get_rays(image).take(indices, axis=0)
+        points *= depth.take(indices)[:, np.newaxis]
+        if frame_name is not None:
+            transform = frame_tform_image_sensor(image, frame_name).astype(np.float32)
+            points = points @ transform[:3, :3].T
+            points += transform[:3, 3]
+        return points
+
+    def project_bundle(
+        self,
+        bundle: typing.Iterable[DecodedImage],
+        frame_name: typing.Optional[str] = BODY_FRAME_NAME,
+        min_range: float = 0.0,
+        max_range: float = np.inf,
+    ) -> typing.Dict[str, np.ndarray]:
+        """Project every depth image of a decoded bundle to a point cloud.
+
+        Args:
+            bundle: Bundle of DecodedImage objects, such as from SpotImages.get_decoded_depth_images
+            frame_name: Frame to express the points in. If None, each cloud is in the frame of its image sensor.
+            min_range: Pixels with a depth below this many meters are dropped
+            max_range: Pixels with a depth above this many meters are dropped
+
+        Returns:
+            Point cloud of each image, keyed by source name
+        """
+        return {
+            image.source_name: self.project(image, frame_name, min_range, max_range)
+            for image in bundle
+        }
+
+
+"""Projector used by fuse_depth_images when none is given, so the rays are cached across calls in each process"""
+_DEFAULT_PROJECTOR = DepthProjector()
+
+"""Bits used for each axis of the voxel index when hashing voxels into a single integer"""
+_VOXEL_INDEX_BITS = 21
+
+
+def voxel_downsample(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """Downsample a point cloud to at most one point per voxel, the centroid of the points in the voxel.
+
+    Voxels are identified by hashing their integer indices into a single int64, so the points are grouped with one
+    sort. Indices must fit in 21 bits per axis, which covers +/- 10 km at a voxel size of 1 cm.
+
+    Args:
+        points: Array of shape (N, 3)
+        voxel_size: Edge length of the voxels in the units of the points
+
+    Returns:
+        Array of shape (M, 3) and type float32, ordered by voxel
+    """
+    if voxel_size <= 0.0:
+        raise ValueError("The voxel size must be positive")
+    if len(points) == 0:
+        return np.empty((0, 3), dtype=np.float32)
+    offset = 1 << (_VOXEL_INDEX_BITS - 1)
+    indices = np.floor(points / voxel_size).astype(np.int64) + offset
+    keys = (
+        indices[:, 0] << (2 * _VOXEL_INDEX_BITS)
+        | indices[:, 1] << _VOXEL_INDEX_BITS
+        | indices[:, 2]
+    )
+    _, voxel_of_point, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    voxel_of_point = voxel_of_point.reshape(-1)
+    centroids = np.empty((len(counts), 3), dtype=np.float32)
+    for axis in range(3):
+        centroids[:, axis] = (
+            np.bincount(voxel_of_point, weights=points[:, axis], minlength=len(counts))
+            / counts
+        )
+    return centroids
+
+
+def fuse_depth_images(
+    bundle: typing.Iterable[image_pb2.ImageResponse],
+    frame_name: str = BODY_FRAME_NAME,
+    voxel_size: typing.Optional[float] = 0.05,
+    min_range: float = 0.0,
+    max_range: float = np.inf,
+    projector: typing.Optional[DepthProjector] = None,
+) -> np.ndarray:
+    """Merge the depth images of several cameras into a single point cloud.
+
+    This is a module level function so that it can be run on a worker process, in which case the bundle is sent as
+    image responses and decoded by the worker.
+
+    Args:
+        bundle: Depth image responses, such as a bundle returned by SpotImages.get_depth_images. Responses which were
+                already decoded into DecodedImage objects are also accepted.
+        frame_name: Frame to express the points in, such as "body" or "odom"
+        voxel_size: Edge length in meters of the voxels the cloud is downsampled to. If None, it is not downsampled.
+        min_range: Pixels with a depth below this many meters are dropped
+        max_range: Pixels with a depth above this many meters are dropped
+        projector: Projector to use. Defaults to a projector shared by all calls in the process.
+
+    Returns:
+        Array of shape (N, 3) and type float32
+    """
+    projector = projector or _DEFAULT_PROJECTOR
+    clouds = []
+    for image in bundle:
+        if isinstance(image, image_pb2.ImageResponse):
+            image = decode_image(image)
+        clouds.append(projector.project(image, frame_name, min_range, max_range))
+    points = np.concatenate(clouds) if clouds else np.empty((0, 3), np.float32)
+    if voxel_size is not None:
+        points = voxel_downsample(points, voxel_size)
+    return points
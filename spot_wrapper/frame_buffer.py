@@ -0,0 +1,251 @@
+import bisect
+import logging
+import typing
+
+from bosdyn.api import image_pb2
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from .image_decoding import (
+    DecodedImage,
+    ImageDecodeError,
+    UnsupportedImageFormatError,
+    decode_image,
+)
+
+"""A frame and the local time in seconds at which it was acquired"""
+StampedFrame = typing.Tuple[float, typing.Any]
+
+
+class _StampSequence:
+    """Read-only sequence of the stamps of a range of frames in a FrameRingBuffer, so they can be searched with
+    bisect without copying them"""
+
+    def __init__(self, stamps: typing.List[float], first: int, length: int):
+        self._stamps = stamps
+        self._first = first
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> float:
+        return self._stamps[(self._first + index) % len(self._stamps)]
+
+
+class FrameRingBuffer:
+    """Fixed-capacity buffer of the most recent frames of one source, ordered by acquisition time.
+
+    The slots are allocated once, so memory stays bounded by the capacity. Frames are added by a single producer and
+    read by any number of threads without a lock: the producer fills a slot before publishing it by incrementing the
+    frame count, and a reader checks after reading that the producer has not lapped the slots it used, retrying if it
+    did. Producers must therefore be serialized, which is the case for frames added by the periodic tasks.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Number of frames to keep
+        """
+        if capacity < 1:
+            raise ValueError("The capacity of a frame buffer must be at least 1")
+        self._capacity = capacity
+        # One spare slot is kept for the producer to write into while readers use the others
+        self._stamps: typing.List[float] = [0.0] * (capacity + 1)
+        self._frames: typing.List[typing.Any] = [None] * (capacity + 1)
+        self._count = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return min(self._count, self._capacity)
+
+    def push(self, stamp: float, frame: typing.Any) -> bool:
+        """Add a frame. Frames which are not newer than the latest frame are dropped.
+
+        Args:
+            stamp: Local time in seconds at which the frame was acquired
+            frame: The frame
+
+        Returns:
+            True if the frame was added
+        """
+        count = self._count
+        slots = len(self._stamps)
+        if count and stamp <= self._stamps[(count - 1) % slots]:
+            return False
+        slot = count % slots
+        self._frames[slot] = frame
+        self._stamps[slot] = stamp
+        self._count = count + 1
+        return True
+
+    def _readable(self) -> typing.Tuple[int, int]:
+        # First readable frame index and number of readable frames
+        count = self._count
+        first = max(0, count - self._capacity)
+        return first, count - first
+
+    def _is_intact(self, first_used: int) -> bool:
+        # The producer overwrites the slot of frame index i while writing frame index i + len(slots)
+        return first_used > self._count - len(self._stamps)
+
+    def _read(self, index: int) -> StampedFrame:
+        slot = index % len(self._stamps)
+        return self._stamps[slot], self._frames[slot]
+
+    def latest(self) -> typing.Optional[StampedFrame]:
+        """Return the most recent frame and its stamp, or None if the buffer is empty"""
+        while True:
+            first, length = self._readable()
+            if length == 0:
+                return None
+            stamped_frame = self._read(first + length - 1)
+            if self._is_intact(first + length - 1):
+                return stamped_frame
+
+    def nearest(
+        self, stamp: float, max_delta: typing.Optional[float] = None
+    ) -> typing.Optional[StampedFrame]:
+        """Return the frame acquired closest to a time.
+
+        Args:
+            stamp: Local time in seconds
+            max_delta: If set, only return a frame acquired within this many seconds of the time
+
+        Returns:
+            The frame and its stamp, or None if there is no such frame
+        """
+        while True:
+            first, length = self._readable()
+            if length == 0:
+                return None
+            position = bisect.bisect_left(
+                _StampSequence(self._stamps, first, length), stamp
+            )
+            candidates = [
+                self._read(first + index)
+                for index in (position - 1, position)
+                if 0 <= index < length
+            ]
+            if not self._is_intact(first):
+                continue
+            nearest = min(candidates, key=lambda candidate: abs(candidate[0] - stamp))
+            if max_delta is not None and abs(nearest[0] - stamp) > max_delta:
+                return None
+            return nearest
+
+    def between(self, start: float, end: float) -> typing.List[StampedFrame]:
+        """Return the frames acquired between two times, inclusive, oldest first.
+
+        Args:
+            start: Local time in seconds
+            end: Local time in seconds
+        """
+        while True:
+            first, length = self._readable()
+            stamps = _StampSequence(self._stamps, first, length)
+            begin = bisect.bisect_left(stamps, start)
+            stop = bisect.bisect_right(stamps, end, lo=begin)
+            frames = [self._read(first + index) for index in range(begin, stop)]
+            if self._is_intact(first):
+                return frames
+
+
+class ImageFrameBuffers:
+    """A FrameRingBuffer of decoded images for each image source, keyed by source name.
+
+    Acquisition times are converted from robot time to local time when the images are added, so the buffers can be
+    queried with local times such as those of other sensors.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        robot_to_local_time: typing.Callable[[Timestamp], Timestamp],
+        logger: logging.Logger,
+    ):
+        """
+        Args:
+            capacity: Number of frames to keep for each image source
+            robot_to_local_time: Function converting a robot timestamp to a local timestamp, such as
+                                 SpotWrapper.robotToLocalTime
+            logger: Logger object
+        """
+        self._capacity = capacity
+        self._robot_to_local_time = robot_to_local_time
+        self._logger = logger
+        self._buffers: typing.Dict[str, FrameRingBuffer] = {}
+        # Sources whose images cannot be decoded because of their format, which is only logged once per source
+        self._unsupported_sources: typing.Set[str] = set()
+
+    @property
+    def sources(self) -> typing.List[str]:
+        """Names of the image sources which have a buffer"""
+        return list(self._buffers)
+
+    def buffer(self, source_name: str) -> typing.Optional[FrameRingBuffer]:
+        """Return the buffer of an image source, or None if no image has been received from it"""
+        return self._buffers.get(source_name)
+
+    def add_image(self, image_response: image_pb2.ImageResponse) -> bool:
+        """Decode an image response and add it to the buffer of its source.
+
+        Images which cannot be decoded are dropped. Images of a source in an unsupported format, such as JPEG
+        images without OpenCV, are only logged for the first image of the source.
+
+        Returns:
+            True if the image was added
+        """
+        try:
+            decoded = decode_image(image_response)
+        except UnsupportedImageFormatError as e:
+            source_name = image_response.source.name
+            if source_name not in self._unsupported_sources:
+                self._unsupported_sources.add(source_name)
+                self._logger.error(f"Cannot buffer images of {source_name}: {e}")
+            return False
+        except ImageDecodeError as e:
+            self._logger.error(f"Dropped an image of {image_response.source.name}: {e}")
+            return False
+        local_time = self._robot_to_local_time(decoded.acquisition_time)
+        buffer = self._buffers.get(decoded.source_name)
+        if buffer is None:
+            buffer = self._buffers.setdefault(
+                decoded.source_name, FrameRingBuffer(self._capacity)
+            )
+        return buffer.push(local_time.seconds + local_time.nanos * 1e-9, decoded)
+
+    def add_images(self, image_responses: typing.Iterable[image_pb2.ImageResponse]):
+        """Decode and add several image responses, such as those of an ImageBundle"""
+        for image_response in image_responses:
+            self.add_image(image_response)
+
+    def nearest(
+        self, source_name: str, stamp: float, max_delta: typing.Optional[float] = None
+    ) -> typing.Optional[DecodedImage]:
+        """Return the image of a source acquired closest to a local time.
+
+        Args:
+            source_name: Name of the image source
+            stamp: Local time in seconds
+            max_delta: If set, only return an image acquired within this many seconds of the time
+
+        Returns:
+            The decoded image, or None if there is no such image
+        """
+        buffer = self._buffers.get(source_name)
+        if buffer is None:
+            return None
+        stamped_frame = buffer.nearest(stamp, max_delta)
+        return stamped_frame[1] if stamped_frame is not None else None
+
+    def between(
+        self, source_name: str, start: float, end: float
+    ) -> typing.List[DecodedImage]:
+        """Return the images of a source acquired between two local times, inclusive, oldest first"""
+        buffer = self._buffers.get(source_name)
+        if buffer is None:
+            return []
+        return [frame for _, frame in buffer.between(start, end)]
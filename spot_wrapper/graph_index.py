@@ -0,0 +1,208 @@
+import typing
+
+from bosdyn.api.graph_nav import map_pb2
+
+
+def id_to_short_code(waypoint_id: str) -> typing.Optional[str]:
+    """Convert a unique id to a 2 letter short code."""
+    tokens = waypoint_id.split("-")
+    if len(tokens) > 2:
+        return f"{tokens[0][0]}{tokens[1][0]}"
+    return None
+
+
+class GraphIndex:
+    """Lookup tables over a graph nav graph, so that resolving waypoints and matching edges do not scan the graph.
+
+    The index holds the waypoints, edges and waypoint anchors by id, the edges between each unordered pair of
+    waypoints, the neighbours of each waypoint, the waypoints with each short code and the waypoints with each
+    annotation name. It is built once when a graph is downloaded or uploaded, and update applies only the differences
+    with the indexed graph.
+
+    The version is incremented whenever the index changes, so that results computed from the graph can be cached
+    until it changes.
+    """
+
+    def __init__(self, graph: typing.Optional[map_pb2.Graph] = None):
+        """
+        Args:
+            graph: Graph to index, if any
+        """
+        self.version = 0
+        self._waypoints: typing.Dict[str, map_pb2.Waypoint] = {}
+        self._edges: typing.Dict[typing.Tuple[str, str], map_pb2.Edge] = {}
+        self._edges_by_pair: typing.Dict[
+            typing.FrozenSet[str], typing.List[typing.Tuple[str, str]]
+        ] = {}
+        self._neighbours: typing.Dict[str, typing.Set[str]] = {}
+        self._ids_by_short_code: typing.Dict[str, typing.Set[str]] = {}
+        self._ids_by_name: typing.Dict[str, typing.Set[str]] = {}
+        self._anchors: typing.Dict[str, map_pb2.Anchor] = {}
+        if graph is not None:
+            self.update(graph)
+
+    def __len__(self) -> int:
+        return len(self._waypoints)
+
+    @property
+    def waypoints(self) -> typing.Dict[str, map_pb2.Waypoint]:
+        """Return the waypoints by id. The dictionary must not be modified."""
+        return self._waypoints
+
+    @property
+    def edges(self) -> typing.Dict[typing.Tuple[str, str], map_pb2.Edge]:
+        """Return the edges by (from_waypoint, to_waypoint). The dictionary must not be modified."""
+        return self._edges
+
+    @property
+    def anchors(self) -> typing.Dict[str, map_pb2.Anchor]:
+        """Return the anchors of the waypoints in the seed frame by waypoint id. The dictionary must not be modified."""
+        return self._anchors
+
+    def add_waypoint(self, waypoint: map_pb2.Waypoint):
+        """Add a waypoint, replacing the waypoint with the same id"""
+        if waypoint.id in self._waypoints:
+            self.remove_waypoint(waypoint.id, keep_edges=True)
+        self._waypoints[waypoint.id] = waypoint
+        self._neighbours.setdefault(waypoint.id, set())
+        short_code = id_to_short_code(waypoint.id)
+        if short_code is not None:
+            self._ids_by_short_code.setdefault(short_code, set()).add(waypoint.id)
+        name = waypoint.annotations.name
+        if name:
+            self._ids_by_name.setdefault(name, set()).add(waypoint.id)
+        self.version += 1
+
+    def remove_waypoint(self, waypoint_id: str, keep_edges: bool = False):
+        """Remove a waypoint and, unless keep_edges is set, the edges to and from it"""
+        waypoint = self._waypoints.pop(waypoint_id, None)
+        if waypoint is None:
+            return
+        if not keep_edges:
+            for neighbour in list(self._neighbours.get(waypoint_id, ())):
+                for edge_key in list(
+                    self._edges_by_pair.get(frozenset((waypoint_id, neighbour)), ())
+                ):
+                    self.remove_edge(*edge_key)
+            self._neighbours.pop(waypoint_id, None)
+        short_code = id_to_short_code(waypoint_id)
+        if short_code is not None:
+            self._discard(self._ids_by_short_code, short_code, waypoint_id)
+        if waypoint.annotations.name:
+            self._discard(self._ids_by_name, waypoint.annotations.name, waypoint_id)
+        self.version += 1
+
+    def add_edge(self, edge: map_pb2.Edge):
+        """Add an edge, replacing the edge with the same id"""
+        key = (edge.id.from_waypoint, edge.id.to_waypoint)
+        if key not in self._edges:
+            self._edges_by_pair.setdefault(frozenset(key), []).append(key)
+            self._neighbours.setdefault(key[0], set()).add(key[1])
+            self._neighbours.setdefault(key[1], set()).add(key[0])
+        self._edges[key] = edge
+        self.version += 1
+
+    def remove_edge(self, from_waypoint: str, to_waypoint: str):
+        key = (from_waypoint, to_waypoint)
+        if self._edges.pop(key, None) is None:
+            return
+        pair = frozenset(key)
+        self._edges_by_pair[pair].remove(key)
+        if not self._edges_by_pair[pair]:
+            del self._edges_by_pair[pair]
+            self._discard(self._neighbours, from_waypoint, to_waypoint)
+            self._discard(self._neighbours, to_waypoint, from_waypoint)
+        self.version += 1
+
+    @staticmethod
+    def _discard(index: typing.Dict[str, typing.Set[str]], key: str, value: str):
+        values = index.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del index[key]
+
+    def update(self, graph: map_pb2.Graph):
+        """Make the index match a graph, only adding, replacing and removing the waypoints and edges which differ.
+
+        The index keeps the messages of the graph rather than copies, so the graph must not be modified afterwards.
+        Changes must come as a new graph, such as a newly downloaded one.
+        """
+        waypoints = {waypoint.id: waypoint for waypoint in graph.waypoints}
+        for waypoint_id in [i for i in self._waypoints if i not in waypoints]:
+            self.remove_waypoint(waypoint_id)
+        for waypoint_id, waypoint in waypoints.items():
+            if self._waypoints.get(waypoint_id) != waypoint:
+                self.add_waypoint(waypoint)
+
+        edges = {
+            (edge.id.from_waypoint, edge.id.to_waypoint): edge for edge in graph.edges
+        }
+        for key in [key for key in self._edges if key not in edges]:
+            self.remove_edge(*key)
+        for key, edge in edges.items():
+            if self._edges.get(key) != edge:
+                self.add_edge(edge)
+
+        anchors = {anchor.id: anchor for anchor in graph.anchoring.anchors}
+        if anchors != self._anchors:
+            self._anchors = anchors
+            self.version += 1
+
+    def clear(self):
+        self.update(map_pb2.Graph())
+
+    def neighbours(self, waypoint_id: str) -> typing.Set[str]:
+        """Return the ids of the waypoints sharing an edge with a waypoint. The set must not be modified."""
+        return self._neighbours.get(waypoint_id, set())
+
+    def match_edge(
+        self, waypoint1: str, waypoint2: str
+    ) -> typing.Optional[map_pb2.Edge.Id]:
+        """Return the id of an edge between two waypoints in either direction, or None"""
+        keys = self._edges_by_pair.get(frozenset((waypoint1, waypoint2)))
+        if not keys:
+            return None
+        return map_pb2.Edge.Id(from_waypoint=keys[0][0], to_waypoint=keys[0][1])
+
+    def ids_with_short_code(self, short_code: str) -> typing.Set[str]:
+        """Return the ids of the waypoints with a short code. The set must not be modified."""
+        return self._ids_by_short_code.get(short_code, set())
+
+    def ids_with_name(self, name: str) -> typing.Set[str]:
+        """Return the ids of the waypoints with an annotation name. The set must not be modified."""
+        return self._ids_by_name.get(name, set())
+
+    def name_to_id(self) -> typing.Dict[str, typing.Optional[str]]:
+        """Return the waypoint id of each annotation name, or None for names used by several waypoints"""
+        return {
+            name: next(iter(ids)) if len(ids) == 1 else None
+            for name, ids in self._ids_by_name.items()
+        }
+
+    def edges_by_destination(self) -> typing.Dict[str, typing.List[str]]:
+        """Return the ids of the waypoints with an edge to each waypoint, keyed by waypoint id"""
+        edges: typing.Dict[str, typing.List[str]] = {}
+        for from_waypoint, to_waypoint in self._edges:
+            edges.setdefault(to_waypoint, []).append(from_waypoint)
+        return edges
+
+    def find_unique_waypoint_id(self, short_code: str) -> typing.Optional[str]:
+        """Convert either a 2 letter short code or an annotation name into the associated unique id.
+
+        Anything else is assumed to be a waypoint id and returned as is, as is a short code which is not unique.
+
+        Returns:
+            The waypoint id, or None if the annotation name is used by several waypoints
+        """
+        if len(short_code) != 2:
+            ids = self._ids_by_name.get(short_code)
+            if not ids:
+                return short_code
+            if len(ids) > 1:
+                return None
+            return next(iter(ids))
+        ids = self._ids_by_short_code.get(short_code)
+        if ids is None or len(ids) != 1:
+            return short_code
+        return next(iter(ids))
@@ -0,0 +1,205 @@
+import collections
+import heapq
+import math
+import threading
+import typing
+
+from bosdyn.api.graph_nav import map_pb2
+
+from .graph_index import GraphIndex
+
+"""Number of planned routes kept by a RoutePlanner"""
+ROUTE_CACHE_SIZE = 1024
+
+
+class NoRouteError(Exception):
+    """Raised when there is no route between two waypoints of the graph"""
+
+
+def edge_cost(edge: map_pb2.Edge) -> float:
+    """Return the cost of traversing an edge, in either direction.
+
+    Like the planner of the robot, this is the cost annotation of the edge if it is set, and otherwise the length of the
+    edge.
+    """
+    annotations = edge.annotations
+    if annotations.HasField("cost"):
+        return annotations.cost.value
+    position = edge.from_tform_to.position
+    return math.sqrt(position.x**2 + position.y**2 + position.z**2)
+
+
+class RoutePlanner:
+    """Plans the shortest routes between the waypoints of a graph, without asking the robot.
+
+    Routes are planned with A* over the edges of the graph index, weighted by edge_cost. When every waypoint is
+    anchored, the heuristic is the straight line distance between the anchors of the waypoints, scaled down so that it
+    never exceeds the cost of a route. Otherwise it is zero, and A* is Dijkstra's algorithm.
+
+    The weighted adjacency lists and the routes planned are cached until the version of the index changes. Routes can
+    be planned from several threads.
+    """
+
+    def __init__(self, index: GraphIndex, cache_size: int = ROUTE_CACHE_SIZE):
+        """
+        Args:
+            index: Index of the graph to plan routes in, which is updated with the graph
+            cache_size: Number of routes to cache
+        """
+        self._index = index
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._version: typing.Optional[int] = None
+        self._adjacency: typing.Dict[str, typing.List[typing.Tuple[str, float]]] = {}
+        self._positions: typing.Optional[
+            typing.Dict[str, typing.Tuple[float, float, float]]
+        ] = None
+        self._heuristic_scale = 0.0
+        self._routes: typing.OrderedDict[
+            typing.Tuple[str, str], typing.Tuple[str, ...]
+        ] = collections.OrderedDict()
+
+    def _refresh(self):
+        # Must be called with the lock held
+        if self._version == self._index.version:
+            return
+        self._version = self._index.version
+        self._routes.clear()
+        self._adjacency = {waypoint_id: [] for waypoint_id in self._index.waypoints}
+        costs = {key: edge_cost(edge) for key, edge in self._index.edges.items()}
+        for (from_waypoint, to_waypoint), cost in costs.items():
+            self._adjacency.setdefault(from_waypoint, []).append((to_waypoint, cost))
+            self._adjacency.setdefault(to_waypoint, []).append((from_waypoint, cost))
+
+        anchors = self._index.anchors
+        self._positions = None
+        if self._adjacency and all(
+            waypoint_id in anchors for waypoint_id in self._adjacency
+        ):
+            self._positions = {}
+            for waypoint_id, anchor in anchors.items():
+                position = anchor.seed_tform_waypoint.position
+                self._positions[waypoint_id] = (position.x, position.y, position.z)
+            # The heuristic must not exceed the cost of any edge, or the routes found may not be the shortest
+            self._heuristic_scale = math.inf
+            for (from_waypoint, to_waypoint), cost in costs.items():
+                distance = math.dist(
+                    self._positions[from_waypoint], self._positions[to_waypoint]
+                )
+                if distance > 0.0:
+                    self._heuristic_scale = min(self._heuristic_scale, cost / distance)
+            if not math.isfinite(self._heuristic_scale):
+                self._heuristic_scale = 0.0
+
+    def plan(self, start: str, goal: str) -> typing.List[str]:
+        """Plan the shortest route between two waypoints.
+
+        Args:
+            start: Id of the waypoint to start from
+            goal: Id of the waypoint to go to
+
+        Returns:
+            The ids of the waypoints of the route, from start to goal
+
+        Raises:
+            NoRouteError: A waypoint is not in the graph, or the waypoints are not connected
+        """
+        with self._lock:
+            self._refresh()
+            route = self._routes.get((start, goal))
+            if route is not None:
+                self._routes.move_to_end((start, goal))
+                return list(route)
+            adjacency, positions, scale = (
+                self._adjacency,
+                self._positions,
+                self._heuristic_scale,
+            )
+
+        route = tuple(self._search(adjacency, positions, scale, start, goal))
+        with self._lock:
+            # Do not cache a route planned on a graph which changed meanwhile
+            if self._adjacency is adjacency:
+                self._routes[(start, goal)] = route
+                if len(self._routes) > self._cache_size:
+                    self._routes.popitem(last=False)
+        return list(route)
+
+    @staticmethod
+    def _search(
+        adjacency: typing.Dict[str, typing.List[typing.Tuple[str, float]]],
+        positions: typing.Optional[typing.Dict[str, typing.Tuple[float, float, float]]],
+        scale: float,
+        start: str,
+        goal: str,
+    ) -> typing.List[str]:
+        for waypoint_id in (start, goal):
+            if waypoint_id not in adjacency:
+                raise NoRouteError(f"Waypoint {waypoint_id} is not in the graph")
+        if positions is not None and scale > 0.0:
+            goal_position = positions[goal]
+
+            def heuristic(waypoint_id: str) -> float:
+                return scale * math.dist(positions[waypoint_id], goal_position)
+
+        else:
+
+            def heuristic(waypoint_id: str) -> float:
+                return 0.0
+
+        costs = {start: 0.0}
+        previous: typing.Dict[str, str] = {}
+        queue = [(heuristic(start), 0.0, start)]
+        while queue:
+            _, cost, waypoint_id = heapq.heappop(queue)
+            if waypoint_id == goal:
+                route = [goal]
+                while route[-1] != start:
+                    route.append(previous[route[-1]])
+                route.reverse()
+                return route
+            if cost > costs[waypoint_id]:
+                # Stale entry, the waypoint was reached through a cheaper route since it was queued
+                continue
+            for neighbour, cost_to_neighbour in adjacency[waypoint_id]:
+                neighbour_cost = cost + cost_to_neighbour
+                if neighbour_cost < costs.get(neighbour, math.inf):
+                    costs[neighbour] = neighbour_cost
+                    previous[neighbour] = waypoint_id
+                    heapq.heappush(
+                        queue,
+                        (
+                            neighbour_cost + heuristic(neighbour),
+                            neighbour_cost,
+                            neighbour,
+                        ),
+                    )
+        raise NoRouteError(f"There is no route from {start} to {goal}")
+
+    def plan_through(self, waypoint_ids: typing.Sequence[str]) -> typing.List[str]:
+        """Plan the shortest route visiting waypoints in order, such as the stops of a mission.
+
+        Returns:
+            The ids of the waypoints of the route, where each waypoint is adjacent to the next one
+
+        Raises:
+            NoRouteError: A waypoint is not in the graph, or two consecutive waypoints are not connected
+        """
+        route = list(waypoint_ids[:1])
+        for start, goal in zip(waypoint_ids, waypoint_ids[1:]):
+            route.extend(self.plan(start, goal)[1:])
+        return route
+
+    def route_edges(self, route: typing.Sequence[str]) -> typing.List[map_pb2.Edge.Id]:
+        """Return the ids of the edges between consecutive waypoints of a route, as needed by build_route
+
+        Raises:
+            NoRouteError: Two consecutive waypoints of the route are not adjacent
+        """
+        edge_ids = []
+        for start, goal in zip(route, route[1:]):
+            edge_id = self._index.match_edge(start, goal)
+            if edge_id is None:
+                raise NoRouteError(f"There is no edge between {start} and {goal}")
+            edge_ids.append(edge_id)
+        return edge_ids
@@ -0,0 +1,273 @@
+import concurrent.futures
+import typing
+from dataclasses import dataclass
+
+import numpy as np
+from bosdyn.api import geometry_pb2
+from bosdyn.api import image_pb2
+from google.protobuf.timestamp_pb2 import Timestamp
+
+try:
+    import cv2
+
+    HAVE_OPENCV = True
+except ModuleNotFoundError:
+    HAVE_OPENCV = False
+
+"""NumPy data type and number of channels of each raw pixel format"""
+PIXEL_FORMAT_LAYOUTS = {
+    image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8: (np.uint8, 1),
+    image_pb2.Image.PIXEL_FORMAT_RGB_U8: (np.uint8, 3),
+    image_pb2.Image.PIXEL_FORMAT_RGBA_U8: (np.uint8, 4),
+    image_pb2.Image.PIXEL_FORMAT_DEPTH_U16: (np.uint16, 1),
+    image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U16: (np.uint16, 1),
+}
+
+
+class ImageDecodeError(Exception):
+    """Raised when the data of an image cannot be decoded, such as a truncated raw image or a corrupted JPEG image"""
+
+
+class UnsupportedImageFormatError(ImageDecodeError):
+    """Raised when an image cannot be decoded because of its format or pixel format"""
+
+
+@dataclass(frozen=True)
+class CameraIntrinsics:
+    """Pinhole intrinsics of the camera which captured an image.
+
+    Attributes:
+        fx: Focal length along x in pixels
+        fy: Focal length along y in pixels
+        cx: Principal point along x in pixels
+        cy: Principal point along y in pixels
+        skew_x: Skew along x
+        skew_y: Skew along y
+    """
+
+    fx: float
+    fy: float
+    cx: float
+    cy: float
+    skew_x: float = 0.0
+    skew_y: float = 0.0
+
+    @classmethod
+    def from_image_source(
+        cls, source: image_pb2.ImageSource
+    ) -> typing.Optional["CameraIntrinsics"]:
+        """Return the pinhole intrinsics of an image source, or None if it does not have a pinhole model"""
+        if not source.HasField("pinhole"):
+            return None
+        intrinsics = source.pinhole.intrinsics
+        return cls(
+            fx=intrinsics.focal_length.x,
+            fy=intrinsics.focal_length.y,
+            cx=intrinsics.principal_point.x,
+            cy=intrinsics.principal_point.y,
+            skew_x=intrinsics.skew.x,
+            skew_y=intrinsics.skew.y,
+        )
+
+
+@dataclass(frozen=True)
+class DecodedImage:
+    """An image response decoded into a NumPy array.
+
+    Attributes:
+        source_name: Name of the image source
+        data: Pixels as an array of shape (rows, cols) or (rows, cols, channels). Raw images are read-only views of
+              the image response data.
+        pixel_format: Pixel format of the data, one of image_pb2.Image.PixelFormat
+        depth_scale: Number of depth units per meter, for depth images
+        intrinsics: Pinhole intrinsics of the camera, or None if the source does not have a pinhole model
+        acquisition_time: Time the image was captured, in robot time
+        frame_name_image_sensor: Name of the image sensor frame in the transforms snapshot
+        transforms_snapshot: Frame tree at the time the image was captured
+    """
+
+    source_name: str
+    data: np.ndarray
+    pixel_format: int
+    depth_scale: float
+    intrinsics: typing.Optional[CameraIntrinsics]
+    acquisition_time: Timestamp
+    frame_name_image_sensor: str
+    transforms_snapshot: geometry_pb2.FrameTreeSnapshot
+
+    @property
+    def is_depth(self) -> bool:
+        return self.pixel_format == image_pb2.Image.PIXEL_FORMAT_DEPTH_U16
+
+
+def buffer_as_array(
+    data: bytes, dtype: np.dtype, shape: typing.Tuple[int, ...]
+) -> np.ndarray:
+    """Return a read-only view of the data of a message as an array, without copying it.
+
+    Args:
+        data: Data of the message, such as the data of an image or a point cloud
+        dtype: Type of the elements of the array
+        shape: Shape of the array
+
+    Raises:
+        ValueError: The size of the data does not match the shape, such as for truncated data
+    """
+    expected_size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if len(data) != expected_size:
+        raise ValueError(f"{len(data)} bytes of data instead of {expected_size}")
+    return np.frombuffer(data, dtype=dtype).reshape(shape)
+
+
+def _decode_raw(image: image_pb2.Image, data: bytes) -> np.ndarray:
+    try:
+        dtype, channels = PIXEL_FORMAT_LAYOUTS[image.pixel_format]
+    except KeyError:
+        raise UnsupportedImageFormatError(
+            "Cannot decode raw image with pixel format {}".format(
+                image_pb2.Image.PixelFormat.Name(image.pixel_format)
+            )
+        )
+    shape = (
+        (image.rows, image.cols)
+        if channels == 1
+        else (image.rows, image.cols, channels)
+    )
+    try:
+        return buffer_as_array(data, dtype, shape)
+    except ValueError as e:
+        raise ImageDecodeError(
+            "Raw image of {}x{} pixels has {}".format(image.cols, image.rows, e)
+        )
+
+
+def _decode_jpeg(image: image_pb2.Image, data: bytes) -> np.ndarray:
+    if not HAVE_OPENCV:
+        raise UnsupportedImageFormatError("Decoding JPEG images requires OpenCV")
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    greyscale = image.pixel_format == image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8
+    try:
+        decoded = cv2.imdecode(
+            buffer, cv2.IMREAD_GRAYSCALE if greyscale else cv2.IMREAD_COLOR
+        )
+    except cv2.error as e:
+        raise ImageDecodeError(f"Cannot decode JPEG image: {e}")
+    # imdecode returns None rather than raising for data which is not a valid image
+    if decoded is None:
+        raise ImageDecodeError("Cannot decode JPEG image: the data is corrupted")
+    if greyscale:
+        return decoded
+    # OpenCV decodes colour images as BGR, the pixel formats are RGB
+    return cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB, dst=decoded)
+
+
+def decode_image_data(image: image_pb2.Image) -> np.ndarray:
+    """Decode the data of an image into a NumPy array.
+
+    Raw images are returned as a read-only view of the data without copying it. JPEG images are decoded with OpenCV.
+
+    Args:
+        image: The image to decode
+
+    Returns:
+        Array of shape (rows, cols) or (rows, cols, channels)
+
+    Raises:
+        UnsupportedImageFormatError: The format or pixel format is not supported
+        ImageDecodeError: The data of the image is truncated or corrupted
+    """
+    # Each access to a bytes field of a message creates a new bytes object, so only access it once
+    data = image.data
+    if image.format == image_pb2.Image.FORMAT_RAW:
+        return _decode_raw(image, data)
+    if image.format == image_pb2.Image.FORMAT_JPEG:
+        return _decode_jpeg(image, data)
+    raise UnsupportedImageFormatError(
+        "Cannot decode image with format {}".format(
+            image_pb2.Image.Format.Name(image.format)
+        )
+    )
+
+
+def decode_image(image_response: image_pb2.ImageResponse) -> DecodedImage:
+    """Decode an image response into a DecodedImage.
+
+    Args:
+        image_response: The image response to decode
+
+    Raises:
+        UnsupportedImageFormatError: The format or pixel format of the image is not supported
+        ImageDecodeError: The data of the image is truncated or corrupted
+    """
+    shot = image_response.shot
+    return DecodedImage(
+        source_name=image_response.source.name,
+        data=decode_image_data(shot.image),
+        pixel_format=shot.image.pixel_format,
+        depth_scale=image_response.source.depth_scale,
+        intrinsics=CameraIntrinsics.from_image_source(image_response.source),
+        acquisition_time=shot.acquisition_time,
+        frame_name_image_sensor=shot.frame_name_image_sensor,
+        transforms_snapshot=shot.transforms_snapshot,
+    )
+
+
+def decode_image_bundle(bundle: typing.Tuple) -> typing.Tuple:
+    """Decode every image response of an ImageBundle or ImageWithHandBundle.
+
+    Args:
+        bundle: Bundle returned by SpotImages, such as by get_camera_images
+
+    Returns:
+        Bundle of the same type, with a DecodedImage in place of each image response
+    """
+    return type(bundle)(*(decode_image(response) for response in bundle))
+
+
+class ImageDecodePool:
+    """Decodes the images of a bundle concurrently on a thread pool.
+
+    The OpenCV bindings release the GIL for the duration of each call, so the JPEG images of a bundle can be decoded
+    on several cores at once. Reading the responses and building the DecodedImage hold the GIL, so the speed-up also
+    depends on how much of the decoding time is spent outside OpenCV.
+    """
+
+    def __init__(self, max_workers: typing.Optional[int] = None):
+        """
+        Args:
+            max_workers: Number of decoding threads. Defaults to the ThreadPoolExecutor default, which is based on
+                         the number of cores.
+        """
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="image-decode"
+        )
+
+    def decode_image(
+        self, image_response: image_pb2.ImageResponse
+    ) -> concurrent.futures.Future:
+        """Decode an image response on the pool
+
+        Returns:
+            Future which resolves to the DecodedImage
+        """
+        return self._executor.submit(decode_image, image_response)
+
+    def decode_image_bundle(self, bundle: typing.Tuple) -> typing.Tuple:
+        """Decode every image response of a bundle concurrently.
+
+        Args:
+            bundle: Bundle returned by SpotImages, such as by get_camera_images
+
+        Returns:
+            Bundle of the same type, with a DecodedImage in place of each image response
+        """
+        futures = [self.decode_image(response) for response in bundle]
+        return type(bundle)(*(future.result() for future in futures))
+
+    def shutdown(self, wait: bool = True):
+        """Stop the decoding threads
+
+        Args:
+            wait: Wait for pending images to be decoded
+        """
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,504 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import typing
+import zlib
+
+"""File extension of graph nav map archives"""
+MAP_ARCHIVE_EXTENSION = ".spotmap"
+
+"""zlib compression level of the entries of map archives. Snapshot point clouds compress almost as well at level 1 as at
+the default level 6, four times faster."""
+MAP_ARCHIVE_COMPRESSION_LEVEL = 1
+
+# File layout, all integers little endian:
+#   magic
+#   records, each a header followed by its name and its data:
+#     blob record: compressed data, named after the SHA-256 digest of the uncompressed data
+#     entry record: the graph or a snapshot, named after its id and pointing to the digest of its blob
+#   index: zlib compressed JSON of the entries and blobs, written when the archive is closed
+#   footer: offset of the index, magic
+# The records are enough to rebuild the index, so an archive whose writer did not close it can still be resumed.
+_MAGIC = b"SPOTMAP1"
+_RECORD_HEADER = struct.Struct(
+    "<BH32sQQ"
+)  # kind, name length, digest, compressed size, size
+_FOOTER = struct.Struct("<Q8s")  # index offset, magic
+# Reading a page maps the cached pages around it too, 64 KiB by default on Linux. Pages are released in aligned blocks
+# of this size, so that the pages mapped around an entry are released with it.
+_RELEASE_ALIGNMENT = max(mmap.PAGESIZE, 64 * 1024)
+
+_BLOB = 0
+_GRAPH = 1
+_WAYPOINT_SNAPSHOT = 2
+_EDGE_SNAPSHOT = 3
+_ENTRY_KINDS = {
+    _GRAPH: "graph",
+    _WAYPOINT_SNAPSHOT: "waypoint_snapshots",
+    _EDGE_SNAPSHOT: "edge_snapshots",
+}
+_GRAPH_NAME = "graph"
+
+
+class MapArchiveError(Exception):
+    """Raised when a file is not a map archive, or an entry is missing or corrupted"""
+
+
+class _ArchiveIndex:
+    """Locations of the blobs of an archive and the blob digest of each entry"""
+
+    def __init__(self):
+        # digest -> (offset of the compressed data, compressed size, size)
+        self.blobs: typing.Dict[bytes, typing.Tuple[int, int, int]] = {}
+        # kind -> name -> digest
+        self.entries: typing.Dict[int, typing.Dict[str, bytes]] = {
+            kind: {} for kind in _ENTRY_KINDS
+        }
+
+    def to_bytes(self) -> bytes:
+        index = {
+            "blobs": {digest.hex(): blob for digest, blob in self.blobs.items()},
+            "entries": {
+                _ENTRY_KINDS[kind]: {
+                    name: digest.hex() for name, digest in names.items()
+                }
+                for kind, names in self.entries.items()
+            },
+        }
+        return zlib.compress(json.dumps(index).encode())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "_ArchiveIndex":
+        index = json.loads(zlib.decompress(data))
+        archive_index = cls()
+        archive_index.blobs = {
+            bytes.fromhex(digest): tuple(blob)
+            for digest, blob in index["blobs"].items()
+        }
+        for kind, kind_name in _ENTRY_KINDS.items():
+            archive_index.entries[kind] = {
+                name: bytes.fromhex(digest)
+                for name, digest in index["entries"][kind_name].items()
+            }
+        return archive_index
+
+
+def _read_index(f: typing.BinaryIO) -> typing.Tuple[_ArchiveIndex, int]:
+    """Read the index of an archive, rebuilding it from the records if the archive was not closed.
+
+    Returns:
+        The index, and the offset at which the records end
+    """
+    if f.read(len(_MAGIC)) != _MAGIC:
+        raise MapArchiveError(f"{f.name} is not a map archive")
+    file_size = f.seek(0, os.SEEK_END)
+    if file_size >= len(_MAGIC) + _FOOTER.size:
+        f.seek(file_size - _FOOTER.size)
+        index_offset, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic == _MAGIC and len(_MAGIC) <= index_offset < file_size:
+            f.seek(index_offset)
+            try:
+                index = _ArchiveIndex.from_bytes(
+                    f.read(file_size - _FOOTER.size - index_offset)
+                )
+                return index, index_offset
+            except (zlib.error, ValueError, KeyError):
+                pass
+
+    # Scan the records, stopping at the first incomplete one
+    index = _ArchiveIndex()
+    offset = len(_MAGIC)
+    f.seek(offset)
+    while True:
+        header = f.read(_RECORD_HEADER.size)
+        if len(header) < _RECORD_HEADER.size:
+            break
+        kind, name_size, digest, compressed_size, size = _RECORD_HEADER.unpack(header)
+        name = f.read(name_size)
+        data_offset = offset + _RECORD_HEADER.size + name_size
+        end = data_offset + compressed_size
+        if (
+            len(name) < name_size
+            or end > file_size
+            or not (kind == _BLOB or kind in _ENTRY_KINDS)
+        ):
+            break
+        if kind == _BLOB:
+            index.blobs[digest] = (data_offset, compressed_size, size)
+        elif digest in index.blobs:
+            index.entries[kind][name.decode()] = digest
+        offset = end
+        f.seek(offset)
+    return index, offset
+
+
+class MapArchive:
+    """Reads a single file map archive, as written by MapArchiveWriter.
+
+    An archive holds the graph and the snapshots of a graph nav map. Each is compressed separately and stored once per
+    distinct content, and an index gives random access to any of them. Reads can be done from several threads.
+
+    The archive is memory mapped, and only the index is loaded when it is opened. Each entry is decompressed straight
+    from the mapping when it is read, and the pages it was read from are then released, so that memory use does not
+    grow with the size of the map as its entries are read.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path to the archive
+
+        Raises:
+            MapArchiveError: The file is not a map archive
+        """
+        with open(path, "rb") as f:
+            self._index, _ = _read_index(f)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+    def __enter__(self) -> "MapArchive":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if not self._mmap.closed:
+            self._view.release()
+            self._mmap.close()
+
+    @property
+    def waypoint_snapshot_ids(self) -> typing.List[str]:
+        return list(self._index.entries[_WAYPOINT_SNAPSHOT])
+
+    @property
+    def edge_snapshot_ids(self) -> typing.List[str]:
+        return list(self._index.entries[_EDGE_SNAPSHOT])
+
+    def _read(self, kind: int, name: str) -> bytes:
+        digest = self._index.entries[kind].get(name)
+        if digest is None:
+            raise MapArchiveError(f"{name} is not in the map archive")
+        offset, compressed_size, size = self._index.blobs[digest]
+        with self._view[offset : offset + compressed_size] as compressed:
+            try:
+                data = zlib.decompress(compressed)
+            except zlib.error:
+                data = b""
+        self._release(offset, compressed_size)
+        if len(data) != size or hashlib.sha256(data).digest() != digest:
+            raise MapArchiveError(f"{name} is corrupted in the map archive")
+        return data
+
+    def _release(self, offset: int, size: int):
+        """Drop the pages of the mapping around a range of the archive from the memory of the process.
+
+        They stay in the page cache of the kernel, so reading them again is cheap. Releasing pages of entries read by
+        other threads only makes them read these pages again.
+        """
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start = offset - offset % _RELEASE_ALIGNMENT
+        end = min(
+            -(-(offset + size) // _RELEASE_ALIGNMENT) * _RELEASE_ALIGNMENT,
+            len(self._mmap),
+        )
+        self._mmap.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def read_graph(self) -> bytes:
+        """Return the serialized graph
+
+        Raises:
+            MapArchiveError: The archive has no graph, or it is corrupted
+        """
+        return self._read(_GRAPH, _GRAPH_NAME)
+
+    def read_waypoint_snapshot(self, snapshot_id: str) -> bytes:
+        """Return a serialized waypoint snapshot
+
+        Raises:
+            MapArchiveError: The archive does not have the snapshot, or it is corrupted
+        """
+        return self._read(_WAYPOINT_SNAPSHOT, snapshot_id)
+
+    def read_edge_snapshot(self, snapshot_id: str) -> bytes:
+        """Return a serialized edge snapshot
+
+        Raises:
+            MapArchiveError: The archive does not have the snapshot, or it is corrupted
+        """
+        return self._read(_EDGE_SNAPSHOT, snapshot_id)
+
+
+class MapArchiveWriter:
+    """Writes a single file map archive, which can be read with MapArchive.
+
+    If the archive already exists, its entries are kept and new entries are appended, so that a download can be
+    resumed. This also works for an archive whose writer was interrupted before closing it. The index is written when
+    the writer is closed.
+
+    Entries can be written from several threads. They are compressed on the writing thread, and only appending them to
+    the file is serialized.
+    """
+
+    def __init__(
+        self, path: str, compression_level: int = MAP_ARCHIVE_COMPRESSION_LEVEL
+    ):
+        """
+        Args:
+            path: Path to the archive
+            compression_level: zlib compression level of the entries
+
+        Raises:
+            MapArchiveError: The file exists and is not a map archive
+        """
+        self._compression_level = compression_level
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            self._file = open(path, "r+b")
+            try:
+                self._index, end = _read_index(self._file)
+            except Exception:
+                self._file.close()
+                raise
+            # Drop the index, which is written again on close
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(path, "w+b")
+            self._file.write(_MAGIC)
+            self._index = _ArchiveIndex()
+
+    def __enter__(self) -> "MapArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Write the index and close the archive"""
+        with self._lock:
+            if self._file.closed:
+                return
+            index_offset = self._file.tell()
+            self._file.write(self._index.to_bytes())
+            self._file.write(_FOOTER.pack(index_offset, _MAGIC))
+            self._file.close()
+
+    def _write_record(
+        self, kind: int, name: bytes, digest: bytes, data: bytes, size: int
+    ):
+        # Must be called with the lock held
+        offset = self._file.tell()
+        self._file.write(_RECORD_HEADER.pack(kind, len(name), digest, len(data), size))
+        self._file.write(name)
+        self._file.write(data)
+        return offset + _RECORD_HEADER.size + len(name)
+
+    def _write(self, kind: int, name: str, data: bytes) -> bool:
+        """Write an entry, storing its data only if no other entry has the same data
+
+        Returns:
+            Whether the data was stored
+        """
+        digest = hashlib.sha256(data).digest()
+        # Blobs are never removed, so data found to be stored here is still stored once the lock is taken
+        compressed = None
+        if digest not in self._index.blobs:
+            compressed = zlib.compress(data, self._compression_level)
+        with self._lock:
+            stored = digest not in self._index.blobs
+            if stored:
+                data_offset = self._write_record(
+                    _BLOB, b"", digest, compressed, len(data)
+                )
+                self._index.blobs[digest] = (data_offset, len(compressed), len(data))
+            self._write_record(kind, name.encode(), digest, b"", 0)
+            self._index.entries[kind][name] = digest
+        return stored
+
+    def write_graph(self, data: bytes):
+        """Write the serialized graph, replacing the graph of the archive"""
+        self._write(_GRAPH, _GRAPH_NAME, data)
+
+    def write_waypoint_snapshot(self, snapshot_id: str, data: bytes) -> bool:
+        """Write a serialized waypoint snapshot
+
+        Returns:
+            Whether its data was stored, rather than shared with an identical snapshot
+        """
+        return self._write(_WAYPOINT_SNAPSHOT, snapshot_id, data)
+
+    def write_edge_snapshot(self, snapshot_id: str, data: bytes) -> bool:
+        """Write a serialized edge snapshot
+
+        Returns:
+            Whether its data was stored, rather than shared with an identical snapshot
+        """
+        return self._write(_EDGE_SNAPSHOT, snapshot_id, data)
+
+    def has_waypoint_snapshot(self, snapshot_id: str) -> bool:
+        return snapshot_id in self._index.entries[_WAYPOINT_SNAPSHOT]
+
+    def has_edge_snapshot(self, snapshot_id: str) -> bool:
+        return snapshot_id in self._index.entries[_EDGE_SNAPSHOT]
+
+
+class MapDirectory:
+    """Reads a map stored as a directory of files, with the same interface as MapArchive.
+
+    The graph is in a file named graph, and the snapshots are in the waypoint_snapshots and edge_snapshots
+    directories, in files named after their ids.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path to the root directory of the map
+        """
+        self._path = path
+
+    def __enter__(self) -> "MapDirectory":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _list(self, directory: str) -> typing.List[str]:
+        try:
+            names = os.listdir(os.path.join(self._path, directory))
+        except FileNotFoundError:
+            return []
+        return [name for name in names if not name.endswith(".part")]
+
+    @property
+    def waypoint_snapshot_ids(self) -> typing.List[str]:
+        return self._list("waypoint_snapshots")
+
+    @property
+    def edge_snapshot_ids(self) -> typing.List[str]:
+        return self._list("edge_snapshots")
+
+    def _read(self, *names: str) -> bytes:
+        try:
+            with open(os.path.join(self._path, *names), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise MapArchiveError(f"{names[-1]} is not in the map directory")
+
+    def read_graph(self) -> bytes:
+        return self._read("graph")
+
+    def read_waypoint_snapshot(self, snapshot_id: str) -> bytes:
+        return self._read("waypoint_snapshots", snapshot_id)
+
+    def read_edge_snapshot(self, snapshot_id: str) -> bytes:
+        return self._read("edge_snapshots", snapshot_id)
+
+
+class MapDirectoryWriter:
+    """Writes a map as a directory of files, with the same interface as MapArchiveWriter.
+
+    Each file is written to a temporary file which is then renamed, so that an interrupted download never leaves a
+    partial file behind. A snapshot is considered to be in the directory if its file exists and is not empty.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path to the root directory of the map
+        """
+        self._path = path
+        for directory in ("waypoint_snapshots", "edge_snapshots"):
+            os.makedirs(os.path.join(path, directory), exist_ok=True)
+
+    def __enter__(self) -> "MapDirectoryWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _write(self, data: bytes, *names: str):
+        filename = os.path.join(self._path, *names)
+        partial_filename = filename + ".part"
+        with open(partial_filename, "wb") as f:
+            f.write(data)
+        os.replace(partial_filename, filename)
+
+    def _has_snapshot(self, directory: str, snapshot_id: str) -> bool:
+        # Files are only given their final name once fully written, so they are not parsed to check them
+        try:
+            return os.path.getsize(os.path.join(self._path, directory, snapshot_id)) > 0
+        except OSError:
+            return False
+
+    def write_graph(self, data: bytes):
+        self._write(data, "graph")
+
+    def write_waypoint_snapshot(self, snapshot_id: str, data: bytes) -> bool:
+        self._write(data, "waypoint_snapshots", snapshot_id)
+        return True
+
+    def write_edge_snapshot(self, snapshot_id: str, data: bytes) -> bool:
+        self._write(data, "edge_snapshots", snapshot_id)
+        return True
+
+    def has_waypoint_snapshot(self, snapshot_id: str) -> bool:
+        return self._has_snapshot("waypoint_snapshots", snapshot_id)
+
+    def has_edge_snapshot(self, snapshot_id: str) -> bool:
+        return self._has_snapshot("edge_snapshots", snapshot_id)
+
+
+def is_map_archive_path(path: str) -> bool:
+    """Return whether a map path is an archive rather than a directory, from its extension or, for an archive which was
+    renamed, from the start of the file"""
+    if path.endswith(MAP_ARCHIVE_EXTENSION):
+        return True
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    except OSError:
+        return False
+
+
+def open_map(path: str) -> typing.Union[MapArchive, MapDirectory]:
+    """Open a map for reading, either an archive or a directory
+
+    Raises:
+        MapArchiveError: The path is a file which is not a map archive
+    """
+    if is_map_archive_path(path):
+        return MapArchive(path)
+    if os.path.isfile(path):
+        raise MapArchiveError(
+            f"{path} is a file but not a map archive. Maps are either {MAP_ARCHIVE_EXTENSION} files or directories."
+        )
+    return MapDirectory(path)
+
+
+def open_map_writer(
+    path: str, compression_level: int = MAP_ARCHIVE_COMPRESSION_LEVEL
+) -> typing.Union[MapArchiveWriter, MapDirectoryWriter]:
+    """Open a map for writing, as an archive if the path ends with MAP_ARCHIVE_EXTENSION and as a directory otherwise
+
+    Args:
+        path: Path to the map
+        compression_level: zlib compression level of the entries of an archive, from 0 to store them uncompressed to
+                           9. Directories are never compressed.
+    """
+    if is_map_archive_path(path):
+        return MapArchiveWriter(path, compression_level)
+    return MapDirectoryWriter(path)
@@ -0,0 +1,152 @@
+import concurrent.futures
+import logging
+import threading
+import time
+import typing
+
+from bosdyn.api.graph_nav import graph_nav_pb2
+
+"""Navigation feedback statuses at which a navigation command is finished"""
+TERMINAL_NAVIGATION_STATUSES = frozenset(
+    [
+        graph_nav_pb2.NavigationFeedbackResponse.STATUS_REACHED_GOAL,
+        graph_nav_pb2.NavigationFeedbackResponse.STATUS_LOST,
+        graph_nav_pb2.NavigationFeedbackResponse.STATUS_STUCK,
+        graph_nav_pb2.NavigationFeedbackResponse.STATUS_ROBOT_IMPAIRED,
+    ]
+)
+
+"""Default rate (Hz) at which the navigation feedback is polled"""
+DEFAULT_NAVIGATION_FEEDBACK_RATE = 10.0
+
+
+class NavigationCancelled(Exception):
+    """Raised by NavigationHandle.result when the navigation was cancelled"""
+
+
+class NavigationHandle:
+    """Handle on a graph nav navigation command running in the background.
+
+    The command is issued with a short duration, so that the robot stops soon if the program dies, and renewed on a
+    background thread before it expires. The same thread polls the navigation feedback at its own rate, and the
+    handle resolves as soon as the feedback reaches a terminal status. The caller is free to do other work meanwhile.
+    """
+
+    def __init__(
+        self,
+        graph_nav_client,
+        issue_command: typing.Callable[[typing.Optional[int]], int],
+        logger: logging.Logger,
+        command_duration: float = 1.0,
+        feedback_rate: float = DEFAULT_NAVIGATION_FEEDBACK_RATE,
+        on_finished: typing.Optional[typing.Callable[[], None]] = None,
+    ):
+        """
+        Args:
+            graph_nav_client: Client used to get the navigation feedback
+            issue_command: Function issuing the navigation command for command_duration seconds. It is given the id
+                           of the command to renew, or None for the first call, and returns the command id.
+            logger: Logger object
+            command_duration: Duration in seconds of each command. Commands are renewed at half of it.
+            feedback_rate: Rate (Hz) at which the navigation feedback is polled
+            on_finished: Function called on the background thread once navigation is finished, before the handle
+                         resolves, such as to take back the lease
+        """
+        self._graph_nav_client = graph_nav_client
+        self._issue_command = issue_command
+        self._logger = logger
+        self._renew_period = command_duration / 2.0
+        self._feedback_period = 1.0 / feedback_rate
+        self._on_finished = on_finished
+        self._future: concurrent.futures.Future = concurrent.futures.Future()
+        self._cancel_event = threading.Event()
+        self._command_id: typing.Optional[int] = None
+        self._feedback: typing.Optional[graph_nav_pb2.NavigationFeedbackResponse] = None
+        self._thread = threading.Thread(
+            target=self._run, name="graph-nav-navigation", daemon=True
+        )
+
+    def start(self) -> "NavigationHandle":
+        self._thread.start()
+        return self
+
+    @property
+    def command_id(self) -> typing.Optional[int]:
+        """Return the id of the navigation command, or None if it was not issued yet"""
+        return self._command_id
+
+    @property
+    def feedback(self) -> typing.Optional[graph_nav_pb2.NavigationFeedbackResponse]:
+        """Return the latest navigation feedback, or None if none was received yet"""
+        return self._feedback
+
+    @property
+    def future(self) -> concurrent.futures.Future:
+        """Return a future which resolves to the terminal navigation feedback"""
+        return self._future
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(
+        self, timeout: typing.Optional[float] = None
+    ) -> graph_nav_pb2.NavigationFeedbackResponse:
+        """Wait for navigation to finish.
+
+        Args:
+            timeout: Maximum time to wait in seconds, or None to wait until navigation finishes
+
+        Returns:
+            The navigation feedback with the terminal status
+
+        Raises:
+            NavigationCancelled: The navigation was cancelled
+            concurrent.futures.TimeoutError: Navigation did not finish within the timeout
+            RpcError: A problem occurred communicating with the robot
+        """
+        return self._future.result(timeout)
+
+    def add_done_callback(
+        self, callback: typing.Callable[[concurrent.futures.Future], None]
+    ):
+        """Call a function with the future once navigation is finished"""
+        self._future.add_done_callback(callback)
+
+    def cancel(self):
+        """Stop renewing the navigation command, so the robot stops once the current command expires"""
+        self._cancel_event.set()
+
+    def _run(self):
+        next_renewal = next_feedback = time.time()
+        try:
+            while not self._cancel_event.is_set():
+                now = time.time()
+                if now >= next_renewal:
+                    self._command_id = self._issue_command(self._command_id)
+                    next_renewal = now + self._renew_period
+                if now >= next_feedback:
+                    self._feedback = self._graph_nav_client.navigation_feedback(
+                        self._command_id
+                    )
+                    if self._feedback.status in TERMINAL_NAVIGATION_STATUSES:
+                        self._finish(result=self._feedback)
+                        return
+                    next_feedback = now + self._feedback_period
+                self._cancel_event.wait(
+                    max(0.0, min(next_renewal, next_feedback) - time.time())
+                )
+            self._finish(exception=NavigationCancelled("Navigation was cancelled"))
+        except Exception as e:
+            self._logger.error(f"Navigation failed with error: {e}")
+            self._finish(exception=e)
+
+    def _finish(self, result=None, exception: typing.Optional[Exception] = None):
+        if self._on_finished is not None:
+            try:
+                self._on_finished()
+            except Exception as e:
+                self._logger.error(f"Failed to clean up after navigation: {e}")
+        if exception is not None:
+            self._future.set_exception(exception)
+        else:
+            self._future.set_result(result)
@@ -0,0 +1,240 @@
+import collections
+import logging
+import typing
+from dataclasses import dataclass
+
+import numpy as np
+from bosdyn.api import geometry_pb2
+from bosdyn.api import point_cloud_pb2
+from bosdyn.client.frame_helpers import (
+    BODY_FRAME_NAME,
+    ODOM_FRAME_NAME,
+    get_a_tform_b,
+)
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from .image_decoding import buffer_as_array
+from .pose_history import PoseHistory, timestamp_to_seconds
+
+
+class PointCloudDecodeError(Exception):
+    """Raised when the data of a point cloud cannot be decoded, such as a truncated point cloud"""
+
+
+class UnsupportedPointCloudEncodingError(PointCloudDecodeError):
+    """Raised when a point cloud cannot be decoded because of its encoding"""
+
+
+@dataclass(frozen=True)
+class DecodedPointCloud:
+    """A point cloud decoded into a NumPy array.
+
+    Attributes:
+        source_name: Name of the point cloud source
+        points: Points in the sensor frame as a read-only array of shape (N, 3) and type float32. For XYZ_32F clouds
+                this is a view of the point cloud data rather than a copy.
+        frame_name_sensor: Name of the sensor frame in the transforms snapshot
+        acquisition_time: Time the point cloud was captured, in robot time
+        transforms_snapshot: Frame tree at the time the point cloud was captured
+    """
+
+    source_name: str
+    points: np.ndarray
+    frame_name_sensor: str
+    acquisition_time: Timestamp
+    transforms_snapshot: geometry_pb2.FrameTreeSnapshot
+
+    def frame_tform_sensor(self, frame_name: str) -> np.ndarray:
+        """Return the 4x4 transform from the sensor frame to another frame, at the time the cloud was captured.
+
+        Args:
+            frame_name: Name of the frame in the transforms snapshot, such as "body" or "odom"
+
+        Raises:
+            ValueError: The transforms snapshot has no path between the two frames
+        """
+        frame_tform_sensor = get_a_tform_b(
+            self.transforms_snapshot, frame_name, self.frame_name_sensor
+        )
+        if frame_tform_sensor is None:
+            raise ValueError(
+                f"No transform from {self.frame_name_sensor} to {frame_name} in the snapshot of {self.source_name}"
+            )
+        return frame_tform_sensor.to_matrix()
+
+    def points_in_frame(self, frame_name: str) -> np.ndarray:
+        """Return the points expressed in another frame, as a new array of shape (N, 3) and type float32"""
+        transform = self.frame_tform_sensor(frame_name).astype(np.float32)
+        points = self.points @ transform[:3, :3].T
+        points += transform[:3, 3]
+        return points
+
+
+def decode_point_cloud(point_cloud: point_cloud_pb2.PointCloud) -> DecodedPointCloud:
+    """Decode a point cloud into a DecodedPointCloud without copying its points.
+
+    Args:
+        point_cloud: The point cloud to decode
+
+    Raises:
+        UnsupportedPointCloudEncodingError: The encoding of the point cloud is not supported
+        PointCloudDecodeError: The size of the data does not match the number of points
+    """
+    if point_cloud.encoding != point_cloud_pb2.PointCloud.ENCODING_XYZ_32F:
+        raise UnsupportedPointCloudEncodingError(
+            "Cannot decode point cloud with encoding {}".format(
+                point_cloud_pb2.PointCloud.Encoding.Name(point_cloud.encoding)
+            )
+        )
+    data = point_cloud.data
+    # Clouds without a number of points hold as many points as their data
+    num_points = point_cloud.num_points or len(data) // 12
+    source = point_cloud.source
+    try:
+        points = buffer_as_array(data, np.float32, (num_points, 3))
+    except ValueError as e:
+        raise PointCloudDecodeError(
+            f"Point cloud of {num_points} points from {source.name} has {e}"
+        )
+    return DecodedPointCloud(
+        source_name=source.name,
+        points=points,
+        frame_name_sensor=source.frame_name_sensor,
+        acquisition_time=source.acquisition_time,
+        transforms_snapshot=source.transforms_snapshot,
+    )
+
+
+def decode_point_cloud_responses(
+    point_cloud_responses: typing.Iterable[point_cloud_pb2.PointCloudResponse],
+    logger: typing.Optional[logging.Logger] = None,
+) -> typing.List[DecodedPointCloud]:
+    """Decode the point cloud of each response, such as those returned by SpotWrapper.point_clouds.
+
+    Point clouds which cannot be decoded are skipped, so that one bad cloud does not hide the others.
+
+    Args:
+        point_cloud_responses: The point cloud responses to decode
+        logger: If set, the point clouds skipped are logged with it
+    """
+    decoded = []
+    for response in point_cloud_responses:
+        try:
+            decoded.append(decode_point_cloud(response.point_cloud))
+        except PointCloudDecodeError as e:
+            if logger is not None:
+                logger.warning(f"Skipped a point cloud: {e}")
+    return decoded
+
+
+def deskew_point_cloud(
+    point_cloud: DecodedPointCloud, pose_history: PoseHistory, scan_duration: float
+) -> np.ndarray:
+    """Transform a scan into the odom frame, compensating for the motion of the body while it was taken.
+
+    The point clouds of the EAP have no per-point times, so the points are assumed to be in capture order and evenly
+    spread over the scan, which ends at the acquisition time. This holds for a spinning lidar such as the Velodyne
+    VLP-16, whose scan takes one revolution. The pose of the body at the time of each point is interpolated from the
+    pose history, and all points are transformed at once.
+
+    Args:
+        point_cloud: The decoded scan
+        pose_history: History of the pose of the body in odom covering the scan
+        scan_duration: Time in seconds taken to capture the scan, 0.1 for a VLP-16 spinning at 10 Hz
+
+    Returns:
+        Points in odom of shape (N, 3) and type float32
+
+    Raises:
+        ValueError: The pose history is empty, or the snapshot has no transform from the sensor to the body
+    """
+    count = len(point_cloud.points)
+    end = timestamp_to_seconds(point_cloud.acquisition_time)
+    stamps = end - scan_duration + np.arange(count) * (scan_duration / max(count, 1))
+    positions, rotations = pose_history.interpolate(stamps)
+
+    body_tform_sensor = point_cloud.frame_tform_sensor(BODY_FRAME_NAME)
+    points = point_cloud.points @ body_tform_sensor[:3, :3].T
+    points += body_tform_sensor[:3, 3]
+    points = np.einsum("nij,nj->ni", rotations, points)
+    points += positions
+    return points.astype(np.float32)
+
+
+class PointCloudAccumulator:
+    """Keeps the last scans of the point cloud sources transformed into a fixed frame, to build a denser cloud than a
+    single scan.
+
+    If a pose history is given, the scans are de-skewed with deskew_point_cloud instead of being transformed with the
+    single pose of their transforms snapshot, and the frame must be odom.
+
+    Scans are added by the point cloud task and read from other threads. The scans are kept in a deque with a maximum
+    length, whose appends and copies are atomic, so no lock is needed.
+    """
+
+    def __init__(
+        self,
+        max_scans: int,
+        frame_name: str = ODOM_FRAME_NAME,
+        pose_history: typing.Optional[PoseHistory] = None,
+        scan_duration: float = 0.1,
+        max_age: typing.Optional[float] = None,
+    ):
+        """
+        Args:
+            max_scans: Number of scans to keep
+            frame_name: Frame the scans are transformed into. It must be fixed in the world, such as "odom" or "vision".
+            pose_history: History of the pose of the body in odom used to de-skew the scans
+            scan_duration: Time in seconds taken to capture a scan, used to de-skew the scans
+            max_age: If set, scans acquired more than this many seconds before the latest scan are dropped
+        """
+        if max_scans < 1:
+            raise ValueError("The accumulator must keep at least one scan")
+        if pose_history is not None and frame_name != ODOM_FRAME_NAME:
+            raise ValueError("De-skewed scans can only be accumulated in odom")
+        self._frame_name = frame_name
+        self._pose_history = pose_history
+        self._scan_duration = scan_duration
+        self._max_age = max_age
+        self._scans: typing.Deque[typing.Tuple[float, np.ndarray]] = collections.deque(
+            maxlen=max_scans
+        )
+
+    @property
+    def frame_name(self) -> str:
+        return self._frame_name
+
+    def __len__(self) -> int:
+        return len(self._scans)
+
+    def add(self, point_cloud: DecodedPointCloud):
+        """Transform a scan into the accumulator frame and add it, dropping the oldest scan if the accumulator is full"""
+        if self._pose_history is not None and len(self._pose_history):
+            points = deskew_point_cloud(
+                point_cloud, self._pose_history, self._scan_duration
+            )
+        else:
+            points = point_cloud.points_in_frame(self._frame_name)
+        stamp = timestamp_to_seconds(point_cloud.acquisition_time)
+        self._scans.append((stamp, points))
+        if self._max_age is not None:
+            while self._scans and self._scans[0][0] < stamp - self._max_age:
+                self._scans.popleft()
+
+    def add_responses(
+        self,
+        point_cloud_responses: typing.Iterable[point_cloud_pb2.PointCloudResponse],
+    ):
+        """Decode the point cloud of each response and add it"""
+        for point_cloud in decode_point_cloud_responses(point_cloud_responses):
+            self.add(point_cloud)
+
+    def clear(self):
+        self._scans.clear()
+
+    def points(self) -> np.ndarray:
+        """Return the points of all the scans kept as a single array of shape (N, 3) and type float32"""
+        scans = list(self._scans)
+        if not scans:
+            return np.empty((0, 3), dtype=np.float32)
+        return np.concatenate([points for _, points in scans])
@@ -0,0 +1,157 @@
+import collections
+import threading
+import typing
+
+import numpy as np
+from bosdyn.api import robot_state_pb2
+from bosdyn.client.frame_helpers import get_odom_tform_body
+from google.protobuf.timestamp_pb2 import Timestamp
+
+
+def timestamp_to_seconds(timestamp: Timestamp) -> float:
+    return timestamp.seconds + timestamp.nanos * 1e-9
+
+
+def quaternions_to_matrices(quaternions: np.ndarray) -> np.ndarray:
+    """Convert unit quaternions of shape (M, 4) in (w, x, y, z) order to rotation matrices of shape (M, 3, 3)"""
+    w, x, y, z = quaternions.T
+    matrices = np.empty((len(quaternions), 3, 3))
+    matrices[:, 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    matrices[:, 0, 1] = 2.0 * (x * y - z * w)
+    matrices[:, 0, 2] = 2.0 * (x * z + y * w)
+    matrices[:, 1, 0] = 2.0 * (x * y + z * w)
+    matrices[:, 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    matrices[:, 1, 2] = 2.0 * (y * z - x * w)
+    matrices[:, 2, 0] = 2.0 * (x * z - y * w)
+    matrices[:, 2, 1] = 2.0 * (y * z + x * w)
+    matrices[:, 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+    return matrices
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, fractions: np.ndarray) -> np.ndarray:
+    """Spherically interpolate between pairs of unit quaternions.
+
+    Args:
+        q0: Quaternions of shape (M, 4) at fraction 0
+        q1: Quaternions of shape (M, 4) at fraction 1
+        fractions: Interpolation fractions of shape (M,)
+
+    Returns:
+        Unit quaternions of shape (M, 4)
+    """
+    dot = np.einsum("ij,ij->i", q0, q1)
+    # q and -q are the same rotation, take the shortest path
+    q1 = np.where(dot[:, np.newaxis] < 0.0, -q1, q1)
+    dot = np.abs(dot)
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    # Fall back to linear interpolation for nearly identical rotations, where slerp is numerically unstable
+    linear = sin_theta < 1e-6
+    safe_sin_theta = np.where(linear, 1.0, sin_theta)
+    w0 = np.where(
+        linear, 1.0 - fractions, np.sin((1.0 - fractions) * theta) / safe_sin_theta
+    )
+    w1 = np.where(linear, fractions, np.sin(fractions * theta) / safe_sin_theta)
+    quaternions = w0[:, np.newaxis] * q0 + w1[:, np.newaxis] * q1
+    return quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+
+
+class PoseHistory:
+    """History of the pose of the body in the odom frame over a sliding time window, which can be interpolated at
+    arbitrary times.
+
+    Poses are added from the robot state task and interpolated from other threads, so access is serialized with a
+    lock. Times are robot times in seconds, which is the clock of the acquisition times of the sensor data.
+    """
+
+    def __init__(self, window_sec: float = 10.0):
+        """
+        Args:
+            window_sec: Poses older than this many seconds before the latest pose are dropped
+        """
+        self._window_sec = window_sec
+        self._lock = threading.Lock()
+        self._stamps: typing.Deque[float] = collections.deque()
+        self._poses: typing.Deque[typing.Tuple[float, ...]] = collections.deque()
+
+    def __len__(self) -> int:
+        return len(self._stamps)
+
+    @property
+    def time_range(self) -> typing.Optional[typing.Tuple[float, float]]:
+        """Return the times of the oldest and latest poses, or None if the history is empty"""
+        with self._lock:
+            if not self._stamps:
+                return None
+            return self._stamps[0], self._stamps[-1]
+
+    def add(
+        self,
+        stamp: float,
+        position: typing.Sequence[float],
+        rotation: typing.Sequence[float],
+    ):
+        """Add a pose. Poses which are not newer than the latest pose are dropped.
+
+        Args:
+            stamp: Robot time in seconds
+            position: Position of the body in odom as (x, y, z)
+            rotation: Rotation of the body in odom as a unit quaternion (w, x, y, z)
+        """
+        with self._lock:
+            if self._stamps and stamp <= self._stamps[-1]:
+                return
+            self._stamps.append(stamp)
+            self._poses.append((*position, *rotation))
+            while self._stamps[0] < stamp - self._window_sec:
+                self._stamps.popleft()
+                self._poses.popleft()
+
+    def add_state(self, state: robot_state_pb2.RobotState):
+        """Add the pose of the body in odom from a robot state"""
+        kinematic_state = state.kinematic_state
+        odom_tform_body = get_odom_tform_body(kinematic_state.transforms_snapshot)
+        if odom_tform_body is None:
+            return
+        rotation = odom_tform_body.rotation
+        self.add(
+            timestamp_to_seconds(kinematic_state.acquisition_timestamp),
+            (odom_tform_body.x, odom_tform_body.y, odom_tform_body.z),
+            (rotation.w, rotation.x, rotation.y, rotation.z),
+        )
+
+    def interpolate(self, stamps: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Interpolate the pose of the body in odom at several times at once. Times outside of the history are clamped
+        to the oldest or latest pose.
+
+        Args:
+            stamps: Robot times in seconds, of shape (M,)
+
+        Returns:
+            Positions of shape (M, 3) and rotation matrices of shape (M, 3, 3)
+
+        Raises:
+            ValueError: The history is empty
+        """
+        with self._lock:
+            if not self._stamps:
+                raise ValueError("The pose history is empty")
+            times = np.fromiter(self._stamps, dtype=np.float64, count=len(self._stamps))
+            poses = np.array(self._poses)
+        stamps = np.clip(np.asarray(stamps, dtype=np.float64), times[0], times[-1])
+        if len(times) == 1:
+            indices = np.zeros(len(stamps), dtype=np.int64)
+            fractions = np.zeros(len(stamps))
+            upper = indices
+        else:
+            upper = np.clip(np.searchsorted(times, stamps), 1, len(times) - 1)
+            indices = upper - 1
+            fractions = (stamps - times[indices]) / (times[upper] - times[indices])
+        before, after = poses[indices], poses[upper]
+        positions = before[:, :3] + fractions[:, np.newaxis] * (
+            after[:, :3] - before[:, :3]
+        )
+        rotations = quaternions_to_matrices(
+            slerp(before[:, 3:], after[:, 3:], fractions)
+        )
+        return positions, rotations
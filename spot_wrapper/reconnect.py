@@ -0,0 +1,179 @@
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+import typing
+from dataclasses import dataclass
+
+
+class RetryDeadlineExceeded(Exception):
+    """Raised when an operation is still failing once the deadline of its backoff policy has passed"""
+
+    def __init__(self, message="Retry deadline exceeded"):
+        super().__init__(message)
+
+
+class RetryCancelled(Exception):
+    """Raised when retrying is stopped before the operation succeeded"""
+
+    def __init__(self, message="Retry cancelled"):
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class BackoffPolicy:
+    """Jittered exponential backoff between attempts of an operation.
+
+    Attributes:
+        initial_delay: Delay in seconds after the first failed attempt
+        max_delay: Upper bound in seconds on the delay between two attempts
+        multiplier: Factor by which the delay grows after each failed attempt
+        jitter: Fraction of each delay which is randomised, in [0, 1]. A delay of d is drawn uniformly from
+                [d * (1 - jitter), d] so that several clients restarted together do not retry in lockstep.
+        deadline: Optional time in seconds after the first attempt at which to give up. None retries forever.
+    """
+
+    initial_delay: float = 0.5
+    max_delay: float = 15.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    deadline: typing.Optional[float] = None
+
+    def delay(self, attempt: int, rng: typing.Optional[random.Random] = None) -> float:
+        """Return the delay to wait after the given number of failed attempts.
+
+        Args:
+            attempt: Number of attempts which have failed so far, starting at 1
+            rng: Random number generator used for the jitter
+
+        Returns:
+            Delay in seconds
+        """
+        rng = rng or random
+        base = min(
+            self.max_delay, self.initial_delay * self.multiplier ** max(attempt - 1, 0)
+        )
+        return base * (1.0 - self.jitter * rng.random())
+
+
+class Reconnector:
+    """Retries an operation with a backoff policy until it succeeds, the deadline passes or it is stopped.
+
+    Operations can either be run blocking on the calling thread with run(), or on a background thread with
+    run_in_background(), which returns a future that is resolved once the operation succeeds.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        policy: typing.Optional[BackoffPolicy] = None,
+        retry_on: typing.Tuple[typing.Type[BaseException], ...] = (Exception,),
+        rng: typing.Optional[random.Random] = None,
+    ):
+        """
+        Args:
+            logger: Logger with which to print messages
+            policy: Backoff policy to use between attempts, the default policy if None
+            retry_on: Exception types which cause the operation to be retried. Any other exception is raised
+                      immediately.
+            rng: Random number generator used for the jitter
+        """
+        self._logger = logger
+        self._policy = policy or BackoffPolicy()
+        self._retry_on = retry_on
+        self._rng = rng or random.Random()
+        self._stop_event = threading.Event()
+
+    @property
+    def policy(self) -> BackoffPolicy:
+        return self._policy
+
+    def stop(self):
+        """Stop retrying. Any operation currently waiting between attempts raises RetryCancelled."""
+        self._stop_event.set()
+
+    def run(
+        self,
+        operation: typing.Callable[[], typing.Any],
+        description: str = "operation",
+        on_retry: typing.Optional[
+            typing.Callable[[BaseException, int, float], None]
+        ] = None,
+    ) -> typing.Any:
+        """Run an operation, retrying it until it succeeds.
+
+        Args:
+            operation: Zero-argument callable to run
+            description: Description of the operation used in log messages
+            on_retry: Optional callable taking the exception, the number of failed attempts and the delay before the
+                      next attempt. It replaces the default warning which is logged before each retry.
+
+        Returns:
+            The value returned by the operation
+
+        Raises:
+            RetryDeadlineExceeded: The operation was still failing when the deadline passed
+            RetryCancelled: stop() was called before the operation succeeded
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            if self._stop_event.is_set():
+                raise RetryCancelled(f"Stopped retrying {description}")
+            try:
+                return operation()
+            except self._retry_on as e:
+                attempt += 1
+                delay = self._policy.delay(attempt, self._rng)
+                if self._policy.deadline is not None:
+                    remaining = self._policy.deadline - (time.monotonic() - start)
+                    if remaining <= 0.0:
+                        raise RetryDeadlineExceeded(
+                            f"Giving up on {description} after {attempt} attempts: {e}"
+                        ) from e
+                    delay = min(delay, remaining)
+                if on_retry is not None:
+                    on_retry(e, attempt, delay)
+                else:
+                    self._logger.warning(
+                        "Attempt {} of {} failed: {}. Retrying in {:.2f} seconds".format(
+                            attempt, description, e, delay
+                        )
+                    )
+                if self._stop_event.wait(delay):
+                    raise RetryCancelled(f"Stopped retrying {description}") from e
+
+    def run_in_background(
+        self,
+        operation: typing.Callable[[], typing.Any],
+        description: str = "operation",
+        on_retry: typing.Optional[
+            typing.Callable[[BaseException, int, float], None]
+        ] = None,
+    ) -> concurrent.futures.Future:
+        """Run an operation on a background thread, retrying it until it succeeds.
+
+        Args:
+            operation: Zero-argument callable to run
+            description: Description of the operation used in log messages and for the thread name
+            on_retry: See run()
+
+        Returns:
+            Future which is resolved with the value returned by the operation, or with the exception which stopped
+            it from being retried
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+
+        def _run():
+            try:
+                future.set_result(self.run(operation, description, on_retry))
+            except BaseException as e:
+                future.set_exception(e)
+
+        thread = threading.Thread(
+            target=_run, name=f"reconnect-{description}", daemon=True
+        )
+        thread.start()
+        return future
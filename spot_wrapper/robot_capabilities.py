@@ -0,0 +1,81 @@
+import logging
+import typing
+from dataclasses import dataclass
+
+from bosdyn.client import ResponseError, RpcError
+from bosdyn.client.image import ImageClient
+from bosdyn.client.payload import PayloadClient
+from bosdyn.client.robot import Robot
+from bosdyn.client.robot_state import RobotStateClient
+
+
+@dataclass(frozen=True)
+class RobotCapabilities:
+    """Hardware configuration of the robot, which is queried once and shared by all components of the wrapper.
+
+    Attributes:
+        has_arm: True if the robot has an arm attached
+        payloads: Names of the enabled payloads registered on the robot
+        image_sources: Names of the image sources available on the robot
+    """
+
+    has_arm: bool
+    payloads: typing.Tuple[str, ...] = ()
+    image_sources: typing.FrozenSet[str] = frozenset()
+
+    def has_payload(self, name: str) -> bool:
+        """Return True if an enabled payload has the given name in its name"""
+        return any(name in payload for payload in self.payloads)
+
+    def has_image_source(self, name: str) -> bool:
+        """Return True if the robot provides the given image source"""
+        return name in self.image_sources
+
+    @classmethod
+    def from_robot(
+        cls,
+        robot: Robot,
+        timeout: typing.Optional[float] = None,
+        logger: typing.Optional[logging.Logger] = None,
+    ) -> "RobotCapabilities":
+        """Query the hardware configuration of a robot. The queries are sent in parallel.
+
+        The payloads are only informative, so a robot whose payloads cannot be listed, such as because the user is not
+        allowed to, is taken to have none rather than failing.
+
+        Args:
+            robot: Robot to query
+            timeout: Number of seconds to wait for each RPC response
+            logger: If set, a failure to list the payloads is logged with it
+
+        Raises:
+            RpcError: A problem occurred trying to communicate with the robot.
+        """
+        state_future = robot.ensure_client(
+            RobotStateClient.default_service_name
+        ).get_robot_state_async(timeout=timeout)
+        image_sources_future = robot.ensure_client(
+            ImageClient.default_service_name
+        ).list_image_sources_async(timeout=timeout)
+        payloads_future = robot.ensure_client(
+            PayloadClient.default_service_name
+        ).list_payloads_async(timeout=timeout)
+
+        try:
+            payloads = tuple(
+                payload.name
+                for payload in payloads_future.result()
+                if payload.is_enabled
+            )
+        except (ResponseError, RpcError) as e:
+            if logger is not None:
+                logger.warning(f"Unable to list the payloads, assuming none: {e}")
+            payloads = ()
+
+        return cls(
+            has_arm=state_future.result().HasField("manipulator_state"),
+            payloads=payloads,
+            image_sources=frozenset(
+                source.name for source in image_sources_future.result()
+            ),
+        )
@@ -0,0 +1,199 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import typing
+from dataclasses import dataclass, replace
+
+from bosdyn.client.async_tasks import AsyncPeriodicQuery
+
+
+@dataclass
+class TaskStatistics:
+    """Timing statistics of a periodic task run by the AsyncTaskScheduler.
+
+    Attributes:
+        name: Name of the task
+        period: Requested period of the task in seconds
+        runs: Number of times the task was started
+        total_lateness: Sum over all runs of the time in seconds between when the task was due and when it started
+        max_lateness: Largest lateness of a single run in seconds
+        first_run: Time at which the task was first started
+        last_run: Time at which the task was last started
+    """
+
+    name: str
+    period: float
+    runs: int = 0
+    total_lateness: float = 0.0
+    max_lateness: float = 0.0
+    first_run: typing.Optional[float] = None
+    last_run: typing.Optional[float] = None
+
+    @property
+    def requested_rate(self) -> float:
+        """Rate in Hz at which the task should run"""
+        return 1.0 / self.period if self.period > 0.0 else 0.0
+
+    @property
+    def achieved_rate(self) -> float:
+        """Average rate in Hz at which the task has actually run"""
+        if self.runs < 2 or self.last_run == self.first_run:
+            return 0.0
+        return (self.runs - 1) / (self.last_run - self.first_run)
+
+    @property
+    def mean_lateness(self) -> float:
+        """Average time in seconds between when the task was due and when it started"""
+        if self.runs == 0:
+            return 0.0
+        return self.total_lateness / self.runs
+
+    def record_run(self, start_time: float, lateness: float):
+        if self.first_run is None:
+            self.first_run = start_time
+        self.last_run = start_time
+        self.runs += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+
+class AsyncTaskScheduler:
+    """Runs periodic tasks on a dedicated background thread.
+
+    This is an alternative to calling AsyncTasks.update() from the host loop. Each task is kept in a heap ordered by
+    the time at which it is next due, and the scheduler thread sleeps until the earliest deadline. While the query of
+    a task is in flight the task is not in the heap; the task is put back as soon as its future completes so that the
+    result is collected without waiting for the next deadline.
+    """
+
+    def __init__(
+        self,
+        tasks: typing.Iterable[AsyncPeriodicQuery],
+        logger: logging.Logger,
+        name: str = "spot-task-scheduler",
+    ):
+        """
+        Args:
+            tasks: Periodic tasks to run
+            logger: Logger object
+            name: Name of the scheduler thread
+        """
+        self._logger = logger
+        self._name = name
+        self._tasks: typing.List[AsyncPeriodicQuery] = []
+        self._statistics: typing.List[TaskStatistics] = []
+        self._heap: typing.List[typing.Tuple[float, int, int]] = []
+        self._queued: typing.Set[int] = set()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._running = False
+        for task in tasks:
+            self.add_task(task)
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def add_task(self, task: AsyncPeriodicQuery):
+        """Add a task to be run by the scheduler. Tasks added while the scheduler is running are due immediately.
+
+        Args:
+            task: Task to add
+        """
+        with self._condition:
+            self._tasks.append(task)
+            self._statistics.append(
+                TaskStatistics(name=task._query_name, period=task._period_sec)
+            )
+            if self._running:
+                self._push(time.time(), len(self._tasks) - 1)
+
+    def start(self):
+        """Start running the tasks on the scheduler thread"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._heap = []
+            self._queued = set()
+            now = time.time()
+            for index in range(len(self._tasks)):
+                self._push(now, index)
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: typing.Optional[float] = None):
+        """Stop the scheduler thread. Queries which are in flight are not cancelled.
+
+        Args:
+            timeout: Maximum time in seconds to wait for the thread to exit
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def statistics(self) -> typing.Dict[str, TaskStatistics]:
+        """Return a snapshot of the timing statistics of each task, keyed by task name"""
+        with self._condition:
+            return {stats.name: replace(stats) for stats in self._statistics}
+
+    def _push(self, deadline: float, index: int):
+        # Must be called with the condition held. Each task is in the heap at most once.
+        if index in self._queued:
+            return
+        self._queued.add(index)
+        heapq.heappush(self._heap, (deadline, next(self._sequence), index))
+        self._condition.notify()
+
+    def _wake(self, index: int):
+        with self._condition:
+            if self._running:
+                self._push(time.time(), index)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._condition.wait(self._heap[0][0] - now if self._heap else None)
+                if not self._running:
+                    return
+                _, _, index = heapq.heappop(self._heap)
+                self._queued.discard(index)
+            self._service(index)
+
+    def _service(self, index: int):
+        task = self._tasks[index]
+        due = task._last_call + task._period_sec
+        last_call = task._last_call
+        try:
+            # The first update collects the result of a finished query, the second starts a new query if one is due
+            task.update()
+            if task._future is None:
+                task.update()
+        except Exception as e:
+            self._logger.error(f"Task {task._query_name} failed with error: {e}")
+            if task._future is not None and task._future.done():
+                task._future = None
+
+        if task._last_call != last_call:
+            # The first run of a task has no deadline to be late for
+            lateness = max(0.0, task._last_call - due) if last_call else 0.0
+            with self._condition:
+                self._statistics[index].record_run(task._last_call, lateness)
+
+        if task._future is not None:
+            # Reschedule once the query completes. If it has already completed the callback runs immediately.
+            task._future.add_done_callback(lambda _: self._wake(index))
+        else:
+            with self._condition:
+                if self._running:
+                    self._push(task._last_call + task._period_sec, index)
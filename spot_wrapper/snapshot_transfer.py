@@ -0,0 +1,149 @@
+import concurrent.futures
+import logging
+import threading
+import time
+import typing
+
+"""Default number of graph nav snapshots transferred at once"""
+DEFAULT_SNAPSHOT_TRANSFER_CONCURRENCY = 8
+
+"""Minimum time in seconds between two progress log lines of a snapshot transfer"""
+PROGRESS_LOG_PERIOD = 2.0
+
+
+class SnapshotTransferError(Exception):
+    """Raised when some snapshots of a map could not be transferred"""
+
+
+class TransferProgress:
+    """Counts the snapshots and bytes of a transfer, and logs its progress and throughput.
+
+    Snapshots are counted from the transfer threads, so the counters are guarded by a lock. The progress is logged at
+    most every log_period seconds rather than once per snapshot.
+    """
+
+    def __init__(
+        self,
+        action: str,
+        kind: str,
+        total: int,
+        logger: logging.Logger,
+        log_period: float = PROGRESS_LOG_PERIOD,
+    ):
+        """
+        Args:
+            action: What is done to the snapshots, such as "Downloaded", used in the log lines
+            kind: What is transferred, such as "waypoint snapshots", used in the log lines
+            total: Number of snapshots to transfer
+            logger: Logger object
+            log_period: Minimum time in seconds between two progress log lines
+        """
+        self._action = action
+        self._kind = kind
+        self._total = total
+        self._logger = logger
+        self._log_period = log_period
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+        self._last_log_time = self._start_time
+        self.transferred = 0
+        self.skipped = 0
+        self.failed = 0
+        self.num_bytes = 0
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    @property
+    def kind(self) -> str:
+        return self._kind
+
+    @property
+    def elapsed(self) -> float:
+        """Return the time in seconds since the transfer started"""
+        return time.time() - self._start_time
+
+    @property
+    def throughput(self) -> float:
+        """Return the number of bytes transferred per second since the transfer started"""
+        elapsed = self.elapsed
+        return self.num_bytes / elapsed if elapsed > 0.0 else 0.0
+
+    def add_transferred(self, num_bytes: int):
+        with self._lock:
+            self.transferred += 1
+            self.num_bytes += num_bytes
+            self._maybe_log()
+
+    def add_skipped(self):
+        with self._lock:
+            self.skipped += 1
+            self._maybe_log()
+
+    def add_failed(self):
+        with self._lock:
+            self.failed += 1
+            self._maybe_log()
+
+    def _maybe_log(self):
+        # Must be called with the lock held
+        now = time.time()
+        if now - self._last_log_time >= self._log_period:
+            self._last_log_time = now
+            self._logger.info(self.summary())
+
+    def summary(self) -> str:
+        return "{} {} of {} {} ({} skipped, {} failed), {:.1f} MB in {:.1f} s at {:.1f} MB/s".format(
+            self._action,
+            self.transferred + self.skipped,
+            self._total,
+            self._kind,
+            self.skipped,
+            self.failed,
+            self.num_bytes / 1e6,
+            self.elapsed,
+            self.throughput / 1e6,
+        )
+
+
+def transfer_snapshots(
+    snapshot_ids: typing.Iterable[str],
+    transfer: typing.Callable[[str], typing.Optional[int]],
+    progress: TransferProgress,
+    logger: logging.Logger,
+    max_workers: int = DEFAULT_SNAPSHOT_TRANSFER_CONCURRENCY,
+) -> TransferProgress:
+    """Transfer snapshots on a pool of threads, so that the RPCs of some snapshots overlap with the disk access of
+    others. Each snapshot is handled by one thread from start to end, so at most max_workers snapshots are in memory.
+
+    Args:
+        snapshot_ids: Ids of the snapshots to transfer
+        transfer: Function transferring a snapshot and returning the number of bytes transferred, or None if the
+                  snapshot was skipped. Exceptions are logged and counted as failures.
+        progress: Progress of the transfer, which is updated and logged
+        logger: Logger object
+        max_workers: Maximum number of snapshots transferred at once
+
+    Returns:
+        The progress, once all snapshots were transferred
+    """
+
+    def transfer_one(snapshot_id: str):
+        try:
+            num_bytes = transfer(snapshot_id)
+        except Exception as e:
+            logger.error(f"Failed to transfer snapshot {snapshot_id}: {e}")
+            progress.add_failed()
+            return
+        if num_bytes is None:
+            progress.add_skipped()
+        else:
+            progress.add_transferred(num_bytes)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="snapshot-transfer"
+    ) as executor:
+        executor.map(transfer_one, snapshot_ids)
+    logger.info(progress.summary())
+    return progress
@@ -23,6 +23,8 @@ from bosdyn.client.robot_state import RobotStateClient
 from bosdyn.client.time_sync import TimeSyncEndpoint
 from bosdyn.util import seconds_to_duration
 
+from .frame_buffer import ImageFrameBuffers
+
 """List of hand image sources for asynchronous periodic query"""
 HAND_IMAGE_SOURCES = [
     "hand_image",
@@ -40,6 +42,7 @@ class AsyncImageService(AsyncPeriodicQuery):
         logger: Logger object
         rate: Rate (Hz) to trigger the query
         callback: Callback function to call when the results of the query are available
+        frame_buffers: If set, the images of every response are decoded and added to these buffers
     """
 
     def __init__(self, client, logger, rate, callback, image_requests):
@@ -50,6 +53,7 @@ class AsyncImageService(AsyncPeriodicQuery):
         if rate > 0.0:
             self._callback = callback
         self._image_requests = image_requests
+        self.frame_buffers: typing.Optional[ImageFrameBuffers] = None
 
     def _start_query(self):
         if self._callback:
@@ -57,6 +61,11 @@ class AsyncImageService(AsyncPeriodicQuery):
             callback_future.add_done_callback(self._callback)
             return callback_future
 
+    def _handle_result(self, result):
+        self._proto = result
+        if self.frame_buffers is not None:
+            self.frame_buffers.add_images(result)
+
 
 class SpotArm:
     def __init__(
@@ -166,7 +175,7 @@ class SpotArm:
         )
 
     def ensure_arm_power_and_stand(self) -> typing.Tuple[bool, str]:
-        if not self._robot.has_arm():
+        if not self._robot_params["capabilities"].has_arm:
             return False, "Spot with an arm is required for this service"
 
         try:
@@ -21,7 +21,7 @@ class SpotCheck:
     ):
         self._robot = robot
         self._logger = logger
-        self._spot_check_client: SpotCheckClient = robot_clients["spot_check_client"]
+        self._robot_clients = robot_clients
         self._robot_command_client: robot_command.RobotCommandClient = robot_clients[
             "robot_command_client"
         ]
@@ -30,6 +30,11 @@ class SpotCheck:
         self._spot_check_resp = None
         self._lease_wallet: LeaseWallet = self._lease_client.lease_wallet
 
+    @property
+    def _spot_check_client(self) -> SpotCheckClient:
+        # Spot check is rarely run, so the client is created on first use
+        return self._robot_clients["spot_check_client"]
+
     @property
     def spot_check_resp(self) -> spot_check_pb2.SpotCheckFeedbackResponse:
         return self._spot_check_resp
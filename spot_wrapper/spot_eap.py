@@ -2,9 +2,17 @@ import logging
 import typing
 
 from bosdyn.client.async_tasks import AsyncPeriodicQuery
+from bosdyn.client.frame_helpers import ODOM_FRAME_NAME
 from bosdyn.client.point_cloud import PointCloudClient, build_pc_request
 from bosdyn.client.robot import Robot
 
+from .point_cloud_decoding import (
+    DecodedPointCloud,
+    PointCloudAccumulator,
+    decode_point_cloud_responses,
+)
+from .pose_history import PoseHistory
+
 """List of point cloud sources"""
 point_cloud_sources = ["velodyne-point-cloud"]
 
@@ -19,6 +27,7 @@ class AsyncPointCloudService(AsyncPeriodicQuery):
         logger: Logger object
         rate: Rate (Hz) to trigger the query
         callback: Callback function to call when the results of the query are available
+        accumulator: If set, the point cloud of every response is added to this accumulator
     """
 
     def __init__(self, client, logger, rate, callback, point_cloud_requests):
@@ -29,6 +38,7 @@ class AsyncPointCloudService(AsyncPeriodicQuery):
         if rate > 0.0:
             self._callback = callback
         self._point_cloud_requests = point_cloud_requests
+        self.accumulator: typing.Optional[PointCloudAccumulator] = None
 
     def _start_query(self):
         if self._callback and self._point_cloud_requests:
@@ -38,6 +48,15 @@ class AsyncPointCloudService(AsyncPeriodicQuery):
             callback_future.add_done_callback(self._callback)
             return callback_future
 
+    def _handle_result(self, result):
+        self._proto = result
+        if self.accumulator is not None:
+            # The task would be stuck with a result it can never handle if the error reached update()
+            try:
+                self.accumulator.add_responses(result)
+            except Exception as e:
+                self._logger.error(f"Dropped a point cloud response: {e}")
+
 
 class SpotEAP:
     def __init__(
@@ -70,3 +89,46 @@ class SpotEAP:
     def async_task(self) -> AsyncPeriodicQuery:
         """Returns the async PointCloudService task for the robot"""
         return self._point_cloud_task
+
+    @property
+    def decoded_point_clouds(self) -> typing.List[DecodedPointCloud]:
+        """Return the point clouds of the latest responses of the point cloud task, decoded without copying. Point
+        clouds which cannot be decoded are logged and skipped."""
+        responses = self._point_cloud_task.proto
+        if not responses:
+            return []
+        return decode_point_cloud_responses(responses, self._logger)
+
+    def start_accumulating(
+        self,
+        max_scans: int,
+        frame_name: str = ODOM_FRAME_NAME,
+        pose_history: typing.Optional[PoseHistory] = None,
+        scan_duration: float = 0.1,
+        max_age: typing.Optional[float] = None,
+    ) -> PointCloudAccumulator:
+        """Keep the last scans received by the point cloud task, transformed into a fixed frame.
+
+        Args:
+            max_scans: Number of scans to keep
+            frame_name: Frame the scans are transformed into, such as "odom"
+            pose_history: If set, the scans are de-skewed with this history of the pose of the body in odom
+            scan_duration: Time in seconds taken to capture a scan, used to de-skew the scans
+            max_age: If set, scans acquired more than this many seconds before the latest scan are dropped
+
+        Returns:
+            The accumulator, which is also available from accumulator
+        """
+        self._point_cloud_task.accumulator = PointCloudAccumulator(
+            max_scans, frame_name, pose_history, scan_duration, max_age
+        )
+        return self._point_cloud_task.accumulator
+
+    def stop_accumulating(self):
+        """Stop adding scans to the accumulator started by start_accumulating"""
+        self._point_cloud_task.accumulator = None
+
+    @property
+    def accumulator(self) -> typing.Optional[PointCloudAccumulator]:
+        """Return the accumulator started by start_accumulating, or None"""
+        return self._point_cloud_task.accumulator
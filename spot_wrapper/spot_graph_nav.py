@@ -1,8 +1,7 @@
 import logging
 import math
-import os
-import time
 import typing
+from dataclasses import dataclass
 
 from bosdyn.api.graph_nav import graph_nav_pb2
 from bosdyn.api.graph_nav import map_pb2
@@ -16,6 +15,59 @@ from bosdyn.client.robot import Robot
 from bosdyn.client.robot_state import RobotStateClient
 from google.protobuf import wrappers_pb2
 
+from .graph_index import GraphIndex, id_to_short_code
+from .graph_planner import NoRouteError, RoutePlanner
+from .map_archive import (
+    MAP_ARCHIVE_COMPRESSION_LEVEL,
+    MapArchive,
+    MapDirectory,
+    open_map,
+    open_map_writer,
+)
+from .navigation_handle import DEFAULT_NAVIGATION_FEEDBACK_RATE, NavigationHandle
+from .snapshot_transfer import (
+    DEFAULT_SNAPSHOT_TRANSFER_CONCURRENCY,
+    SnapshotTransferError,
+    TransferProgress,
+    transfer_snapshots,
+)
+
+
+@dataclass(frozen=True)
+class WaypointSummary:
+    """A waypoint of a graph, as listed by list_graph.
+
+    Attributes:
+        id: Unique id of the waypoint
+        name: Annotation name of the waypoint, or an empty string
+        short_code: 2 letter short code of the waypoint, or None if it is not unique in the graph
+        creation_time: Time the waypoint was created at in seconds, or 0 for waypoints of older maps
+        is_localized: Whether the robot is localized to the waypoint
+    """
+
+    id: str
+    name: str
+    short_code: typing.Optional[str]
+    creation_time: float
+    is_localized: bool
+
+
+@dataclass(frozen=True)
+class GraphSummary:
+    """Summary of the waypoints and edges of a graph, as listed by list_graph.
+
+    Attributes:
+        waypoints: The waypoints, sorted by creation time and then by name
+        name_to_id: The waypoint id of each annotation name, or None for names used by several waypoints
+        edges: The ids of the waypoints with an edge to each waypoint, keyed by waypoint id
+        num_edges: Number of edges in the graph
+    """
+
+    waypoints: typing.Tuple[WaypointSummary, ...]
+    name_to_id: typing.Dict[str, typing.Optional[str]]
+    edges: typing.Dict[str, typing.List[str]]
+    num_edges: int
+
 
 class SpotGraphNav:
     def __init__(
@@ -27,17 +79,27 @@ class SpotGraphNav:
     ):
         self._robot = robot
         self._logger = logger
+        self._robot_clients = robot_clients
         self._graph_nav_client: GraphNavClient = robot_clients["graph_nav_client"]
-        self._map_processing_client: MapProcessingServiceClient = robot_clients[
-            "map_processing_client"
-        ]
         self._robot_state_client: RobotStateClient = robot_clients["robot_state_client"]
         self._lease_client: LeaseClient = robot_clients["lease_client"]
         self._lease_wallet: LeaseWallet = self._lease_client.lease_wallet
         self._robot_params = robot_params
+        self._snapshot_transfer_concurrency = DEFAULT_SNAPSHOT_TRANSFER_CONCURRENCY
+        self._map_compression_level = MAP_ARCHIVE_COMPRESSION_LEVEL
+        # Map the snapshots of the current graph are read from, opened on first use
+        self._current_map_path: typing.Optional[str] = None
+        self._current_map: typing.Optional[typing.Union[MapArchive, MapDirectory]] = (
+            None
+        )
 
         self._init_current_graph_nav_state()
 
+    @property
+    def _map_processing_client(self) -> MapProcessingServiceClient:
+        # Only needed for map processing, so the client is created on first use
+        return self._robot_clients["map_processing_client"]
+
     def _get_lease(self) -> Lease:
         self._lease = self._lease_wallet.get_lease()
         return self._lease
@@ -45,21 +107,21 @@ class SpotGraphNav:
     def _init_current_graph_nav_state(self):
         # Store the most recent knowledge of the state of the robot based on rpc calls.
         self._current_graph = None
-        self._current_edges = dict()  # maps to_waypoint to list(from_waypoint)
-        self._current_waypoint_snapshots = dict()  # maps id to waypoint snapshot
-        self._current_edge_snapshots = dict()  # maps id to edge snapshot
-        self._current_annotation_name_to_wp_id = dict()
+        self._graph_index = GraphIndex()
+        self._graph_summary = None
+        self._route_planner = RoutePlanner(self._graph_index)
         self._current_anchored_world_objects = (
             dict()
         )  # maps object id to a (wo, waypoint, fiducial)
         self._current_anchors = dict()  # maps anchor id to anchor
+        self._set_current_map(None)
 
-    def list_graph(self) -> typing.List[str]:
+    def list_graph(self, log_items: bool = False) -> typing.List[str]:
         """List waypoint ids of graph_nav
         Args:
-          upload_path : Path to the root directory of the map.
+          log_items : Log a line per waypoint and per edge of the graph.
         """
-        ids, eds = self._list_graph_waypoint_and_edge_ids()
+        ids, eds = self._list_graph_waypoint_and_edge_ids(log_items=log_items)
 
         return [
             v
@@ -125,20 +187,34 @@ class SpotGraphNav:
     def navigate_through_route(self, waypoint_ids: typing.List[str]):
         """
         Args:
-            waypoint_ids: List[str] of waypoints to follow
+            waypoint_ids: List[str] of waypoints to follow. Consecutive waypoints do not need to be adjacent.
         """
         self._get_localization_state()
         self._logger.info(f"Waypoint ids: {','.join(waypoint_ids)}")
         resp = self._navigate_route(waypoint_ids)
         return resp
 
-    def download_navigation_graph(self, download_path: str) -> typing.List[str]:
-        """Download the navigation graph.
+    def download_navigation_graph(
+        self,
+        download_path: str,
+        max_concurrent_transfers: int = DEFAULT_SNAPSHOT_TRANSFER_CONCURRENCY,
+        compression_level: int = MAP_ARCHIVE_COMPRESSION_LEVEL,
+    ) -> typing.List[str]:
+        """Download the navigation graph. Snapshots already in the map are not downloaded again.
         Args:
-            download_path : Path to the root directory of the map.
+            download_path : Path to the map. A path ending with .spotmap is written as a single file map archive, and
+                            any other path as the root directory of the map.
+            max_concurrent_transfers : Maximum number of snapshots downloaded at once.
+            compression_level : zlib compression level of the snapshots of a map archive, from 0 to store them
+                                uncompressed, as fast as a map directory, to 9.
         """
         self._download_filepath = download_path
+        self._snapshot_transfer_concurrency = max_concurrent_transfers
+        self._map_compression_level = compression_level
+        # The archive may be truncated while it is written, so it must not stay mapped meanwhile
+        self._set_current_map(None)
         self._download_full_graph()
+        self._set_current_map(download_path)
         return self.list_graph()
 
     def navigation_close_loops(
@@ -187,12 +263,7 @@ class SpotGraphNav:
             # If no waypoint id is given as input, then return without initializing.
             self._logger.error("No waypoint specified to initialize to.")
             return
-        destination_waypoint = self._find_unique_waypoint_id(
-            args[0][0],
-            self._current_graph,
-            self._current_annotation_name_to_wp_id,
-            self._logger,
-        )
+        destination_waypoint = self._resolve_waypoint_id(args[0][0])
         if not destination_waypoint:
             self._logger.error("Failed to find waypoint id.")
             return
@@ -220,6 +291,7 @@ class SpotGraphNav:
             self._logger.error("Empty graph.")
             return
         self._current_graph = graph
+        self._graph_index.update(graph)
         return graph
 
     def _download_full_graph(self, *args):
@@ -228,87 +300,98 @@ class SpotGraphNav:
         if graph is None:
             self._logger.info("Failed to download the graph.")
             return
-        self._write_full_graph(graph)
-        self._logger.info(
-            "Graph downloaded with {} waypoints and {} edges".format(
-                len(graph.waypoints), len(graph.edges)
+        with open_map_writer(
+            self._download_filepath, self._map_compression_level
+        ) as map_writer:
+            map_writer.write_graph(graph.SerializeToString())
+            self._logger.info(
+                "Graph downloaded with {} waypoints and {} edges".format(
+                    len(graph.waypoints), len(graph.edges)
+                )
             )
-        )
-        # Download the waypoint and edge snapshots.
-        self._download_and_write_waypoint_snapshots(graph.waypoints)
-        self._download_and_write_edge_snapshots(graph.edges)
+            # Download the waypoint and edge snapshots.
+            self._download_and_write_waypoint_snapshots(graph.waypoints, map_writer)
+            self._download_and_write_edge_snapshots(graph.edges, map_writer)
 
-    def _write_full_graph(self, graph):
-        """Download the graph from robot to the specified, local filepath location."""
-        graph_bytes = graph.SerializeToString()
-        self._write_bytes(self._download_filepath, "/graph", graph_bytes)
-
-    def _download_and_write_waypoint_snapshots(self, waypoints):
+    def _download_and_write_waypoint_snapshots(self, waypoints, map_writer=None):
         """Download the waypoint snapshots from robot to the specified, local filepath location."""
-        num_waypoint_snapshots_downloaded = 0
-        for waypoint in waypoints:
-            if len(waypoint.snapshot_id) == 0:
-                continue
-            try:
-                waypoint_snapshot = self._graph_nav_client.download_waypoint_snapshot(
-                    waypoint.snapshot_id
+        if map_writer is None:
+            with open_map_writer(
+                self._download_filepath, self._map_compression_level
+            ) as map_writer:
+                return self._download_and_write_waypoint_snapshots(
+                    waypoints, map_writer
                 )
-            except Exception:
-                # Failure in downloading waypoint snapshot. Continue to next snapshot.
-                self._logger.error(
-                    "Failed to download waypoint snapshot: " + waypoint.snapshot_id
-                )
-                continue
-            self._write_bytes(
-                self._download_filepath + "/waypoint_snapshots",
-                "/" + waypoint.snapshot_id,
-                waypoint_snapshot.SerializeToString(),
-            )
-            num_waypoint_snapshots_downloaded += 1
-            self._logger.info(
-                "Downloaded {} of the total {} waypoint snapshots.".format(
-                    num_waypoint_snapshots_downloaded, len(waypoints)
-                )
-            )
+        return self._download_and_write_snapshots(
+            [waypoint.snapshot_id for waypoint in waypoints],
+            map_writer.has_waypoint_snapshot,
+            map_writer.write_waypoint_snapshot,
+            self._graph_nav_client.download_waypoint_snapshot,
+            "waypoint snapshots",
+        )
 
-    def _download_and_write_edge_snapshots(self, edges):
+    def _download_and_write_edge_snapshots(self, edges, map_writer=None):
         """Download the edge snapshots from robot to the specified, local filepath location."""
-        num_edge_snapshots_downloaded = 0
-        num_to_download = 0
-        for edge in edges:
-            if len(edge.snapshot_id) == 0:
-                continue
-            num_to_download += 1
-            try:
-                edge_snapshot = self._graph_nav_client.download_edge_snapshot(
-                    edge.snapshot_id
-                )
-            except Exception:
-                # Failure in downloading edge snapshot. Continue to next snapshot.
-                self._logger.error(
-                    "Failed to download edge snapshot: " + edge.snapshot_id
-                )
-                continue
-            self._write_bytes(
-                self._download_filepath + "/edge_snapshots",
-                "/" + edge.snapshot_id,
-                edge_snapshot.SerializeToString(),
-            )
-            num_edge_snapshots_downloaded += 1
-            self._logger.info(
-                "Downloaded {} of the total {} edge snapshots.".format(
-                    num_edge_snapshots_downloaded, num_to_download
-                )
-            )
+        if map_writer is None:
+            with open_map_writer(
+                self._download_filepath, self._map_compression_level
+            ) as map_writer:
+                return self._download_and_write_edge_snapshots(edges, map_writer)
+        return self._download_and_write_snapshots(
+            [edge.snapshot_id for edge in edges],
+            map_writer.has_edge_snapshot,
+            map_writer.write_edge_snapshot,
+            self._graph_nav_client.download_edge_snapshot,
+            "edge snapshots",
+        )
+
+    def _download_and_write_snapshots(
+        self,
+        snapshot_ids: typing.List[str],
+        has_snapshot: typing.Callable[[str], bool],
+        write_snapshot: typing.Callable[[str, bytes], typing.Any],
+        download: typing.Callable[[str], typing.Any],
+        kind: str,
+    ) -> TransferProgress:
+        """Download snapshots with several RPCs in flight and write them to the map.
 
-    def _write_bytes(self, filepath: str, filename: str, data):
-        """Write data to a file."""
-        os.makedirs(filepath, exist_ok=True)
-        with open(filepath + filename, "wb+") as f:
-            f.write(data)
-            f.close()
+        Snapshots which are already in the map are not downloaded again, so an interrupted download can be resumed.
 
-    def _list_graph_waypoint_and_edge_ids(self, *args):
+        Args:
+            snapshot_ids: Ids of the snapshots, empty ids are ignored
+            has_snapshot: Function returning whether the snapshot with an id is already in the map
+            write_snapshot: Function writing the serialized snapshot with an id to the map
+            download: Function downloading the snapshot with an id
+            kind: Name of the snapshots for the log lines, such as "waypoint snapshots"
+
+        Returns:
+            The progress of the download, with the number of downloaded, skipped and failed snapshots
+        """
+        # Keep the order of the snapshots, but only download each one once
+        snapshot_ids = list(dict.fromkeys(i for i in snapshot_ids if len(i) > 0))
+
+        def download_and_write(snapshot_id: str) -> typing.Optional[int]:
+            if has_snapshot(snapshot_id):
+                return None
+            data = download(snapshot_id).SerializeToString()
+            write_snapshot(snapshot_id, data)
+            return len(data)
+
+        progress = TransferProgress("Downloaded", kind, len(snapshot_ids), self._logger)
+        return transfer_snapshots(
+            snapshot_ids,
+            download_and_write,
+            progress,
+            self._logger,
+            max_workers=self._snapshot_transfer_concurrency,
+        )
+
+    @property
+    def graph_summary(self) -> typing.Optional[GraphSummary]:
+        """Return the summary of the graph listed last by list_graph, or None"""
+        return self._graph_summary
+
+    def _list_graph_waypoint_and_edge_ids(self, *args, log_items: bool = False):
         """List the waypoint ids and edge ids of the graph currently on the robot."""
 
         # Download current graph
@@ -318,92 +401,62 @@ class SpotGraphNav:
             self._graph_nav_client.get_localization_state().localization.waypoint_id
         )
 
-        # Update and print waypoints and edges
-        (
-            self._current_annotation_name_to_wp_id,
-            self._current_edges,
-        ) = self._update_waypoints_and_edges(graph, localization_id, self._logger)
-        return self._current_annotation_name_to_wp_id, self._current_edges
+        # Update and print waypoints and edges, from the index updated with the graph
+        return self._update_waypoints_and_edges(
+            graph,
+            localization_id,
+            self._logger,
+            log_items=log_items,
+            index=self._graph_index,
+        )
+
+    def upload_graph_and_snapshots(
+        self,
+        upload_filepath: str,
+        max_concurrent_transfers: int = DEFAULT_SNAPSHOT_TRANSFER_CONCURRENCY,
+    ):
+        """Upload the graph and snapshots to the robot.
+
+        Only the snapshots which the robot does not already have are uploaded. They are loaded from disk, parsed and
+        uploaded by a pool of threads, so that at most max_concurrent_transfers snapshots are in memory at once. They
+        are not kept once uploaded, and can be read again from the map with read_waypoint_snapshot and
+        read_edge_snapshot.
+
+        Args:
+            upload_filepath: Path to the map, either a map archive or the root directory of the map
+            max_concurrent_transfers: Maximum number of snapshots uploaded at once
 
-    def upload_graph_and_snapshots(self, upload_filepath: str):
-        """Upload the graph and snapshots to the robot."""
+        Raises:
+            SnapshotTransferError: Some snapshots could not be read from the map or uploaded. The other snapshots are
+                                   still uploaded, but the robot does not have the full map.
+        """
         self._logger.info("Loading the graph from disk into local storage...")
-        with open(os.path.join(upload_filepath, "graph"), "rb") as graph_file:
+        self._set_current_map(None)
+        with open_map(upload_filepath) as map_reader:
             # Load the graph from disk.
-            data = graph_file.read()
-            self._current_graph = map_pb2.Graph()
-            self._current_graph.ParseFromString(data)
+            self._current_graph = map_pb2.Graph.FromString(map_reader.read_graph())
+            self._graph_index.update(self._current_graph)
             self._logger.info(
                 "Loaded graph has {} waypoints and {} edges".format(
                     len(self._current_graph.waypoints), len(self._current_graph.edges)
                 )
             )
-        for waypoint in self._current_graph.waypoints:
-            # Load the waypoint snapshots from disk.
-            if len(waypoint.snapshot_id) == 0:
-                continue
-            waypoint_filepath = os.path.join(
-                upload_filepath, "waypoint_snapshots", waypoint.snapshot_id
-            )
-            if not os.path.exists(waypoint_filepath):
-                continue
-            with open(waypoint_filepath, "rb") as snapshot_file:
-                waypoint_snapshot = map_pb2.WaypointSnapshot()
-                waypoint_snapshot.ParseFromString(snapshot_file.read())
-                self._current_waypoint_snapshots[
-                    waypoint_snapshot.id
-                ] = waypoint_snapshot
-
-                for fiducial in waypoint_snapshot.objects:
-                    if not fiducial.HasField("apriltag_properties"):
-                        continue
-
-                    str_id = str(fiducial.apriltag_properties.tag_id)
-                    if (
-                        str_id in self._current_anchored_world_objects
-                        and len(self._current_anchored_world_objects[str_id]) == 1
-                    ):
-                        # Replace the placeholder tuple with a tuple of (wo, waypoint, fiducial).
-                        anchored_wo = self._current_anchored_world_objects[str_id][0]
-                        self._current_anchored_world_objects[str_id] = (
-                            anchored_wo,
-                            waypoint,
-                            fiducial,
-                        )
-        for edge in self._current_graph.edges:
-            # Load the edge snapshots from disk.
-            if len(edge.snapshot_id) == 0:
-                continue
-            edge_filepath = os.path.join(
-                upload_filepath, "edge_snapshots", edge.snapshot_id
-            )
-            if not os.path.exists(edge_filepath):
-                continue
-            with open(edge_filepath, "rb") as snapshot_file:
-                edge_snapshot = map_pb2.EdgeSnapshot()
-                edge_snapshot.ParseFromString(snapshot_file.read())
-                self._current_edge_snapshots[edge_snapshot.id] = edge_snapshot
-        for anchor in self._current_graph.anchoring.anchors:
-            self._current_anchors[anchor.id] = anchor
-        # Upload the graph to the robot.
-        self._logger.info("Uploading the graph and snapshots to the robot...")
-        if self._lease is None:
-            self._logger.error(
-                "Graph nav module did not have a lease to the robot. Claim it before attempting to upload the graph "
-                "and snapshots."
-            )
-            return
+            for anchor in self._current_graph.anchoring.anchors:
+                self._current_anchors[anchor.id] = anchor
+            # Upload the graph to the robot.
+            self._logger.info("Uploading the graph and snapshots to the robot...")
+            if self._lease is None:
+                self._logger.error(
+                    "Graph nav module did not have a lease to the robot. Claim it before attempting to upload the "
+                    "graph and snapshots."
+                )
+                return
 
-        self._graph_nav_client.upload_graph(
-            lease=self._lease.lease_proto, graph=self._current_graph
-        )
-        # Upload the snapshots to the robot.
-        for waypoint_snapshot in self._current_waypoint_snapshots.values():
-            self._graph_nav_client.upload_waypoint_snapshot(waypoint_snapshot)
-            self._logger.info("Uploaded {}".format(waypoint_snapshot.id))
-        for edge_snapshot in self._current_edge_snapshots.values():
-            self._graph_nav_client.upload_edge_snapshot(edge_snapshot)
-            self._logger.info("Uploaded {}".format(edge_snapshot.id))
+            response = self._graph_nav_client.upload_graph(
+                lease=self._lease.lease_proto, graph=self._current_graph
+            )
+            self._upload_snapshots(map_reader, response, max_concurrent_transfers)
+        self._set_current_map(upload_filepath)
 
         # The upload is complete! Check that the robot is localized to the graph,
         # and it if is not, prompt the user to localize the robot before attempting
@@ -416,189 +469,345 @@ class SpotGraphNav:
                 "fiducial before attempting a navigation command."
             )
 
-    def _navigate_to(self, waypoint_id: str) -> typing.Tuple[bool, str]:
-        """Navigate to a specific waypoint."""
-        self._lease = self._get_lease()
-        destination_waypoint = self._find_unique_waypoint_id(
-            waypoint_id,
-            self._current_graph,
-            self._current_annotation_name_to_wp_id,
-            self._logger,
-        )
-        if not destination_waypoint:
-            self._logger.error(
-                "Failed to find the appropriate unique waypoint id for the navigation command."
-            )
-            return (
-                False,
-                "Failed to find the appropriate unique waypoint id for the navigation command.",
-            )
-
-        # Stop the lease keepalive and create a new sublease for graphnav.
-        self._lease = self._lease_wallet.advance()
-        sublease = self._lease.create_sublease()
-        self._lease_keepalive.shutdown()
+    def _upload_snapshots(
+        self,
+        map_reader: typing.Union[MapArchive, MapDirectory],
+        response: graph_nav_pb2.UploadGraphResponse,
+        max_concurrent_transfers: int,
+    ):
+        """Upload the snapshots which the robot does not have cached, according to the response to upload_graph.
 
-        # Navigate to the destination waypoint.
-        is_finished = False
-        nav_to_cmd_id = -1
-        while not is_finished:
-            # Issue the navigation command about twice a second such that it is easy to terminate the
-            # navigation command (with estop or killing the program).
-            nav_to_cmd_id = self._graph_nav_client.navigate_to(
-                destination_waypoint, 1.0, leases=[sublease.lease_proto]
+        Raises:
+            SnapshotTransferError: Some snapshots could not be read from the map or uploaded
+        """
+        waypoints_by_snapshot_id = {
+            waypoint.snapshot_id: waypoint for waypoint in self._current_graph.waypoints
+        }
+
+        def upload_waypoint_snapshot(snapshot_id: str) -> int:
+            data = map_reader.read_waypoint_snapshot(snapshot_id)
+            waypoint_snapshot = map_pb2.WaypointSnapshot.FromString(data)
+            self._match_anchored_fiducials(
+                waypoints_by_snapshot_id[snapshot_id], waypoint_snapshot
             )
-            time.sleep(0.5)  # Sleep for half a second to allow for command execution.
-            # Poll the robot for feedback to determine if the navigation command is complete.
-            is_finished = self._check_success(nav_to_cmd_id)
-
-        self._lease = self._lease_wallet.advance()
-        self._lease_keepalive = LeaseKeepAlive(self._lease_client)
+            self._graph_nav_client.upload_waypoint_snapshot(waypoint_snapshot)
+            return len(data)
 
-        status = self._graph_nav_client.navigation_feedback(nav_to_cmd_id)
-        if (
-            status.status
-            == graph_nav_pb2.NavigationFeedbackResponse.STATUS_REACHED_GOAL
+        def upload_edge_snapshot(snapshot_id: str) -> int:
+            data = map_reader.read_edge_snapshot(snapshot_id)
+            self._graph_nav_client.upload_edge_snapshot(
+                map_pb2.EdgeSnapshot.FromString(data)
+            )
+            return len(data)
+
+        progresses = []
+        for kind, unknown_ids, known_ids, upload in (
+            (
+                "waypoint snapshots",
+                response.unknown_waypoint_snapshot_ids,
+                response.loaded_waypoint_snapshot_ids,
+                upload_waypoint_snapshot,
+            ),
+            (
+                "edge snapshots",
+                response.unknown_edge_snapshot_ids,
+                response.loaded_edge_snapshot_ids,
+                upload_edge_snapshot,
+            ),
         ):
-            return True, "Successfully completed the navigation commands!"
-        elif status.status == graph_nav_pb2.NavigationFeedbackResponse.STATUS_LOST:
-            return (
-                False,
-                "Robot got lost when navigating the route, the robot will now sit down.",
+            self._logger.info(
+                "The robot already has {} {}, uploading {}".format(
+                    len(known_ids), kind, len(unknown_ids)
+                )
             )
-        elif status.status == graph_nav_pb2.NavigationFeedbackResponse.STATUS_STUCK:
-            return (
-                False,
-                "Robot got stuck when navigating the route, the robot will now sit down.",
+            progress = TransferProgress(
+                "Uploaded", kind, len(unknown_ids), self._logger
             )
-        elif (
-            status.status
-            == graph_nav_pb2.NavigationFeedbackResponse.STATUS_ROBOT_IMPAIRED
-        ):
-            return False, "Robot is impaired."
-        else:
-            return False, "Navigation command is not complete yet."
+            progresses.append(
+                transfer_snapshots(
+                    list(unknown_ids),
+                    upload,
+                    progress,
+                    self._logger,
+                    max_workers=max_concurrent_transfers,
+                )
+            )
+        failures = [
+            f"{progress.failed} of {progress.total} {progress.kind}"
+            for progress in progresses
+            if progress.failed
+        ]
+        if failures:
+            raise SnapshotTransferError("Failed to upload " + " and ".join(failures))
 
-    def _navigate_route(
-        self, waypoint_ids: typing.List[str]
-    ) -> typing.Tuple[bool, str]:
-        """Navigate through a specific route of waypoints.
-        Note that each waypoint must have an edge between them, aka be adjacent.
+    def read_waypoint_snapshot(self, snapshot_id: str) -> map_pb2.WaypointSnapshot:
+        """Read a waypoint snapshot of the map last uploaded or downloaded.
+
+        Snapshots are not kept in memory, so each call reads and parses the snapshot from the map again.
+
+        Raises:
+            ValueError: No map was uploaded or downloaded
+            MapArchiveError: The map does not have the snapshot
         """
-        for i in range(len(waypoint_ids)):
-            waypoint_ids[i] = self._find_unique_waypoint_id(
-                waypoint_ids[i],
-                self._current_graph,
-                self._current_annotation_name_to_wp_id,
-                self._logger,
-            )
-            if not waypoint_ids[i]:
-                self._logger.error(
-                    "navigate_route: Failed to find the unique waypoint id."
-                )
-                return False, "Failed to find the unique waypoint id."
+        return map_pb2.WaypointSnapshot.FromString(
+            self._current_map_reader().read_waypoint_snapshot(snapshot_id)
+        )
 
-        edge_ids_list = []
-        # Attempt to find edges in the current graph that match the ordered waypoint pairs.
-        # These are necessary to create a valid route.
-        for i in range(len(waypoint_ids) - 1):
-            start_wp = waypoint_ids[i]
-            end_wp = waypoint_ids[i + 1]
-            edge_id = self._match_edge(self._current_edges, start_wp, end_wp)
-            if edge_id is not None:
-                edge_ids_list.append(edge_id)
-            else:
-                self._logger.error(
-                    f"Failed to find an edge between waypoints: {start_wp} and {end_wp}"
-                )
-                return (
-                    False,
-                    f"Failed to find an edge between waypoints: {start_wp} and {end_wp}",
+    def read_edge_snapshot(self, snapshot_id: str) -> map_pb2.EdgeSnapshot:
+        """Read an edge snapshot of the map last uploaded or downloaded.
+
+        Snapshots are not kept in memory, so each call reads and parses the snapshot from the map again.
+
+        Raises:
+            ValueError: No map was uploaded or downloaded
+            MapArchiveError: The map does not have the snapshot
+        """
+        return map_pb2.EdgeSnapshot.FromString(
+            self._current_map_reader().read_edge_snapshot(snapshot_id)
+        )
+
+    def _set_current_map(self, path: typing.Optional[str]):
+        """Set the map snapshots are read from, closing the map previously read from"""
+        if self._current_map is not None:
+            self._current_map.close()
+        self._current_map = None
+        self._current_map_path = path
+
+    def _current_map_reader(self) -> typing.Union[MapArchive, MapDirectory]:
+        if self._current_map_path is None:
+            raise ValueError("No map was uploaded or downloaded.")
+        if self._current_map is None:
+            # Opening an archive only maps it and reads its index, so it is kept open between reads
+            self._current_map = open_map(self._current_map_path)
+        return self._current_map
+
+    def _match_anchored_fiducials(
+        self, waypoint: map_pb2.Waypoint, waypoint_snapshot: map_pb2.WaypointSnapshot
+    ):
+        """Attach the waypoint and fiducial seen in a snapshot to the anchored world objects waiting for them"""
+        for fiducial in waypoint_snapshot.objects:
+            if not fiducial.HasField("apriltag_properties"):
+                continue
+
+            str_id = str(fiducial.apriltag_properties.tag_id)
+            if (
+                str_id in self._current_anchored_world_objects
+                and len(self._current_anchored_world_objects[str_id]) == 1
+            ):
+                # Replace the placeholder tuple with a tuple of (wo, waypoint, fiducial).
+                anchored_wo = self._current_anchored_world_objects[str_id][0]
+                self._current_anchored_world_objects[str_id] = (
+                    anchored_wo,
+                    waypoint,
+                    fiducial,
                 )
 
+    def _start_navigation(
+        self,
+        issue_command: typing.Callable[[typing.List, typing.Optional[int]], int],
+        command_duration: float,
+        feedback_rate: float,
+    ) -> NavigationHandle:
+        """Hand the lease over to graph nav and start a navigation command in the background.
+
+        Args:
+            issue_command: Function issuing the navigation command with the given leases, renewing the command with the
+                           given id if it is not None, and returning the command id
+            command_duration: Duration in seconds of each command, which is renewed at half of it
+            feedback_rate: Rate (Hz) at which the navigation feedback is polled
+        """
         # Stop the lease keepalive and create a new sublease for graphnav.
         self._lease = self._lease_wallet.advance()
         sublease = self._lease.create_sublease()
         self._lease_keepalive.shutdown()
 
-        # Navigate a specific route.
-        route = self._graph_nav_client.build_route(waypoint_ids, edge_ids_list)
-        is_finished = False
-        while not is_finished:
-            # Issue the route command about twice a second such that it is easy to terminate the
-            # navigation command (with estop or killing the program).
-            nav_route_command_id = self._graph_nav_client.navigate_route(
-                route, cmd_duration=1.0, leases=[sublease.lease_proto]
-            )
-            time.sleep(0.5)  # Sleep for half a second to allow for command execution.
-            # Poll the robot for feedback to determine if the route is complete.
-            is_finished = self._check_success(nav_route_command_id)
-
+        def take_back_lease():
             self._lease = self._lease_wallet.advance()
             self._lease_keepalive = LeaseKeepAlive(self._lease_client)
 
-        return True, "Finished navigating route!"
+        return NavigationHandle(
+            self._graph_nav_client,
+            lambda command_id: issue_command([sublease.lease_proto], command_id),
+            self._logger,
+            command_duration=command_duration,
+            feedback_rate=feedback_rate,
+            on_finished=take_back_lease,
+        ).start()
 
-    def clear_graph(self, *args) -> bool:
-        """Clear the state of the map on the robot, removing all waypoints and edges."""
+    def navigate_to_async(
+        self,
+        waypoint_id: str,
+        feedback_rate: float = DEFAULT_NAVIGATION_FEEDBACK_RATE,
+        command_duration: float = 1.0,
+    ) -> NavigationHandle:
+        """Start navigating to a waypoint without waiting for the robot to get there.
+
+        Args:
+            waypoint_id: Id, short code or annotation name of the destination waypoint
+            feedback_rate: Rate (Hz) at which the navigation feedback is polled, which bounds the delay between
+                           reaching the goal and the handle resolving
+            command_duration: Duration in seconds of each navigation command. The robot stops at most this long after
+                              the handle is cancelled or the program dies.
+
+        Returns:
+            A handle resolving to the terminal navigation feedback
+
+        Raises:
+            ValueError: The waypoint could not be found in the current graph
+        """
         self._lease = self._get_lease()
-        result = self._graph_nav_client.clear_graph(lease=self._lease.lease_proto)
-        self._init_current_graph_nav_state()
-        return result
+        destination_waypoint = self._resolve_waypoint_id(waypoint_id)
+        if not destination_waypoint:
+            raise ValueError(
+                "Failed to find the appropriate unique waypoint id for the navigation command."
+            )
+
+        return self._start_navigation(
+            lambda leases, command_id: self._graph_nav_client.navigate_to(
+                destination_waypoint,
+                command_duration,
+                leases=leases,
+                command_id=command_id,
+            ),
+            command_duration,
+            feedback_rate,
+        )
+
+    def navigate_route_async(
+        self,
+        waypoint_ids: typing.List[str],
+        feedback_rate: float = DEFAULT_NAVIGATION_FEEDBACK_RATE,
+        command_duration: float = 1.0,
+    ) -> NavigationHandle:
+        """Start navigating through a route of waypoints without waiting for the robot to get there.
+        Consecutive waypoints which are not adjacent are joined by the shortest route between them in the current
+        graph.
+
+        Args:
+            waypoint_ids: Ids, short codes or annotation names of the waypoints of the route
+            feedback_rate: Rate (Hz) at which the navigation feedback is polled, which bounds the delay between
+                           reaching the goal and the handle resolving
+            command_duration: Duration in seconds of each navigation command. The robot stops at most this long after
+                              the handle is cancelled or the program dies.
+
+        Returns:
+            A handle resolving to the terminal navigation feedback
+
+        Raises:
+            ValueError: A waypoint could not be found in the current graph, or two waypoints are not connected
+        """
+        self._lease = self._get_lease()
+        waypoint_ids, edge_ids_list = self.plan_route(waypoint_ids)
+        route = self._graph_nav_client.build_route(waypoint_ids, edge_ids_list)
+        return self._start_navigation(
+            lambda leases, command_id: self._graph_nav_client.navigate_route(
+                route,
+                cmd_duration=command_duration,
+                leases=leases,
+                command_id=command_id,
+            ),
+            command_duration,
+            feedback_rate,
+        )
+
+    def plan_route(
+        self, waypoint_ids: typing.List[str]
+    ) -> typing.Tuple[typing.List[str], typing.List[map_pb2.Edge.Id]]:
+        """Plan a route through waypoints in the current graph, as the input of build_route.
+
+        Consecutive waypoints which are adjacent are joined by the edge between them, and the others by the shortest
+        route between them.
+
+        Args:
+            waypoint_ids: Ids, short codes or annotation names of the waypoints to go through in order
+
+        Returns:
+            The ids of the waypoints of the route, where each waypoint is adjacent to the next one, and the ids of the
+            edges between them
 
-    def _check_success(self, command_id: int = -1) -> bool:
-        """Use a navigation command id to get feedback from the robot and sit when command succeeds."""
-        if command_id == -1:
-            # No command, so we have not status to check.
-            return False
-        status = self._graph_nav_client.navigation_feedback(command_id)
+        Raises:
+            ValueError: A waypoint could not be found in the current graph, or two waypoints are not connected
+        """
+        resolved_ids = []
+        for waypoint_id in waypoint_ids:
+            resolved_id = self._resolve_waypoint_id(waypoint_id)
+            if not resolved_id:
+                raise ValueError("Failed to find the unique waypoint id.")
+            resolved_ids.append(resolved_id)
+
+        route = resolved_ids[:1]
+        edge_ids_list = []
+        for start_wp, end_wp in zip(resolved_ids, resolved_ids[1:]):
+            edge_id = self._graph_index.match_edge(start_wp, end_wp)
+            if edge_id is not None:
+                route.append(end_wp)
+                edge_ids_list.append(edge_id)
+                continue
+            try:
+                leg = self._route_planner.plan(start_wp, end_wp)
+            except NoRouteError as e:
+                raise ValueError(
+                    f"Failed to find a route between waypoints: {start_wp} and {end_wp}"
+                ) from e
+            route.extend(leg[1:])
+            edge_ids_list.extend(self._route_planner.route_edges(leg))
+        return route, edge_ids_list
+
+    def _navigation_result(
+        self, feedback: graph_nav_pb2.NavigationFeedbackResponse, success_message: str
+    ) -> typing.Tuple[bool, str]:
+        """Turn the terminal feedback of a navigation command into a result and a message"""
         if (
-            status.status
+            feedback.status
             == graph_nav_pb2.NavigationFeedbackResponse.STATUS_REACHED_GOAL
         ):
-            # Successfully completed the navigation commands!
-            return True
-        elif status.status == graph_nav_pb2.NavigationFeedbackResponse.STATUS_LOST:
-            self._logger.error(
+            return True, success_message
+        elif feedback.status == graph_nav_pb2.NavigationFeedbackResponse.STATUS_LOST:
+            message = (
                 "Robot got lost when navigating the route, the robot will now sit down."
             )
-            return True
-        elif status.status == graph_nav_pb2.NavigationFeedbackResponse.STATUS_STUCK:
-            self._logger.error(
-                "Robot got stuck when navigating the route, the robot will now sit down."
-            )
-            return True
+        elif feedback.status == graph_nav_pb2.NavigationFeedbackResponse.STATUS_STUCK:
+            message = "Robot got stuck when navigating the route, the robot will now sit down."
         elif (
-            status.status
+            feedback.status
             == graph_nav_pb2.NavigationFeedbackResponse.STATUS_ROBOT_IMPAIRED
         ):
-            self._logger.error("Robot is impaired.")
-            return True
+            message = "Robot is impaired."
         else:
-            # Navigation command is not complete yet.
-            return False
+            message = "Navigation command is not complete yet."
+        self._logger.error(message)
+        return False, message
 
-    def _match_edge(
-        self,
-        current_edges: typing.Dict[str, typing.List[str]],
-        waypoint1: str,
-        waypoint2: str,
-    ) -> typing.Optional[map_pb2.Edge.Id]:
-        """Find an edge in the graph that is between two waypoint ids."""
-        # Return the correct edge id as soon as it's found.
-        for edge_to_id in current_edges:
-            for edge_from_id in current_edges[edge_to_id]:
-                if (waypoint1 == edge_to_id) and (waypoint2 == edge_from_id):
-                    # This edge matches the pair of waypoints! Add it the edge list and continue.
-                    return map_pb2.Edge.Id(
-                        from_waypoint=waypoint2, to_waypoint=waypoint1
-                    )
-                elif (waypoint2 == edge_to_id) and (waypoint1 == edge_from_id):
-                    # This edge matches the pair of waypoints! Add it the edge list and continue.
-                    return map_pb2.Edge.Id(
-                        from_waypoint=waypoint1, to_waypoint=waypoint2
-                    )
-        return None
+    def _navigate_to(self, waypoint_id: str) -> typing.Tuple[bool, str]:
+        """Navigate to a specific waypoint."""
+        try:
+            handle = self.navigate_to_async(waypoint_id)
+        except ValueError as e:
+            self._logger.error(str(e))
+            return False, str(e)
+        return self._navigation_result(
+            handle.result(), "Successfully completed the navigation commands!"
+        )
+
+    def _navigate_route(
+        self, waypoint_ids: typing.List[str]
+    ) -> typing.Tuple[bool, str]:
+        """Navigate through a specific route of waypoints.
+        Waypoints which are not adjacent are joined by the shortest route between them.
+        """
+        try:
+            handle = self.navigate_route_async(waypoint_ids)
+        except ValueError as e:
+            self._logger.error(f"navigate_route: {e}")
+            return False, str(e)
+        return self._navigation_result(handle.result(), "Finished navigating route!")
+
+    def clear_graph(self, *args) -> bool:
+        """Clear the state of the map on the robot, removing all waypoints and edges."""
+        self._lease = self._get_lease()
+        result = self._graph_nav_client.clear_graph(lease=self._lease.lease_proto)
+        self._init_current_graph_nav_state()
+        return result
 
     def _auto_close_loops(
         self, close_fiducial_loops: bool, close_odometry_loops: bool, *args
@@ -680,33 +889,27 @@ class SpotGraphNav:
 
     def _id_to_short_code(self, id: str):
         """Convert a unique id to a 2 letter short code."""
-        tokens = id.split("-")
-        if len(tokens) > 2:
-            return f"{tokens[0][0]}{tokens[1][0]}"
-        return None
+        return id_to_short_code(id)
 
-    def _pretty_print_waypoints(
-        self,
-        waypoint_id: str,
-        waypoint_name: str,
-        short_code_to_count: typing.Dict[str, int],
-        localization_id: str,
-        logger: logging.Logger,
-    ):
-        short_code = self._id_to_short_code(waypoint_id)
-        if short_code is None or short_code_to_count[short_code] != 1:
-            # If the short code is not valid/unique, don't show it.
-            short_code = "  "
+    def _resolve_waypoint_id(self, waypoint_id: str) -> typing.Optional[str]:
+        """Convert either a 2 letter short code or an annotation name into the associated unique id, using the index
+        of the current graph.
 
-        logger.info(
-            "%s Waypoint name: %s id: %s short code: %s"
-            % (
-                "->" if localization_id == waypoint_id else "  ",
-                waypoint_name,
-                waypoint_id,
-                short_code,
+        Returns:
+            The waypoint id, or None if the name is used by several waypoints or the waypoint is not in the graph
+        """
+        unique_id = self._graph_index.find_unique_waypoint_id(waypoint_id)
+        if unique_id is None:
+            self._logger.error(
+                "The waypoint name %s is used for multiple different unique waypoints. Please use the waypoint id."
+                % waypoint_id
             )
-        )
+            return None
+        # Without a graph, ids are passed on to the robot as they are
+        if len(self._graph_index) and unique_id not in self._graph_index.waypoints:
+            self._logger.error("Unknown waypoint %s." % waypoint_id)
+            return None
+        return unique_id
 
     def _find_unique_waypoint_id(
         self,
@@ -715,97 +918,100 @@ class SpotGraphNav:
         name_to_id: typing.Dict[str, str],
         logger: logging.Logger,
     ):
-        """Convert either a 2 letter short code or an annotation name into the associated unique id."""
-        if len(short_code) != 2:
-            # Not a short code, check if it is an annotation name (instead of the waypoint id).
-            if short_code in name_to_id:
-                # Short code is an waypoint's annotation name. Check if it is paired with a unique waypoint id.
-                if name_to_id[short_code] is not None:
-                    # Has an associated waypoint id!
-                    return name_to_id[short_code]
-                else:
-                    logger.error(
-                        "The waypoint name %s is used for multiple different unique waypoints. Please use"
-                        + "the waypoint id." % (short_code)
-                    )
-                    return None
-            # Also not an waypoint annotation name, so we will operate under the assumption that it is a
-            # unique waypoint id.
-            return short_code
-
-        ret = short_code
-        for waypoint in graph.waypoints:
-            if short_code == self._id_to_short_code(waypoint.id):
-                if ret != short_code:
-                    return short_code  # Multiple waypoints with same short code.
-                ret = waypoint.id
-        return ret
+        """Convert either a 2 letter short code or an annotation name into the associated unique id.
 
-    def _update_waypoints_and_edges(
-        self, graph: map_pb2.Graph, localization_id: str, logger: logging.Logger
-    ) -> typing.Tuple[typing.Dict[str, str], typing.Dict[str, str]]:
-        """Update and print waypoint ids and edge ids."""
-        name_to_id = dict()
-        edges = dict()
-
-        short_code_to_count = {}
-        waypoint_to_timestamp = []
-        for waypoint in graph.waypoints:
-            # Determine the timestamp that this waypoint was created at.
-            timestamp = -1.0
-            try:
-                timestamp = (
-                    waypoint.annotations.creation_time.seconds
-                    + waypoint.annotations.creation_time.nanos / 1e9
+        Kept for compatibility, _resolve_waypoint_id resolves waypoints of the current graph with its index.
+        """
+        if len(short_code) != 2 and short_code in name_to_id:
+            if name_to_id[short_code] is None:
+                logger.error(
+                    "The waypoint name %s is used for multiple different unique waypoints. Please use the waypoint id."
+                    % short_code
                 )
-            except:
-                # Must be operating on an older graph nav map, since the creation_time is not
-                # available within the waypoint annotations message.
-                pass
-            waypoint_to_timestamp.append(
-                (waypoint.id, timestamp, waypoint.annotations.name)
+            return name_to_id[short_code]
+        return GraphIndex(graph).find_unique_waypoint_id(short_code)
+
+    def _summarize_graph(self, index: GraphIndex, localization_id: str) -> GraphSummary:
+        """Build the summary of a graph from its index."""
+        waypoints = []
+        for waypoint in index.waypoints.values():
+            annotations = waypoint.annotations
+            # Waypoints of older graph nav maps have no creation time, and sort first with a time of 0.
+            creation_time = (
+                annotations.creation_time.seconds
+                + annotations.creation_time.nanos / 1e9
             )
-
-            # Determine how many waypoints have the same short code.
-            short_code = self._id_to_short_code(waypoint.id)
-            if short_code not in short_code_to_count:
-                short_code_to_count[short_code] = 0
-            short_code_to_count[short_code] += 1
-
-            # Add the annotation name/id into the current dictionary.
-            waypoint_name = waypoint.annotations.name
-            if waypoint_name:
-                if waypoint_name in name_to_id:
-                    # Waypoint name is used for multiple different waypoints, so set the waypoint id
-                    # in this dictionary to None to avoid confusion between two different waypoints.
-                    name_to_id[waypoint_name] = None
-                else:
-                    # First time we have seen this waypoint annotation name. Add it into the dictionary
-                    # with the respective waypoint unique id.
-                    name_to_id[waypoint_name] = waypoint.id
-
-        # Sort the set of waypoints by their creation timestamp. If the creation timestamp is unavailable,
-        # fallback to sorting by annotation name.
-        waypoint_to_timestamp = sorted(
-            waypoint_to_timestamp, key=lambda x: (x[1], x[2])
+            short_code = id_to_short_code(waypoint.id)
+            # Only show short codes which are valid and unique.
+            if (
+                short_code is not None
+                and len(index.ids_with_short_code(short_code)) != 1
+            ):
+                short_code = None
+            waypoints.append((creation_time, annotations.name, waypoint.id, short_code))
+
+        # Sort the waypoints by their creation time, falling back to their annotation name.
+        waypoints.sort(key=lambda waypoint: waypoint[:2])
+        return GraphSummary(
+            waypoints=tuple(
+                WaypointSummary(
+                    id=waypoint_id,
+                    name=waypoint_name,
+                    short_code=short_code,
+                    creation_time=creation_time,
+                    is_localized=waypoint_id == localization_id,
+                )
+                for creation_time, waypoint_name, waypoint_id, short_code in waypoints
+            ),
+            name_to_id=index.name_to_id(),
+            edges=index.edges_by_destination(),
+            num_edges=len(index.edges),
         )
 
-        # Print out the waypoints name, id, and short code in a ordered sorted by the timestamp from
-        # when the waypoint was created.
-        logger.info("%d waypoints:" % len(graph.waypoints))
-        for waypoint in waypoint_to_timestamp:
-            self._pretty_print_waypoints(
-                waypoint[0], waypoint[2], short_code_to_count, localization_id, logger
-            )
+    def _update_waypoints_and_edges(
+        self,
+        graph: map_pb2.Graph,
+        localization_id: str,
+        logger: logging.Logger,
+        log_items: bool = False,
+        index: typing.Optional[GraphIndex] = None,
+    ) -> typing.Tuple[typing.Dict[str, str], typing.Dict[str, str]]:
+        """Update waypoint ids and edge ids, and keep their summary in graph_summary.
 
-        for edge in graph.edges:
-            if edge.id.to_waypoint in edges:
-                if edge.id.from_waypoint not in edges[edge.id.to_waypoint]:
-                    edges[edge.id.to_waypoint].append(edge.id.from_waypoint)
-            else:
-                edges[edge.id.to_waypoint] = [edge.id.from_waypoint]
-            logger.info(
-                f"(Edge) from waypoint id: {edge.id.from_waypoint} and to waypoint id: {edge.id.to_waypoint}"
-            )
+        Args:
+            graph: The graph to summarize
+            localization_id: Id of the waypoint the robot is localized to
+            logger: Logger object
+            log_items: If set, log a line per waypoint and per edge rather than a single line for the graph
+            index: Index already updated with the graph, such as the index of the current graph. The graph is indexed
+                   if it is not given.
+
+        Returns:
+            The waypoint id of each annotation name, and the waypoints with an edge to each waypoint
+        """
+        if index is None:
+            index = GraphIndex(graph)
+        summary = self._summarize_graph(index, localization_id)
+        self._graph_summary = summary
+        logger.info(
+            "%d waypoints and %d edges" % (len(summary.waypoints), summary.num_edges)
+        )
+        if log_items:
+            # Print out the waypoints name, id, and short code in a ordered sorted by the timestamp from
+            # when the waypoint was created.
+            for waypoint in summary.waypoints:
+                logger.info(
+                    "%s Waypoint name: %s id: %s short code: %s"
+                    % (
+                        "->" if waypoint.is_localized else "  ",
+                        waypoint.name,
+                        waypoint.id,
+                        waypoint.short_code or "  ",
+                    )
+                )
+            for edge in graph.edges:
+                logger.info(
+                    f"(Edge) from waypoint id: {edge.id.from_waypoint} and to waypoint id: {edge.id.to_waypoint}"
+                )
 
-        return name_to_id, edges
+        return summary.name_to_id, summary.edges
@@ -1,16 +1,27 @@
+import concurrent.futures
 import logging
+import multiprocessing
+import threading
 import typing
 from collections import namedtuple
 from dataclasses import dataclass
 
+import numpy as np
 from bosdyn.api import image_pb2
+from bosdyn.client.async_tasks import AsyncPeriodicQuery
 from bosdyn.client.image import (
     ImageClient,
     build_image_request,
     UnsupportedPixelFormatRequestedError,
 )
+from bosdyn.client.frame_helpers import BODY_FRAME_NAME
 from bosdyn.client.robot import Robot
 
+from .depth_projection import DepthProjector, fuse_depth_images
+from .frame_buffer import ImageFrameBuffers
+from .image_decoding import ImageDecodePool, decode_image_bundle
+from .robot_capabilities import RobotCapabilities
+
 """List of body image sources for periodic query"""
 CAMERA_IMAGE_SOURCES = [
     "frontleft_fisheye_image",
@@ -76,6 +87,53 @@ IMAGE_SOURCES_BY_CAMERA = {
 IMAGE_TYPES = {"visual", "depth", "depth_registered"}
 
 
+def make_image_bundle(
+    image_responses: typing.List[image_pb2.ImageResponse],
+) -> typing.Union[ImageBundle, ImageWithHandBundle]:
+    """Put the responses to a request for all body cameras, optionally followed by the hand camera, into a bundle"""
+    if len(image_responses) == len(ImageWithHandBundle._fields):
+        return ImageWithHandBundle(*image_responses)
+    return ImageBundle(*image_responses)
+
+
+class AsyncImageBundle(AsyncPeriodicQuery):
+    """Class to get the images of a group of cameras at regular intervals.  get_image_async query sent to the robot at
+    every tick while the rate is positive.  Callback registered to defined callback function, if there is one.
+
+    The latest responses are available from proto as an ImageBundle or ImageWithHandBundle.
+
+    Attributes:
+        query_name: Name of the query
+        client: The Client to a service on the robot
+        logger: Logger object
+        rate: Rate (Hz) to trigger the query
+        callback: Callback function to call when the results of the query are available
+        image_requests: Requests for the body cameras in ImageBundle order, optionally followed by the hand camera
+        frame_buffers: If set, the images of every response are decoded and added to these buffers
+    """
+
+    def __init__(self, query_name, client, logger, rate, callback, image_requests):
+        super(AsyncImageBundle, self).__init__(
+            query_name, client, logger, period_sec=1.0 / rate if rate > 0.0 else 1.0
+        )
+        self._enabled = rate > 0.0
+        self._callback = callback
+        self._image_requests = image_requests
+        self.frame_buffers: typing.Optional[ImageFrameBuffers] = None
+
+    def _start_query(self):
+        if self._enabled:
+            callback_future = self._client.get_image_async(self._image_requests)
+            if self._callback:
+                callback_future.add_done_callback(self._callback)
+            return callback_future
+
+    def _handle_result(self, result):
+        self._proto = make_image_bundle(result)
+        if self.frame_buffers is not None:
+            self.frame_buffers.add_images(result)
+
+
 @dataclass(frozen=True, eq=True)
 class CameraSource:
     camera_name: str
@@ -103,6 +161,13 @@ class SpotImages:
         self._rgb_cameras = rgb_cameras
         self._robot_params = robot_params
         self._image_client: ImageClient = robot_clients["image_client"]
+        self._decode_pool: typing.Optional[ImageDecodePool] = None
+        self._depth_projector = DepthProjector()
+        self._fusion_worker: typing.Optional[concurrent.futures.ProcessPoolExecutor] = (
+            None
+        )
+        if "capabilities" not in self._robot_params:
+            self._robot_params["capabilities"] = RobotCapabilities.from_robot(robot)
 
         ############################################
         self._camera_image_requests = []
@@ -130,7 +195,7 @@ class SpotImages:
                 )
             )
 
-        if self._robot.has_arm():
+        if self._has_arm:
             self._camera_image_requests.append(
                 build_image_request(
                     "hand_color_image",
@@ -152,10 +217,15 @@ class SpotImages:
                 )
             )
 
+        # Single image requests keyed by (camera, image type, image format, pixel format, quality)
+        self._single_image_requests: typing.Dict[
+            typing.Tuple, typing.List[image_pb2.ImageRequest]
+        ] = {}
+
         # Build image requests by camera
         self._image_requests_by_camera = {}
         for camera in IMAGE_SOURCES_BY_CAMERA:
-            if camera == "hand" and not self._robot.has_arm():
+            if camera == "hand" and not self._has_arm:
                 continue
             self._image_requests_by_camera[camera] = {}
             image_types = IMAGE_SOURCES_BY_CAMERA[camera]
@@ -173,98 +243,136 @@ class SpotImages:
                         )
                         pixel_format = image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8
 
-                source = IMAGE_SOURCES_BY_CAMERA[camera][image_type]
-                self._image_requests_by_camera[camera][
-                    image_type
-                ] = build_image_request(
-                    source,
+                request = self._get_image_request(
+                    camera, image_type, image_format, pixel_format, quality_percent=75
+                )
+                self._image_requests_by_camera[camera][image_type] = request[0]
+
+        # Periodic tasks for each group of cameras, with rates and callbacks keyed by "<image type>_images"
+        rates = self._robot_params.get("rates", {})
+        callbacks = self._robot_params.get("callbacks", {})
+        self._image_tasks: typing.Dict[str, AsyncImageBundle] = {}
+        for image_type, image_requests in (
+            ("visual", self._camera_image_requests),
+            ("depth", self._depth_image_requests),
+            ("depth_registered", self._depth_registered_image_requests),
+        ):
+            key = f"{image_type}_images"
+            self._image_tasks[image_type] = AsyncImageBundle(
+                key,
+                self._image_client,
+                self._logger,
+                max(0.0, rates.get(key, 0.0)),
+                callbacks.get(key, None),
+                image_requests,
+            )
+
+        # Pre-build the requests used by the single camera getters
+        for camera in ImageBundle._fields:
+            self._get_image_request(
+                camera, "visual", image_format=image_pb2.Image.FORMAT_RAW
+            )
+        if self._has_arm:
+            self._get_image_request(
+                "hand",
+                "visual",
+                pixel_format=image_pb2.Image.PIXEL_FORMAT_RGB_U8,
+                quality_percent=50,
+            )
+
+    @property
+    def _has_arm(self) -> bool:
+        return self._robot_params["capabilities"].has_arm
+
+    def _get_image_request(
+        self,
+        camera: str,
+        image_type: str,
+        image_format: typing.Optional[int] = None,
+        pixel_format: typing.Optional[int] = None,
+        quality_percent: int = 75,
+    ) -> typing.List[image_pb2.ImageRequest]:
+        """Return the single-request list for the given camera and image type, building it on first use.
+
+        The returned requests are shared between calls and must not be modified.
+
+        Raises:
+            KeyError: The camera or image type is unknown
+        """
+        key = (camera, image_type, image_format, pixel_format, quality_percent)
+        request = self._single_image_requests.get(key)
+        if request is None:
+            request = [
+                build_image_request(
+                    IMAGE_SOURCES_BY_CAMERA[camera][image_type],
+                    quality_percent=quality_percent,
                     image_format=image_format,
                     pixel_format=pixel_format,
-                    quality_percent=75,
                 )
+            ]
+            self._single_image_requests[key] = request
+        return request
 
-    def get_frontleft_rgb_image(self) -> image_pb2.ImageResponse:
+    def get_image(
+        self,
+        camera: str,
+        image_type: str = "visual",
+        image_format: typing.Optional[int] = None,
+        pixel_format: typing.Optional[int] = None,
+        quality_percent: int = 75,
+    ) -> typing.Optional[image_pb2.ImageResponse]:
+        """Get a single image from one camera. The image request for each combination of arguments is built once and
+        reused for later calls.
+
+        Args:
+            camera: Name of the camera, one of the keys of IMAGE_SOURCES_BY_CAMERA
+            image_type: Type of the image, one of IMAGE_TYPES
+            image_format: Format of the image data, such as image_pb2.Image.FORMAT_RAW. If None, the robot chooses.
+            pixel_format: Pixel format of the image, such as image_pb2.Image.PIXEL_FORMAT_RGB_U8. If None, the robot
+                          chooses.
+            quality_percent: Quality of the image from 0 to 100, for compressed formats
+
+        Returns:
+            The image response, or None if there was an error
+        """
         try:
-            return self._image_client.get_image(
-                [
-                    build_image_request(
-                        "frontleft_fisheye_image",
-                        image_format=image_pb2.Image.FORMAT_RAW,
-                    )
-                ]
-            )[0]
-        except UnsupportedPixelFormatRequestedError as e:
-            self._logger.error(e)
+            image_request = self._get_image_request(
+                camera, image_type, image_format, pixel_format, quality_percent
+            )
+        except KeyError:
+            self._logger.error(
+                f"Unexpected camera name '{camera}' or image type '{image_type}'"
+            )
             return None
-
-    def get_frontright_rgb_image(self) -> image_pb2.ImageResponse:
         try:
-            return self._image_client.get_image(
-                [
-                    build_image_request(
-                        "frontright_fisheye_image",
-                        image_format=image_pb2.Image.FORMAT_RAW,
-                    )
-                ]
-            )[0]
+            return self._image_client.get_image(image_request)[0]
         except UnsupportedPixelFormatRequestedError as e:
             self._logger.error(e)
             return None
 
+    def get_frontleft_rgb_image(self) -> image_pb2.ImageResponse:
+        return self.get_image("frontleft", image_format=image_pb2.Image.FORMAT_RAW)
+
+    def get_frontright_rgb_image(self) -> image_pb2.ImageResponse:
+        return self.get_image("frontright", image_format=image_pb2.Image.FORMAT_RAW)
+
     def get_left_rgb_image(self) -> image_pb2.ImageResponse:
-        try:
-            return self._image_client.get_image(
-                [
-                    build_image_request(
-                        "left_fisheye_image", image_format=image_pb2.Image.FORMAT_RAW
-                    )
-                ]
-            )[0]
-        except UnsupportedPixelFormatRequestedError as e:
-            self._logger.error(e)
-            return None
+        return self.get_image("left", image_format=image_pb2.Image.FORMAT_RAW)
 
     def get_right_rgb_image(self) -> image_pb2.ImageResponse:
-        try:
-            return self._image_client.get_image(
-                [
-                    build_image_request(
-                        "right_fisheye_image", image_format=image_pb2.Image.FORMAT_RAW
-                    )
-                ]
-            )[0]
-        except UnsupportedPixelFormatRequestedError as e:
-            self._logger.error(e)
-            return None
+        return self.get_image("right", image_format=image_pb2.Image.FORMAT_RAW)
 
     def get_back_rgb_image(self) -> image_pb2.ImageResponse:
-        try:
-            return self._image_client.get_image(
-                [
-                    build_image_request(
-                        "back_fisheye_image", image_format=image_pb2.Image.FORMAT_RAW
-                    )
-                ]
-            )[0]
-        except UnsupportedPixelFormatRequestedError as e:
-            self._logger.error(e)
-            return None
+        return self.get_image("back", image_format=image_pb2.Image.FORMAT_RAW)
 
     def get_hand_rgb_image(self):
-        if not self._robot.has_arm():
-            return None
-        try:
-            return self._image_client.get_image(
-                [
-                    build_image_request(
-                        "hand_color_image",
-                        pixel_format=image_pb2.Image.PIXEL_FORMAT_RGB_U8,
-                        quality_percent=50,
-                    )
-                ]
-            )[0]
-        except UnsupportedPixelFormatRequestedError as e:
+        if not self._has_arm:
             return None
+        return self.get_image(
+            "hand",
+            pixel_format=image_pb2.Image.PIXEL_FORMAT_RGB_U8,
+            quality_percent=50,
+        )
 
     def get_images(
         self, image_requests: typing.List[image_pb2.ImageRequest]
@@ -274,23 +382,7 @@ class SpotImages:
         except UnsupportedPixelFormatRequestedError as e:
             self._logger.error(e)
             return None
-        if self._robot.has_arm():
-            return ImageWithHandBundle(
-                frontleft=image_responses[0],
-                frontright=image_responses[1],
-                left=image_responses[2],
-                right=image_responses[3],
-                back=image_responses[4],
-                hand=image_responses[5],
-            )
-        else:
-            return ImageBundle(
-                frontleft=image_responses[0],
-                frontright=image_responses[1],
-                left=image_responses[2],
-                right=image_responses[3],
-                back=image_responses[4],
-            )
+        return make_image_bundle(image_responses)
 
     def get_camera_images(
         self,
@@ -307,6 +399,194 @@ class SpotImages:
     ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
         return self.get_images(self._depth_registered_image_requests)
 
+    @property
+    def image_tasks(self) -> typing.Dict[str, AsyncImageBundle]:
+        """Return the periodic image tasks, keyed by image type ("visual", "depth" or "depth_registered")"""
+        return self._image_tasks
+
+    def latest_images(
+        self, image_type: str
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        """Return the latest bundle received by the periodic task for an image type, without blocking.
+
+        Args:
+            image_type: One of "visual", "depth" or "depth_registered"
+
+        Returns:
+            The latest bundle, or None if none has been received yet
+        """
+        return self._image_tasks[image_type].proto
+
+    def start_decode_pool(self, max_workers: typing.Optional[int] = None):
+        """Decode the images returned by the get_decoded_* methods concurrently on a thread pool, rather than one
+        after the other on the calling thread.
+
+        Args:
+            max_workers: Number of decoding threads. Defaults to a number based on the number of cores.
+        """
+        self.stop_decode_pool()
+        self._decode_pool = ImageDecodePool(max_workers)
+
+    def stop_decode_pool(self):
+        """Stop the decoding threads started by start_decode_pool"""
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown()
+            self._decode_pool = None
+
+    def decode_images(
+        self, bundle: typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        """Decode every image of a bundle, on the decode pool if it was started.
+
+        Args:
+            bundle: Bundle returned by get_images, or None
+
+        Returns:
+            Bundle of the same type holding DecodedImage objects, or None if the bundle was None
+        """
+        if bundle is None:
+            return None
+        if self._decode_pool is not None:
+            return self._decode_pool.decode_image_bundle(bundle)
+        return decode_image_bundle(bundle)
+
+    def get_decoded_camera_images(
+        self,
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        return self.decode_images(self.get_camera_images())
+
+    def get_decoded_depth_images(
+        self,
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        return self.decode_images(self.get_depth_images())
+
+    def get_decoded_depth_registered_images(
+        self,
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        return self.decode_images(self.get_depth_registered_images())
+
+    @property
+    def depth_projector(self) -> DepthProjector:
+        """Return the projector used by the get_*_point_clouds methods, which caches the rays of each camera"""
+        return self._depth_projector
+
+    def get_depth_point_clouds(
+        self,
+        frame_name: typing.Optional[str] = BODY_FRAME_NAME,
+        min_range: float = 0.0,
+        max_range: float = np.inf,
+    ) -> typing.Optional[typing.Dict[str, np.ndarray]]:
+        """Get the depth images of all cameras and project them to point clouds.
+
+        Args:
+            frame_name: Frame to express the points in, such as "body" or "odom". If None, each cloud is in the frame
+                        of its image sensor.
+            min_range: Pixels with a depth below this many meters are dropped
+            max_range: Pixels with a depth above this many meters are dropped
+
+        Returns:
+            Array of shape (N, 3) and type float32 for each depth source keyed by source name, or None if there was an
+            error getting the images
+        """
+        bundle = self.get_decoded_depth_images()
+        if bundle is None:
+            return None
+        return self._depth_projector.project_bundle(
+            bundle, frame_name, min_range, max_range
+        )
+
+    def get_depth_registered_point_clouds(
+        self,
+        frame_name: typing.Optional[str] = BODY_FRAME_NAME,
+        min_range: float = 0.0,
+        max_range: float = np.inf,
+    ) -> typing.Optional[typing.Dict[str, np.ndarray]]:
+        """Get the depth images registered to the visual cameras and project them to point clouds. See
+        get_depth_point_clouds for the arguments."""
+        bundle = self.get_decoded_depth_registered_images()
+        if bundle is None:
+            return None
+        return self._depth_projector.project_bundle(
+            bundle, frame_name, min_range, max_range
+        )
+
+    def get_fused_depth_cloud(
+        self,
+        voxel_size: typing.Optional[float] = 0.05,
+        frame_name: str = BODY_FRAME_NAME,
+        min_range: float = 0.0,
+        max_range: float = np.inf,
+    ) -> typing.Optional[np.ndarray]:
+        """Get the depth images of all cameras and merge them into a single downsampled point cloud.
+
+        Args:
+            voxel_size: Edge length in meters of the voxels the cloud is downsampled to. If None, it is not downsampled.
+            frame_name: Frame to express the points in, such as "body" or "odom"
+            min_range: Pixels with a depth below this many meters are dropped
+            max_range: Pixels with a depth above this many meters are dropped
+
+        Returns:
+            Array of shape (N, 3) and type float32, or None if there was an error getting the images
+        """
+        bundle = self.get_depth_images()
+        if bundle is None:
+            return None
+        return fuse_depth_images(
+            bundle, frame_name, voxel_size, min_range, max_range, self._depth_projector
+        )
+
+    def start_fusion_worker(self):
+        """Start a worker process on which fuse_depth_images_async merges depth clouds, so that the merge does not
+        hold the GIL of the calling process. The worker is started with the spawn method, because forking a process
+        which runs gRPC threads is unsafe."""
+        if self._fusion_worker is None:
+            self._fusion_worker = concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def stop_fusion_worker(self):
+        """Stop the worker process started by start_fusion_worker"""
+        if self._fusion_worker is not None:
+            self._fusion_worker.shutdown()
+            self._fusion_worker = None
+
+    def fuse_depth_images_async(
+        self,
+        bundle: typing.Union[ImageBundle, ImageWithHandBundle],
+        voxel_size: typing.Optional[float] = 0.05,
+        frame_name: str = BODY_FRAME_NAME,
+        min_range: float = 0.0,
+        max_range: float = np.inf,
+    ) -> concurrent.futures.Future:
+        """Merge a bundle of depth images into a single downsampled point cloud without blocking. The merge runs on
+        the worker process if it was started with start_fusion_worker, otherwise on a new thread.
+
+        Args:
+            bundle: Bundle returned by get_depth_images, or a bundle of depth images from a periodic task
+            voxel_size: Edge length in meters of the voxels the cloud is downsampled to. If None, it is not downsampled.
+            frame_name: Frame to express the points in, such as "body" or "odom"
+            min_range: Pixels with a depth below this many meters are dropped
+            max_range: Pixels with a depth above this many meters are dropped
+
+        Returns:
+            Future which resolves to an array of shape (N, 3) and type float32
+        """
+        arguments = (tuple(bundle), frame_name, voxel_size, min_range, max_range)
+        if self._fusion_worker is not None:
+            return self._fusion_worker.submit(fuse_depth_images, *arguments)
+        future = concurrent.futures.Future()
+
+        def _fuse():
+            try:
+                future.set_result(
+                    fuse_depth_images(*arguments, projector=self._depth_projector)
+                )
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=_fuse, daemon=True).start()
+        return future
+
     def get_images_by_cameras(
         self, camera_sources: typing.List[CameraSource]
     ) -> typing.Optional[typing.List[ImageEntry]]:
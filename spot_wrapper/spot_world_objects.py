@@ -1,35 +1,99 @@
 import logging
+import time
 import typing
 
+from bosdyn.api import world_object_pb2
 from bosdyn.client.async_tasks import AsyncPeriodicQuery
 from bosdyn.client.robot import Robot
 from bosdyn.client.world_object import WorldObjectClient
 
+from .world_object_store import WorldObjectStore
+
+"""Types of world object which can be polled at their own rate, with the rate given by "world_objects_<type name>" in
+the rates, such as "world_objects_apriltag". When any type has a rate, the query of all world objects is off unless
+"world_objects" is given a rate too."""
+WORLD_OBJECT_TYPES_BY_NAME = {
+    "drawable": world_object_pb2.WORLD_OBJECT_DRAWABLE,
+    "apriltag": world_object_pb2.WORLD_OBJECT_APRILTAG,
+    "image_coordinates": world_object_pb2.WORLD_OBJECT_IMAGE_COORDINATES,
+    "dock": world_object_pb2.WORLD_OBJECT_DOCK,
+}
+
 
 class AsyncWorldObjects(AsyncPeriodicQuery):
     """Class to get world objects.  list_world_objects_async query sent to the robot at every tick.  Callback registered to defined callback function.
 
+    If object types are given, only the objects of these types are asked for, which the robot filters before sending
+    the response.
+
+    If a store is set, the query only asks for the objects updated since the last acknowledged query, by passing its
+    send time minus an overlap as time_start_point, and the objects received are merged into the store. The overlap
+    covers objects which are published by the robot some time after they were acquired.
+
     Attributes:
         client: The Client to a service on the robot
         logger: Logger object
         rate: Rate (Hz) to trigger the query
         callback: Callback function to call when the results of the query are available
+        store: Store to merge the objects received into
+        overlap_sec: Number of seconds before the send time of the last acknowledged query to start the next query at
+        object_types: Types of the objects to ask for, or None for all types
+        query_name: Name of the query
     """
 
-    def __init__(self, client, logger, rate, callback):
+    def __init__(
+        self,
+        client,
+        logger,
+        rate,
+        callback,
+        store=None,
+        overlap_sec=2.0,
+        object_types=None,
+        query_name="world-objects",
+    ):
         super(AsyncWorldObjects, self).__init__(
-            "world-objects", client, logger, period_sec=1.0 / max(rate, 1.0)
+            query_name, client, logger, period_sec=1.0 / rate if rate > 0.0 else 1.0
         )
         self._callback = None
         if rate > 0.0:
             self._callback = callback
+        self._enabled = rate > 0.0
+        self._store: typing.Optional[WorldObjectStore] = store
+        self._overlap_sec = overlap_sec
+        self._object_types = object_types
+        # Local time at which the query in flight was sent, and at which the last acknowledged query was sent
+        self._query_time: typing.Optional[float] = None
+        self._acknowledged_time: typing.Optional[float] = None
+
+    @property
+    def store(self) -> typing.Optional[WorldObjectStore]:
+        return self._store
+
+    def set_store(self, store: typing.Optional[WorldObjectStore]):
+        """Merge the objects received into a store and only ask for updated objects, or stop doing so if None"""
+        self._store = store
+        self._acknowledged_time = None
 
     def _start_query(self):
-        if self._callback:
-            callback_future = self._client.list_world_objects_async()
-            callback_future.add_done_callback(self._callback)
+        if self._callback or (self._enabled and self._store is not None):
+            time_start_point = None
+            if self._store is not None and self._acknowledged_time is not None:
+                time_start_point = self._acknowledged_time - self._overlap_sec
+            self._query_time = time.time()
+            callback_future = self._client.list_world_objects_async(
+                object_type=self._object_types, time_start_point=time_start_point
+            )
+            if self._callback:
+                callback_future.add_done_callback(self._callback)
             return callback_future
 
+    def _handle_result(self, result):
+        self._proto = result
+        if self._store is not None:
+            self._store.merge(result.world_objects)
+            self._acknowledged_time = self._query_time
+
 
 class SpotWorldObjects:
     def __init__(
@@ -48,18 +112,88 @@ class SpotWorldObjects:
             "world_objects_client"
         ]
 
+        # Tasks polling one type of object each, at the rate of the type, into a shared store
+        type_rates = {
+            name: self._rates.get(f"world_objects_{name}", 0.0)
+            for name in WORLD_OBJECT_TYPES_BY_NAME
+        }
+        type_rates = {name: rate for name, rate in type_rates.items() if rate > 0.0}
+
+        # When objects are polled by type, the unfiltered query is off unless its rate is given as well, so that
+        # setting rates by type reduces the objects sent by the robot rather than adding to them
+        self._world_objects_rate = self._rates.get(
+            "world_objects", 0.0 if type_rates else 10.0
+        )
         self._world_objects_task = AsyncWorldObjects(
             self._world_objects_client,
             self._logger,
-            self._rates.get("world_objects", 10.0),
+            self._world_objects_rate,
             self._callbacks.get("world_objects", None),
         )
 
+        self._type_store: typing.Optional[WorldObjectStore] = None
+        self._type_tasks: typing.List[AsyncWorldObjects] = []
+        if type_rates:
+            # Keep objects for a few periods of the slowest type, so they do not expire between its queries
+            self._type_store = WorldObjectStore(
+                ttl_sec=max(30.0, 3.0 / min(type_rates.values()))
+            )
+            for name, rate in type_rates.items():
+                self._type_tasks.append(
+                    AsyncWorldObjects(
+                        self._world_objects_client,
+                        self._logger,
+                        rate,
+                        None,
+                        store=self._type_store,
+                        object_types=[WORLD_OBJECT_TYPES_BY_NAME[name]],
+                        query_name=f"world-objects-{name}",
+                    )
+                )
+
     @property
     def async_task(self):
         return self._world_objects_task
 
+    @property
+    def async_tasks(self) -> typing.List[AsyncWorldObjects]:
+        """Return the world objects task followed by the task of each object type with a rate. The world objects task
+        is left out if it is off because objects are polled by type."""
+        if self._type_tasks and self._world_objects_rate <= 0.0:
+            return list(self._type_tasks)
+        return [self._world_objects_task] + self._type_tasks
+
     def list_world_objects(self, object_types, time_start_point):
         return self._world_objects_client.list_world_objects(
             object_types, time_start_point
         )
+
+    def start_incremental_polling(
+        self, ttl_sec: typing.Optional[float] = 30.0, overlap_sec: float = 2.0
+    ) -> WorldObjectStore:
+        """Keep a local store of the world objects, and have the world objects task only ask for the objects updated
+        since its last query. The task then runs at its rate even if there is no callback, and the callback and proto
+        of the task only hold the updated objects.
+
+        Args:
+            ttl_sec: Objects which have not been received for this many seconds are dropped from the store
+            overlap_sec: Number of seconds of overlap between consecutive queries
+
+        Returns:
+            The store, which is also available from world_object_store
+        """
+        self._world_objects_task._overlap_sec = overlap_sec
+        self._world_objects_task.set_store(WorldObjectStore(ttl_sec))
+        return self._world_objects_task.store
+
+    def stop_incremental_polling(self):
+        """Go back to asking for all world objects at every query"""
+        self._world_objects_task.set_store(None)
+
+    @property
+    def world_object_store(self) -> typing.Optional[WorldObjectStore]:
+        """Return the store of the tasks of each object type if there are rates by type, otherwise the store started by
+        start_incremental_polling, or None"""
+        if self._type_store is not None:
+            return self._type_store
+        return self._world_objects_task.store
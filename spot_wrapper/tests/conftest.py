@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+
+import pytest
+from bosdyn.api.graph_nav import graph_nav_pb2
+from bosdyn.api.graph_nav import map_pb2
+
+from spot_wrapper.spot_graph_nav import SpotGraphNav
+
+
+class FakeLeaseClient:
+    lease_wallet = None
+
+
+class FakeLease:
+    lease_proto = None
+
+
+class FakeGraphNavClient:
+    """Serves a graph of waypoints and edges with one snapshot each, with a delay per snapshot RPC"""
+
+    def __init__(self, num_waypoints, delay=0.0):
+        self.graph = map_pb2.Graph()
+        for i in range(num_waypoints):
+            waypoint = self.graph.waypoints.add(id=f"wp{i}", snapshot_id=f"ws{i}")
+            waypoint.annotations.name = f"waypoint_{i}"
+            if i > 0:
+                edge = self.graph.edges.add(snapshot_id=f"es{i}")
+                edge.id.from_waypoint = f"wp{i - 1}"
+                edge.id.to_waypoint = f"wp{i}"
+        self.delay = delay
+        self.failing_ids = set()
+        self.downloaded = []
+        self.uploaded = []
+        self.robot_snapshot_ids = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def download_graph(self):
+        return self.graph
+
+    def _serve(self, snapshot_id, snapshot):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            self.downloaded.append(snapshot_id)
+        if snapshot_id in self.failing_ids:
+            raise RuntimeError("download failed")
+        snapshot.id = snapshot_id
+        return snapshot
+
+    def upload_graph(self, lease=None, graph=None):
+        response = graph_nav_pb2.UploadGraphResponse()
+        for waypoint in graph.waypoints:
+            if waypoint.snapshot_id in self.robot_snapshot_ids:
+                response.loaded_waypoint_snapshot_ids.append(waypoint.snapshot_id)
+            else:
+                response.unknown_waypoint_snapshot_ids.append(waypoint.snapshot_id)
+        for edge in graph.edges:
+            if edge.snapshot_id in self.robot_snapshot_ids:
+                response.loaded_edge_snapshot_ids.append(edge.snapshot_id)
+            else:
+                response.unknown_edge_snapshot_ids.append(edge.snapshot_id)
+        return response
+
+    def _receive(self, snapshot):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        if snapshot.id in self.failing_ids:
+            raise RuntimeError("upload failed")
+        with self._lock:
+            self.uploaded.append(snapshot.id)
+            self.robot_snapshot_ids.add(snapshot.id)
+
+    def upload_waypoint_snapshot(self, waypoint_snapshot):
+        self._receive(waypoint_snapshot)
+
+    def upload_edge_snapshot(self, edge_snapshot):
+        self._receive(edge_snapshot)
+
+    def get_localization_state(self):
+        return graph_nav_pb2.GetLocalizationStateResponse()
+
+    def download_waypoint_snapshot(self, snapshot_id):
+        return self._serve(snapshot_id, map_pb2.WaypointSnapshot())
+
+    def download_edge_snapshot(self, snapshot_id):
+        return self._serve(snapshot_id, map_pb2.EdgeSnapshot())
+
+
+def make_graph_nav(client):
+    return SpotGraphNav(
+        None,
+        logging.getLogger("test"),
+        {},
+        {
+            "graph_nav_client": client,
+            "robot_state_client": None,
+            "lease_client": FakeLeaseClient(),
+        },
+    )
+
+
+@pytest.fixture
+def make_graph_nav_client():
+    """Factory of fake graph nav clients, called with the number of waypoints and the delay per snapshot RPC"""
+    return FakeGraphNavClient
+
+
+@pytest.fixture(name="make_graph_nav")
+def make_graph_nav_fixture():
+    """Factory of SpotGraphNav instances using a fake graph nav client"""
+    return make_graph_nav
+
+
+@pytest.fixture
+def fake_lease():
+    return FakeLease()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import dataclasses
+
+import numpy as np
+import pytest
+from bosdyn.api import image_pb2
+
+from spot_wrapper.depth_projection import (
+    DepthProjector,
+    fuse_depth_images,
+    voxel_downsample,
+)
+from spot_wrapper.image_decoding import UnsupportedImageFormatError, decode_image
+
+
+def make_depth_image(depth: np.ndarray, body_tform_sensor_x: float = 0.0):
+    response = image_pb2.ImageResponse()
+    response.source.name = "frontleft_depth"
+    response.source.depth_scale = 1000.0
+    response.source.pinhole.intrinsics.focal_length.x = 2.0
+    response.source.pinhole.intrinsics.focal_length.y = 4.0
+    response.source.pinhole.intrinsics.principal_point.x = 1.0
+    response.source.pinhole.intrinsics.principal_point.y = 0.5
+    response.shot.frame_name_image_sensor = "frontleft_depth_sensor"
+    edges = response.shot.transforms_snapshot.child_to_parent_edge_map
+    edges["body"].parent_frame_name = ""
+    sensor_edge = edges["frontleft_depth_sensor"]
+    sensor_edge.parent_frame_name = "body"
+    sensor_edge.parent_tform_child.position.x = body_tform_sensor_x
+    sensor_edge.parent_tform_child.rotation.w = 1.0
+    response.shot.image.rows, response.shot.image.cols = depth.shape
+    response.shot.image.format = image_pb2.Image.FORMAT_RAW
+    response.shot.image.pixel_format = image_pb2.Image.PIXEL_FORMAT_DEPTH_U16
+    response.shot.image.data = depth.astype(np.uint16).tobytes()
+    return decode_image(response)
+
+
+def project_reference(depth: np.ndarray) -> np.ndarray:
+    points = []
+    for v in range(depth.shape[0]):
+        for u in range(depth.shape[1]):
+            if depth[v, u] == 0:
+                continue
+            z = depth[v, u] / 1000.0
+            points.append(((u - 1.0) * z / 2.0, (v - 0.5) * z / 4.0, z))
+    return np.array(points)
+
+
+class TestDepthProjector:
+    def test_matches_reference_in_sensor_frame(self):
+        depth = np.array([[1000, 0, 2000], [500, 1500, 0]])
+        points = DepthProjector().project(make_depth_image(depth), frame_name=None)
+        assert points.dtype == np.float32
+        np.testing.assert_allclose(points, project_reference(depth), rtol=1e-6)
+
+    def test_transforms_to_body_frame(self):
+        depth = np.array([[1000, 2000], [3000, 4000]])
+        points = DepthProjector().project(
+            make_depth_image(depth, body_tform_sensor_x=0.5)
+        )
+        expected = project_reference(depth)
+        expected[:, 0] += 0.5
+        np.testing.assert_allclose(points, expected, rtol=1e-6)
+
+    def test_range_cropping(self):
+        depth = np.array([[500, 1000, 2000, 4000]])
+        points = DepthProjector().project(
+            make_depth_image(depth), frame_name=None, min_range=1.0, max_range=2.0
+        )
+        np.testing.assert_allclose(points[:, 2], [1.0, 2.0])
+
+    def test_rays_are_cached(self):
+        projector = DepthProjector()
+        projector.project(make_depth_image(np.ones((2, 3))), frame_name=None)
+        projector.project(make_depth_image(np.ones((2, 3)) * 2), frame_name=None)
+        assert len(projector._rays) == 1
+        projector.project(make_depth_image(np.ones((3, 3))), frame_name=None)
+        assert len(projector._rays) == 2
+
+    def test_rejects_visual_images(self):
+        image = make_depth_image(np.ones((2, 2)))
+        visual = dataclasses.replace(
+            image, pixel_format=image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8
+        )
+        with pytest.raises(UnsupportedImageFormatError):
+            DepthProjector().project(visual)
+
+
+class TestVoxelDownsample:
+    def test_centroid_per_voxel(self):
+        points = np.array(
+            [[0.01, 0.01, 0.01], [0.03, 0.03, 0.03], [-0.01, 0.0, 0.0], [1.0, 1.0, 1.0]]
+        )
+        downsampled = voxel_downsample(points, 0.05)
+        assert downsampled.dtype == np.float32
+        np.testing.assert_allclose(
+            sorted(downsampled.tolist()),
+            [[-0.01, 0.0, 0.0], [0.02, 0.02, 0.02], [1.0, 1.0, 1.0]],
+            rtol=1e-6,
+        )
+
+    def test_empty(self):
+        assert voxel_downsample(np.empty((0, 3)), 0.1).shape == (0, 3)
+
+
+class TestFuseDepthImages:
+    def test_merges_cameras_in_body_frame(self):
+        depth = np.full((2, 2), 1000)
+        bundle = [
+            make_depth_image(depth, body_tform_sensor_x=0.0),
+            make_depth_image(depth, body_tform_sensor_x=10.0),
+        ]
+        fused = fuse_depth_images(bundle, voxel_size=None)
+        assert fused.shape == (8, 3)
+        np.testing.assert_array_equal(fused[4:, 0] - fused[:4, 0], 10.0)
+        downsampled = fuse_depth_images(bundle, voxel_size=1.0)
+        np.testing.assert_array_equal(downsampled, voxel_downsample(fused, 1.0))
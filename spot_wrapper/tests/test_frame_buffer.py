@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import logging
+import threading
+
+import numpy as np
+from bosdyn.api import image_pb2
+
+import spot_wrapper.image_decoding as image_decoding_module
+from spot_wrapper.frame_buffer import FrameRingBuffer, ImageFrameBuffers
+
+
+def make_depth_response(seconds: int) -> image_pb2.ImageResponse:
+    response = image_pb2.ImageResponse()
+    response.source.name = "frontleft_depth"
+    response.shot.acquisition_time.seconds = seconds
+    response.shot.image.rows = 1
+    response.shot.image.cols = 2
+    response.shot.image.format = image_pb2.Image.FORMAT_RAW
+    response.shot.image.pixel_format = image_pb2.Image.PIXEL_FORMAT_DEPTH_U16
+    response.shot.image.data = np.array([seconds, 0], np.uint16).tobytes()
+    return response
+
+
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestFrameRingBuffer:
+    def test_keeps_most_recent_frames(self):
+        buffer = FrameRingBuffer(3)
+        assert buffer.latest() is None
+        for stamp in range(5):
+            assert buffer.push(float(stamp), f"frame {stamp}")
+        assert len(buffer) == 3
+        assert buffer.latest() == (4.0, "frame 4")
+        assert [frame for _, frame in buffer.between(0.0, 10.0)] == [
+            "frame 2",
+            "frame 3",
+            "frame 4",
+        ]
+
+    def test_drops_frames_which_are_not_newer(self):
+        buffer = FrameRingBuffer(3)
+        assert buffer.push(1.0, "a")
+        assert not buffer.push(1.0, "b")
+        assert not buffer.push(0.5, "c")
+        assert len(buffer) == 1
+
+    def test_nearest(self):
+        buffer = FrameRingBuffer(10)
+        for stamp in (1.0, 2.0, 3.0, 4.0):
+            buffer.push(stamp, stamp)
+        assert buffer.nearest(2.4) == (2.0, 2.0)
+        assert buffer.nearest(2.6) == (3.0, 3.0)
+        assert buffer.nearest(0.0) == (1.0, 1.0)
+        assert buffer.nearest(9.0) == (4.0, 4.0)
+        assert buffer.nearest(9.0, max_delta=1.0) is None
+
+    def test_between_is_inclusive(self):
+        buffer = FrameRingBuffer(10)
+        for stamp in (1.0, 2.0, 3.0, 4.0):
+            buffer.push(stamp, stamp)
+        assert [stamp for stamp, _ in buffer.between(2.0, 3.0)] == [2.0, 3.0]
+        assert buffer.between(5.0, 6.0) == []
+
+    def test_concurrent_reads_are_consistent(self):
+        # The frame of each slot is its stamp, so a torn read would return a mismatched pair
+        buffer = FrameRingBuffer(4)
+        done = threading.Event()
+
+        def produce():
+            for stamp in range(1, 20000):
+                buffer.push(float(stamp), float(stamp))
+            done.set()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        while not done.is_set():
+            nearest = buffer.nearest(5000.0)
+            if nearest is not None:
+                assert nearest[0] == nearest[1]
+            for stamp, frame in buffer.between(0.0, 1e6):
+                assert stamp == frame
+        producer.join()
+        assert buffer.latest() == (19999.0, 19999.0)
+
+
+class TestImageFrameBuffers:
+    def test_buffers_by_source_in_local_time(self):
+        def robot_to_local_time(timestamp):
+            local = type(timestamp)()
+            local.seconds = timestamp.seconds - 10
+            local.nanos = timestamp.nanos
+            return local
+
+        buffers = ImageFrameBuffers(
+            2, robot_to_local_time, logging.getLogger("test_frame_buffer")
+        )
+        for seconds in (11, 12, 13):
+            buffers.add_image(make_depth_response(seconds))
+
+        assert buffers.sources == ["frontleft_depth"]
+        assert buffers.nearest("frontleft_depth", 2.2).data[0, 0] == 12
+        assert buffers.nearest("back_depth", 2.2) is None
+        # Only the two most recent images are kept
+        assert [
+            image.data[0, 0] for image in buffers.between("frontleft_depth", 0, 5)
+        ] == [
+            12,
+            13,
+        ]
+
+    def make_buffers(self):
+        logger = logging.getLogger("test_frame_buffer")
+        handler = CountingHandler()
+        logger.addHandler(handler)
+        buffers = ImageFrameBuffers(2, lambda timestamp: timestamp, logger)
+        return buffers, handler, logger
+
+    def test_drops_images_which_cannot_be_decoded(self):
+        buffers, handler, logger = self.make_buffers()
+        truncated = make_depth_response(1)
+        truncated.shot.image.data = truncated.shot.image.data[:3]
+        corrupted = make_depth_response(2)
+        corrupted.source.name = "hand_color_image"
+        corrupted.shot.image.format = image_pb2.Image.FORMAT_JPEG
+        corrupted.shot.image.pixel_format = image_pb2.Image.PIXEL_FORMAT_RGB_U8
+        try:
+            buffers.add_images([truncated, corrupted, make_depth_response(3)])
+        finally:
+            logger.removeHandler(handler)
+        assert buffers.sources == ["frontleft_depth"]
+        assert buffers.nearest("frontleft_depth", 1.0).data[0, 0] == 3
+        assert len(handler.records) == 2
+
+    def test_unsupported_format_is_logged_once_per_source(self, monkeypatch):
+        monkeypatch.setattr(image_decoding_module, "HAVE_OPENCV", False)
+        buffers, handler, logger = self.make_buffers()
+        try:
+            for seconds in range(5):
+                for source_name in ("hand_color_image", "frontleft_fisheye_image"):
+                    response = make_depth_response(seconds)
+                    response.source.name = source_name
+                    response.shot.image.format = image_pb2.Image.FORMAT_JPEG
+                    assert not buffers.add_image(response)
+        finally:
+            logger.removeHandler(handler)
+        assert len(handler.records) == 2
+        assert buffers.sources == []
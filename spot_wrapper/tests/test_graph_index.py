@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+from bosdyn.api.graph_nav import map_pb2
+
+from spot_wrapper.graph_index import GraphIndex, id_to_short_code
+
+
+def make_graph(num_waypoints: int, names=None) -> map_pb2.Graph:
+    """Make a chain of waypoints with ids in the robot's format, and an edge between consecutive waypoints"""
+    graph = map_pb2.Graph()
+    for i in range(num_waypoints):
+        waypoint = graph.waypoints.add(id=f"w{i}-p{i}-{i:06d}")
+        if names is not None:
+            waypoint.annotations.name = names[i]
+        if i > 0:
+            edge = graph.edges.add()
+            edge.id.from_waypoint = graph.waypoints[i - 1].id
+            edge.id.to_waypoint = waypoint.id
+    return graph
+
+
+class TestGraphIndex:
+    def test_match_edge_in_either_direction(self):
+        index = GraphIndex(make_graph(3))
+        edge_id = index.match_edge("w1-p1-000001", "w0-p0-000000")
+        assert (edge_id.from_waypoint, edge_id.to_waypoint) == (
+            "w0-p0-000000",
+            "w1-p1-000001",
+        )
+        assert index.match_edge("w0-p0-000000", "w2-p2-000002") is None
+        assert index.neighbours("w1-p1-000001") == {"w0-p0-000000", "w2-p2-000002"}
+        assert index.edges_by_destination() == {
+            "w1-p1-000001": ["w0-p0-000000"],
+            "w2-p2-000002": ["w1-p1-000001"],
+        }
+
+    def test_find_unique_waypoint_id(self):
+        graph = make_graph(3, names=["dock", "door", "door"])
+        graph.waypoints.add(id="w0-p9-000009")
+        index = GraphIndex(graph)
+        assert id_to_short_code("w1-p1-000001") == "wp"
+        # Short codes of w1, w2 and w9 are not unique
+        assert index.find_unique_waypoint_id("wp") == "wp"
+        assert index.find_unique_waypoint_id("dock") == "w0-p0-000000"
+        assert index.find_unique_waypoint_id("door") is None
+        assert index.find_unique_waypoint_id("w2-p2-000002") == "w2-p2-000002"
+        assert index.name_to_id() == {"dock": "w0-p0-000000", "door": None}
+
+        graph = map_pb2.Graph()
+        graph.waypoints.add(id="ab-cd-ef")
+        assert GraphIndex(graph).find_unique_waypoint_id("ac") == "ab-cd-ef"
+
+    def test_incremental_update(self):
+        index = GraphIndex(make_graph(4, names=["a", "b", "c", "d"]))
+        graph = make_graph(4, names=["a", "b", "c", "renamed"])
+        del graph.waypoints[0]
+        del graph.edges[0]
+        version = index.version
+        index.update(graph)
+        # One waypoint and one edge removed, one waypoint replaced
+        assert index.version == version + 4
+        assert len(index) == 3
+        assert index.find_unique_waypoint_id("a") == "a"
+        assert index.find_unique_waypoint_id("renamed") == "w3-p3-000003"
+        assert index.match_edge("w0-p0-000000", "w1-p1-000001") is None
+        assert index.neighbours("w1-p1-000001") == {"w2-p2-000002"}
+
+        version = index.version
+        index.update(graph)
+        assert index.version == version
+
+        index.clear()
+        assert len(index) == 0 and not index.edges
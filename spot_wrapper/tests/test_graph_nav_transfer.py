@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import os
+
+import pytest
+from bosdyn.api.graph_nav import map_pb2
+
+from spot_wrapper.snapshot_transfer import SnapshotTransferError
+
+
+class TestDownloadGraph:
+    def test_downloads_all_snapshots_concurrently(
+        self, tmp_path, make_graph_nav_client, make_graph_nav
+    ):
+        client = make_graph_nav_client(20, delay=0.02)
+        graph_nav = make_graph_nav(client)
+        graph_nav._download_filepath = str(tmp_path)
+        graph_nav._download_full_graph()
+        assert 1 < client.max_in_flight <= 8
+        assert sorted(os.listdir(tmp_path / "waypoint_snapshots")) == sorted(
+            f"ws{i}" for i in range(20)
+        )
+        assert len(os.listdir(tmp_path / "edge_snapshots")) == 19
+        with open(tmp_path / "waypoint_snapshots" / "ws3", "rb") as f:
+            assert map_pb2.WaypointSnapshot.FromString(f.read()).id == "ws3"
+
+    def test_resumes_download(self, tmp_path, make_graph_nav_client, make_graph_nav):
+        client = make_graph_nav_client(5)
+        client.failing_ids = {"ws1", "ws2"}
+        graph_nav = make_graph_nav(client)
+        graph_nav._download_filepath = str(tmp_path)
+        progress = graph_nav._download_and_write_waypoint_snapshots(
+            client.graph.waypoints
+        )
+        assert (progress.transferred, progress.failed) == (3, 2)
+        # An empty snapshot file, and a partial one left by an interrupted download, are downloaded again
+        with open(tmp_path / "waypoint_snapshots" / "ws4", "wb"):
+            pass
+        with open(tmp_path / "waypoint_snapshots" / "ws1.part", "wb") as f:
+            f.write(b"partial")
+
+        client.failing_ids = set()
+        client.downloaded = []
+        progress = graph_nav._download_and_write_waypoint_snapshots(
+            client.graph.waypoints
+        )
+        assert sorted(client.downloaded) == ["ws1", "ws2", "ws4"]
+        assert (progress.transferred, progress.skipped) == (3, 2)
+        assert not any(
+            name.endswith(".part")
+            for name in os.listdir(tmp_path / "waypoint_snapshots")
+        )
+
+
+class TestUploadGraph:
+    @pytest.fixture
+    def download_map(self, make_graph_nav, fake_lease):
+        def download_map(client, path):
+            graph_nav = make_graph_nav(client)
+            graph_nav.download_navigation_graph(str(path))
+            graph_nav._lease = fake_lease
+            client.delay = 0.02
+            client.max_in_flight = 0
+            return graph_nav
+
+        return download_map
+
+    def test_uploads_unknown_snapshots_concurrently(
+        self, tmp_path, make_graph_nav_client, download_map
+    ):
+        client = make_graph_nav_client(20)
+        graph_nav = download_map(client, tmp_path)
+        client.robot_snapshot_ids = {"ws0", "es1"}
+        graph_nav.upload_graph_and_snapshots(str(tmp_path))
+        assert 1 < client.max_in_flight <= 8
+        assert sorted(client.uploaded) == sorted(
+            [f"ws{i}" for i in range(1, 20)] + [f"es{i}" for i in range(2, 20)]
+        )
+
+    def test_reupload_is_skipped(self, tmp_path, make_graph_nav_client, download_map):
+        client = make_graph_nav_client(20)
+        graph_nav = download_map(client, tmp_path)
+        graph_nav.upload_graph_and_snapshots(str(tmp_path))
+        client.uploaded = []
+        graph_nav.upload_graph_and_snapshots(str(tmp_path))
+        assert client.uploaded == []
+
+    def test_missing_snapshot_fails_the_upload(
+        self, tmp_path, make_graph_nav_client, download_map
+    ):
+        client = make_graph_nav_client(3)
+        graph_nav = download_map(client, tmp_path)
+        os.remove(tmp_path / "waypoint_snapshots" / "ws1")
+        with pytest.raises(SnapshotTransferError, match="1 of 3 waypoint snapshots"):
+            graph_nav.upload_graph_and_snapshots(str(tmp_path))
+        # The other snapshots are still uploaded
+        assert sorted(client.uploaded) == ["es1", "es2", "ws0", "ws2"]
+
+    def test_failed_upload_raises(self, tmp_path, make_graph_nav_client, download_map):
+        client = make_graph_nav_client(3)
+        graph_nav = download_map(client, tmp_path)
+        client.failing_ids = {"es2"}
+        with pytest.raises(SnapshotTransferError, match="1 of 2 edge snapshots"):
+            graph_nav.upload_graph_and_snapshots(str(tmp_path))
+        assert sorted(client.uploaded) == ["es1", "ws0", "ws1", "ws2"]
+        # The snapshots of a partially uploaded map are not read from it
+        with pytest.raises(ValueError):
+            graph_nav.read_waypoint_snapshot("ws0")
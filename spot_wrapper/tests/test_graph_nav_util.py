@@ -182,3 +182,87 @@ class TestGraphNavUtilUpdateWaypointsEdges:
         assert len(self.name_to_id) == 2
         assert self.name_to_id["Node1"] == "ABCDE"
         assert self.name_to_id["Node2"] == "DE"
+
+
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class TestGraphNavUtilGraphSummary:
+    def make_graph(self):
+        graph = map_pb2.Graph()
+        for waypoint_id, name, seconds in (
+            ("ab-cd-1", "Node1", 30),
+            ("ab-cd-2", "Node2", 10),
+            ("xy-zw-3", "Node2", 20),
+        ):
+            waypoint = graph.waypoints.add(id=waypoint_id)
+            waypoint.annotations.name = name
+            waypoint.annotations.creation_time.seconds = seconds
+        graph.edges.add(
+            id=map_pb2.Edge.Id(from_waypoint="ab-cd-1", to_waypoint="ab-cd-2")
+        )
+        return graph
+
+    def test_summary(self):
+        logger = logging.Logger("test_graph_nav_util", level=logging.INFO)
+        name_to_id, edges = graph_nav_util._update_waypoints_and_edges(
+            self.make_graph(), "xy-zw-3", logger
+        )
+        summary = graph_nav_util._graph_summary
+        assert [waypoint.id for waypoint in summary.waypoints] == [
+            "ab-cd-2",
+            "xy-zw-3",
+            "ab-cd-1",
+        ]
+        assert [waypoint.short_code for waypoint in summary.waypoints] == [
+            None,
+            "xz",
+            None,
+        ]
+        assert [waypoint.is_localized for waypoint in summary.waypoints] == [
+            False,
+            True,
+            False,
+        ]
+        assert summary.name_to_id == name_to_id == {"Node1": "ab-cd-1", "Node2": None}
+        assert summary.edges == edges == {"ab-cd-2": ["ab-cd-1"]}
+        assert summary.num_edges == 1
+
+    def test_per_item_logging_is_opt_in(self):
+        logger = logging.Logger("test_graph_nav_util", level=logging.INFO)
+        handler = CountingHandler()
+        logger.addHandler(handler)
+        graph_nav_util._update_waypoints_and_edges(self.make_graph(), "", logger)
+        assert handler.count == 1
+        graph_nav_util._update_waypoints_and_edges(
+            self.make_graph(), "", logger, log_items=True
+        )
+        assert handler.count == 1 + 1 + 3 + 1
+
+
+class TestGraphNavUtilResolveWaypointId:
+    def test_unknown_and_ambiguous_waypoints(
+        self, caplog, make_graph_nav_client, make_graph_nav
+    ):
+        client = make_graph_nav_client(3)
+        client.graph.waypoints[2].annotations.name = "waypoint_1"
+        graph_nav = make_graph_nav(client)
+        # Without a graph, ids are passed on as they are
+        assert graph_nav._resolve_waypoint_id("wp7") == "wp7"
+        graph_nav._download_current_graph()
+
+        assert graph_nav._resolve_waypoint_id("waypoint_0") == "wp0"
+        assert graph_nav._resolve_waypoint_id("wp2") == "wp2"
+        caplog.clear()
+        assert graph_nav._resolve_waypoint_id("waypoint_1") is None
+        assert "multiple different unique waypoints" in caplog.text
+        caplog.clear()
+        assert graph_nav._resolve_waypoint_id("door") is None
+        assert "Unknown waypoint door" in caplog.text
+        assert "multiple" not in caplog.text
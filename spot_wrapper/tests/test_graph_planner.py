@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+import random
+
+import pytest
+from bosdyn.api.graph_nav import map_pb2
+
+from spot_wrapper.graph_index import GraphIndex
+from spot_wrapper.graph_planner import NoRouteError, RoutePlanner, edge_cost
+
+
+def make_grid_graph(
+    size: int, anchored: bool = True, seed: int = 0, shortcuts: float = 0.3
+) -> map_pb2.Graph:
+    """Make a size x size grid of waypoints 1 m apart, with edges between neighbours and random diagonal shortcuts"""
+    rng = random.Random(seed)
+    graph = map_pb2.Graph()
+
+    def waypoint_id(row, col):
+        return f"wp-{row}-{col}"
+
+    def add_edge(a, b):
+        edge = graph.edges.add()
+        edge.id.from_waypoint = waypoint_id(*a)
+        edge.id.to_waypoint = waypoint_id(*b)
+        edge.from_tform_to.position.x = b[1] - a[1]
+        edge.from_tform_to.position.y = b[0] - a[0]
+
+    for row in range(size):
+        for col in range(size):
+            graph.waypoints.add(id=waypoint_id(row, col))
+            if anchored:
+                anchor = graph.anchoring.anchors.add(id=waypoint_id(row, col))
+                anchor.seed_tform_waypoint.position.x = col
+                anchor.seed_tform_waypoint.position.y = row
+            if col > 0:
+                add_edge((row, col - 1), (row, col))
+            if row > 0:
+                add_edge((row - 1, col), (row, col))
+            if row > 0 and col > 0 and rng.random() < shortcuts:
+                add_edge((row - 1, col - 1), (row, col))
+    return graph
+
+
+def route_cost(index: GraphIndex, route):
+    cost = 0.0
+    for start, goal in zip(route, route[1:]):
+        edge_id = index.match_edge(start, goal)
+        cost += edge_cost(index.edges[(edge_id.from_waypoint, edge_id.to_waypoint)])
+    return cost
+
+
+class TestRoutePlanner:
+    def test_astar_matches_dijkstra(self):
+        anchored = GraphIndex(make_grid_graph(15))
+        unanchored = GraphIndex(make_grid_graph(15, anchored=False))
+        rng = random.Random(1)
+        for _ in range(20):
+            start = f"wp-{rng.randrange(15)}-{rng.randrange(15)}"
+            goal = f"wp-{rng.randrange(15)}-{rng.randrange(15)}"
+            route = RoutePlanner(anchored).plan(start, goal)
+            assert route[0] == start and route[-1] == goal
+            assert route_cost(anchored, route) == pytest.approx(
+                route_cost(unanchored, RoutePlanner(unanchored).plan(start, goal))
+            )
+
+    def test_cost_annotation(self):
+        graph = make_grid_graph(2, anchored=False, shortcuts=0.0)
+        for edge in graph.edges:
+            if edge.id.to_waypoint == "wp-0-1":
+                edge.annotations.cost.value = 10.0
+        planner = RoutePlanner(GraphIndex(graph))
+        assert planner.plan("wp-0-0", "wp-1-1") == ["wp-0-0", "wp-1-0", "wp-1-1"]
+
+    def test_cache_is_dropped_when_graph_changes(self):
+        graph = make_grid_graph(3, anchored=False, shortcuts=0.0)
+        index = GraphIndex(graph)
+        planner = RoutePlanner(index)
+        assert planner.plan("wp-0-0", "wp-0-2") == ["wp-0-0", "wp-0-1", "wp-0-2"]
+        assert len(planner._routes) == 1
+        # The index keeps the messages of the graph, so changes come as a new graph like a download
+        graph = map_pb2.Graph.FromString(graph.SerializeToString())
+        for edge in graph.edges:
+            if edge.id.to_waypoint == "wp-0-2":
+                edge.annotations.cost.value = 100.0
+        index.update(graph)
+        assert planner.plan("wp-0-0", "wp-0-2") == [
+            "wp-0-0",
+            "wp-0-1",
+            "wp-1-1",
+            "wp-1-2",
+            "wp-0-2",
+        ]
+
+    def test_no_route(self):
+        graph = make_grid_graph(2)
+        graph.waypoints.add(id="wp-island-0")
+        planner = RoutePlanner(GraphIndex(graph))
+        with pytest.raises(NoRouteError):
+            planner.plan("wp-0-0", "wp-island-0")
+        with pytest.raises(NoRouteError):
+            planner.plan("wp-0-0", "wp-missing-0")
+
+    def test_plan_through(self):
+        index = GraphIndex(make_grid_graph(4))
+        planner = RoutePlanner(index)
+        route = planner.plan_through(["wp-0-0", "wp-0-3", "wp-3-3"])
+        assert route[0] == "wp-0-0" and route[-1] == "wp-3-3" and "wp-0-3" in route
+        assert len(planner.route_edges(route)) == len(route) - 1
+
+
+class TestPlanRoute:
+    def test_fills_gaps_between_waypoints(self, make_graph_nav_client, make_graph_nav):
+        graph_nav = make_graph_nav(make_graph_nav_client(5))
+        graph_nav._download_current_graph()
+        route, edge_ids = graph_nav.plan_route(["waypoint_0", "wp1", "wp4"])
+        assert route == ["wp0", "wp1", "wp2", "wp3", "wp4"]
+        assert [(e.from_waypoint, e.to_waypoint) for e in edge_ids] == [
+            (f"wp{i}", f"wp{i + 1}") for i in range(4)
+        ]
+
+    def test_unconnected_waypoints(self, make_graph_nav_client, make_graph_nav):
+        client = make_graph_nav_client(3)
+        client.graph.waypoints.add(id="island")
+        graph_nav = make_graph_nav(client)
+        graph_nav._download_current_graph()
+        with pytest.raises(ValueError):
+            graph_nav.plan_route(["wp0", "island"])
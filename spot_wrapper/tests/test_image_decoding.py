@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import pytest
+import numpy as np
+
+from bosdyn.api import image_pb2
+
+from spot_wrapper.image_decoding import (
+    HAVE_OPENCV,
+    ImageDecodeError,
+    UnsupportedImageFormatError,
+    decode_image,
+    decode_image_bundle,
+)
+from spot_wrapper.spot_images import ImageBundle
+
+
+def make_image_response(
+    pixels: np.ndarray, pixel_format: int, source_name: str = "frontleft_depth"
+) -> image_pb2.ImageResponse:
+    response = image_pb2.ImageResponse()
+    response.source.name = source_name
+    response.source.depth_scale = 1000.0
+    response.source.pinhole.intrinsics.focal_length.x = 200.0
+    response.source.pinhole.intrinsics.focal_length.y = 210.0
+    response.source.pinhole.intrinsics.principal_point.x = 4.0
+    response.source.pinhole.intrinsics.principal_point.y = 3.0
+    response.shot.frame_name_image_sensor = source_name
+    response.shot.acquisition_time.seconds = 12
+    response.shot.image.rows = pixels.shape[0]
+    response.shot.image.cols = pixels.shape[1]
+    response.shot.image.format = image_pb2.Image.FORMAT_RAW
+    response.shot.image.pixel_format = pixel_format
+    response.shot.image.data = pixels.tobytes()
+    return response
+
+
+class TestDecodeImage:
+    def test_depth_u16(self):
+        depth = np.arange(6 * 8, dtype=np.uint16).reshape(6, 8)
+        decoded = decode_image(
+            make_image_response(depth, image_pb2.Image.PIXEL_FORMAT_DEPTH_U16)
+        )
+        assert decoded.is_depth
+        assert decoded.data.dtype == np.uint16
+        np.testing.assert_array_equal(decoded.data, depth)
+        # Raw images are views of the response data rather than copies
+        assert not decoded.data.flags.owndata
+        assert decoded.depth_scale == 1000.0
+        assert decoded.intrinsics.fx == 200.0
+        assert decoded.intrinsics.cy == 3.0
+        assert decoded.acquisition_time.seconds == 12
+
+    def test_rgb_u8(self):
+        rgb = np.arange(4 * 5 * 3, dtype=np.uint8).reshape(4, 5, 3)
+        decoded = decode_image(
+            make_image_response(rgb, image_pb2.Image.PIXEL_FORMAT_RGB_U8)
+        )
+        assert decoded.data.shape == (4, 5, 3)
+        np.testing.assert_array_equal(decoded.data, rgb)
+
+    def test_unsupported_format(self):
+        response = make_image_response(
+            np.zeros((2, 2), dtype=np.uint8), image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8
+        )
+        response.shot.image.format = image_pb2.Image.FORMAT_RLE
+        with pytest.raises(UnsupportedImageFormatError):
+            decode_image(response)
+
+    def test_truncated_raw_image(self):
+        response = make_image_response(
+            np.zeros((4, 4), dtype=np.uint16), image_pb2.Image.PIXEL_FORMAT_DEPTH_U16
+        )
+        response.shot.image.data = response.shot.image.data[:5]
+        with pytest.raises(ImageDecodeError):
+            decode_image(response)
+
+    @pytest.mark.skipif(not HAVE_OPENCV, reason="Decoding JPEG images requires OpenCV")
+    def test_corrupted_jpeg_image(self):
+        response = make_image_response(
+            np.zeros((4, 4, 3), dtype=np.uint8), image_pb2.Image.PIXEL_FORMAT_RGB_U8
+        )
+        response.shot.image.format = image_pb2.Image.FORMAT_JPEG
+        response.shot.image.data = b"\xff\xd8 not a jpeg"
+        with pytest.raises(ImageDecodeError):
+            decode_image(response)
+
+    def test_bundle(self):
+        bundle = ImageBundle(
+            *(
+                make_image_response(
+                    np.full((2, 3), i, dtype=np.uint8),
+                    image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8,
+                    source_name=name,
+                )
+                for i, name in enumerate(ImageBundle._fields)
+            )
+        )
+        decoded = decode_image_bundle(bundle)
+        assert isinstance(decoded, ImageBundle)
+        assert decoded.back.source_name == "back"
+        assert decoded.back.data[0, 0] == 4
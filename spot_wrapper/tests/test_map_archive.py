@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import os
+
+import pytest
+
+import spot_wrapper.map_archive as map_archive_module
+from spot_wrapper.map_archive import (
+    MAP_ARCHIVE_COMPRESSION_LEVEL,
+    MapArchive,
+    MapArchiveError,
+    MapArchiveWriter,
+    is_map_archive_path,
+    open_map,
+)
+
+
+def snapshot_data(i: int) -> bytes:
+    return bytes([i % 256]) * (1000 + i)
+
+
+class TestMapArchive:
+    def test_round_trip_with_deduplication(self, tmp_path):
+        path = str(tmp_path / "map.spotmap")
+        with MapArchiveWriter(path) as writer:
+            writer.write_graph(b"graph")
+            for i in range(10):
+                assert writer.write_waypoint_snapshot(f"ws{i}", snapshot_data(i))
+            # An edge snapshot identical to a waypoint snapshot is stored once
+            assert not writer.write_edge_snapshot("es0", snapshot_data(3))
+        # Repeated bytes compress well
+        assert os.path.getsize(path) < 10 * 1000
+
+        with MapArchive(path) as archive:
+            assert archive.read_graph() == b"graph"
+            assert sorted(archive.waypoint_snapshot_ids) == sorted(
+                f"ws{i}" for i in range(10)
+            )
+            assert archive.read_waypoint_snapshot("ws7") == snapshot_data(7)
+            assert archive.read_edge_snapshot("es0") == snapshot_data(3)
+            with pytest.raises(MapArchiveError):
+                archive.read_edge_snapshot("es1")
+
+    def test_resume_after_interruption(self, tmp_path):
+        path = str(tmp_path / "map.spotmap")
+        writer = MapArchiveWriter(path)
+        writer.write_graph(b"graph")
+        writer.write_waypoint_snapshot("ws0", snapshot_data(0))
+        writer.write_waypoint_snapshot("ws1", snapshot_data(1))
+        # Interrupted before the index is written, and in the middle of a record
+        writer._file.write(b"\x00" * 10)
+        writer._file.close()
+
+        with MapArchiveWriter(path) as writer:
+            assert writer.has_waypoint_snapshot("ws1")
+            assert not writer.has_waypoint_snapshot("ws2")
+            writer.write_waypoint_snapshot("ws2", snapshot_data(2))
+        with MapArchiveWriter(path) as writer:
+            writer.write_edge_snapshot("es0", b"edge")
+
+        with MapArchive(path) as archive:
+            assert archive.read_graph() == b"graph"
+            for i in range(3):
+                assert archive.read_waypoint_snapshot(f"ws{i}") == snapshot_data(i)
+            assert archive.read_edge_snapshot("es0") == b"edge"
+
+    def test_detects_corruption(self, tmp_path):
+        path = str(tmp_path / "map.spotmap")
+        with MapArchiveWriter(path) as writer:
+            writer.write_waypoint_snapshot("ws0", os.urandom(1000))
+        with open(path, "r+b") as f:
+            f.seek(200)
+            byte = f.read(1)
+            f.seek(200)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        with MapArchive(path) as archive:
+            with pytest.raises(MapArchiveError):
+                archive.read_waypoint_snapshot("ws0")
+
+    def test_rereads_released_pages(self, tmp_path):
+        path = str(tmp_path / "map.spotmap")
+        with MapArchiveWriter(path) as writer:
+            # Larger than a page, and not aligned to pages
+            for i in range(5):
+                writer.write_waypoint_snapshot(f"ws{i}", os.urandom(5000 + i))
+        with MapArchive(path) as archive:
+            # The pages released after a read are read again from the file
+            for _ in range(2):
+                for i in range(5):
+                    assert len(archive.read_waypoint_snapshot(f"ws{i}")) == 5000 + i
+        with pytest.raises(ValueError):
+            archive.read_waypoint_snapshot("ws0")
+        archive.close()
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "graph"
+        path.write_bytes(b"not an archive")
+        with pytest.raises(MapArchiveError):
+            MapArchive(str(path))
+        assert not is_map_archive_path(str(path))
+        with pytest.raises(MapArchiveError, match="not a map archive"):
+            open_map(str(path))
+
+    def test_renamed_archive_is_recognised(self, tmp_path):
+        path = str(tmp_path / "site.spotmap")
+        with MapArchiveWriter(path) as writer:
+            writer.write_graph(b"graph")
+        renamed = str(tmp_path / "site")
+        os.rename(path, renamed)
+        assert is_map_archive_path(renamed)
+        assert not is_map_archive_path(str(tmp_path))
+        with open_map(renamed) as archive:
+            assert archive.read_graph() == b"graph"
+
+
+class TestGraphNavMapArchive:
+    def test_download_and_upload(
+        self, tmp_path, make_graph_nav_client, make_graph_nav, fake_lease
+    ):
+        path = str(tmp_path / "maps" / "site.spotmap")
+        client = make_graph_nav_client(10)
+        graph_nav = make_graph_nav(client)
+        graph_nav.download_navigation_graph(path)
+        assert os.listdir(tmp_path / "maps") == ["site.spotmap"]
+        with open_map(path) as archive:
+            assert len(archive.waypoint_snapshot_ids) == 10
+            assert len(archive.edge_snapshot_ids) == 9
+
+        # Resuming downloads nothing
+        client.downloaded = []
+        graph_nav.download_navigation_graph(path)
+        assert client.downloaded == []
+
+        graph_nav._lease = fake_lease
+        graph_nav.upload_graph_and_snapshots(path)
+        assert len(client.uploaded) == 19
+
+    def test_read_snapshots_on_demand(
+        self, tmp_path, make_graph_nav_client, make_graph_nav
+    ):
+        graph_nav = make_graph_nav(make_graph_nav_client(3))
+        with pytest.raises(ValueError):
+            graph_nav.read_waypoint_snapshot("ws0")
+        for path in (str(tmp_path / "site.spotmap"), str(tmp_path / "site")):
+            graph_nav.download_navigation_graph(path)
+            assert graph_nav.read_waypoint_snapshot("ws2").id == "ws2"
+            assert graph_nav.read_edge_snapshot("es1").id == "es1"
+            with pytest.raises(MapArchiveError):
+                graph_nav.read_edge_snapshot("es0")
+
+    def test_compression_level(
+        self, tmp_path, monkeypatch, make_graph_nav_client, make_graph_nav
+    ):
+        levels = []
+
+        class RecordingWriter(MapArchiveWriter):
+            def __init__(self, path, compression_level=MAP_ARCHIVE_COMPRESSION_LEVEL):
+                levels.append(compression_level)
+                super(RecordingWriter, self).__init__(path, compression_level)
+
+        monkeypatch.setattr(map_archive_module, "MapArchiveWriter", RecordingWriter)
+        graph_nav = make_graph_nav(make_graph_nav_client(3))
+        graph_nav.download_navigation_graph(str(tmp_path / "site.spotmap"))
+        graph_nav.download_navigation_graph(
+            str(tmp_path / "stored.spotmap"), compression_level=0
+        )
+        assert levels == [MAP_ARCHIVE_COMPRESSION_LEVEL, 0]
+        assert graph_nav.read_waypoint_snapshot("ws2").id == "ws2"
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import logging
+import threading
+import time
+
+import pytest
+from bosdyn.api.graph_nav import graph_nav_pb2
+
+from spot_wrapper.navigation_handle import NavigationCancelled, NavigationHandle
+
+FOLLOWING = graph_nav_pb2.NavigationFeedbackResponse.STATUS_FOLLOWING_ROUTE
+REACHED = graph_nav_pb2.NavigationFeedbackResponse.STATUS_REACHED_GOAL
+STUCK = graph_nav_pb2.NavigationFeedbackResponse.STATUS_STUCK
+
+
+class FakeGraphNavClient:
+    """Reports the goal as reached once it was asked for feedback reached_after times, or once reached_after_commands
+    commands were issued. Counting calls rather than time keeps the tests independent of the load of the machine.
+    """
+
+    def __init__(self, reached_after=None, status=REACHED, reached_after_commands=None):
+        self.reached_after = reached_after
+        self.reached_after_commands = reached_after_commands
+        self.status = status
+        self.commands = []
+        self.feedback_requests = 0
+
+    def issue_command(self, command_id):
+        self.commands.append((time.time(), command_id))
+        return 7 if command_id is None else command_id
+
+    def navigation_feedback(self, command_id=0):
+        self.feedback_requests += 1
+        response = graph_nav_pb2.NavigationFeedbackResponse()
+        if (
+            self.reached_after is not None
+            and self.feedback_requests >= self.reached_after
+        ) or (
+            self.reached_after_commands is not None
+            and len(self.commands) >= self.reached_after_commands
+        ):
+            response.status = self.status
+        else:
+            response.status = FOLLOWING
+        return response
+
+
+def start(client, **kwargs):
+    return NavigationHandle(
+        client, client.issue_command, logging.getLogger("test"), **kwargs
+    ).start()
+
+
+class TestNavigationHandle:
+    def test_resolves_when_goal_is_reached(self):
+        client = FakeGraphNavClient(reached_after=3)
+        handle = start(client, feedback_rate=50.0)
+        feedback = handle.result(timeout=5.0)
+        assert feedback.status == REACHED
+        # The handle resolves on the feedback reaching the goal, without polling again
+        assert client.feedback_requests == 3
+        assert handle.feedback is feedback
+        assert handle.command_id == 7
+
+    def test_renews_the_same_command(self):
+        client = FakeGraphNavClient(reached_after_commands=4)
+        handle = start(client, command_duration=0.2, feedback_rate=20.0)
+        handle.result(timeout=5.0)
+        # Renewed every 0.1 s, passing back the id of the command
+        assert len(client.commands) >= 4
+        assert client.commands[0][1] is None
+        assert all(command_id == 7 for _, command_id in client.commands[1:])
+
+    def test_feedback_rate(self):
+        client = FakeGraphNavClient(reached_after=5)
+        start_time = time.time()
+        start(client, command_duration=10.0, feedback_rate=10.0).result(timeout=5.0)
+        # Four feedback periods pass between the first and the last request. Only a lower bound is checked, as a
+        # loaded machine may delay the requests.
+        assert time.time() - start_time >= 0.35
+        assert client.feedback_requests == 5
+        assert len(client.commands) == 1
+
+    def test_failure_status_is_terminal(self):
+        client = FakeGraphNavClient(reached_after=1, status=STUCK)
+        assert start(client).result(timeout=1.0).status == STUCK
+
+    def test_cancel(self):
+        finished = threading.Event()
+        client = FakeGraphNavClient()
+        handle = start(client, feedback_rate=20.0, on_finished=finished.set)
+        time.sleep(0.1)
+        handle.cancel()
+        with pytest.raises(NavigationCancelled):
+            handle.result(timeout=1.0)
+        assert finished.is_set()
+        issued = len(client.commands)
+        time.sleep(0.1)
+        assert len(client.commands) == issued
+
+    def test_errors_resolve_the_future(self):
+        class FailingClient(FakeGraphNavClient):
+            def navigation_feedback(self, command_id=0):
+                raise RuntimeError("connection lost")
+
+        finished = threading.Event()
+        handle = start(FailingClient(), on_finished=finished.set)
+        with pytest.raises(RuntimeError):
+            handle.result(timeout=1.0)
+        assert finished.is_set()
+
+    def test_result_timeout(self):
+        handle = start(FakeGraphNavClient())
+        with pytest.raises(concurrent.futures.TimeoutError):
+            handle.result(timeout=0.05)
+        handle.cancel()
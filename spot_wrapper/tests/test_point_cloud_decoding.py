@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import logging
+
+import numpy as np
+import pytest
+from bosdyn.api import point_cloud_pb2
+
+from spot_wrapper.point_cloud_decoding import (
+    PointCloudAccumulator,
+    PointCloudDecodeError,
+    UnsupportedPointCloudEncodingError,
+    decode_point_cloud,
+    decode_point_cloud_responses,
+)
+from spot_wrapper.spot_eap import AsyncPointCloudService
+
+
+def make_point_cloud_response(
+    points: np.ndarray, odom_tform_sensor_x: float = 0.0, seconds: int = 0
+) -> point_cloud_pb2.PointCloudResponse:
+    response = point_cloud_pb2.PointCloudResponse()
+    point_cloud = response.point_cloud
+    point_cloud.source.name = "velodyne-point-cloud"
+    point_cloud.source.frame_name_sensor = "sensor"
+    point_cloud.source.acquisition_time.seconds = seconds
+    edges = point_cloud.source.transforms_snapshot.child_to_parent_edge_map
+    edges["odom"].parent_frame_name = ""
+    edges["sensor"].parent_frame_name = "odom"
+    edges["sensor"].parent_tform_child.position.x = odom_tform_sensor_x
+    edges["sensor"].parent_tform_child.rotation.w = 1.0
+    point_cloud.num_points = len(points)
+    point_cloud.encoding = point_cloud_pb2.PointCloud.ENCODING_XYZ_32F
+    point_cloud.data = points.astype(np.float32).tobytes()
+    return response
+
+
+class TestDecodePointCloud:
+    def test_xyz_32f_is_a_view(self):
+        points = np.arange(12, dtype=np.float32).reshape(4, 3)
+        decoded = decode_point_cloud(make_point_cloud_response(points).point_cloud)
+        assert decoded.points.shape == (4, 3)
+        assert not decoded.points.flags.owndata
+        np.testing.assert_array_equal(decoded.points, points)
+        assert decoded.source_name == "velodyne-point-cloud"
+
+    def test_points_in_frame(self):
+        points = np.zeros((2, 3), dtype=np.float32)
+        decoded = decode_point_cloud(
+            make_point_cloud_response(points, odom_tform_sensor_x=1.5).point_cloud
+        )
+        np.testing.assert_array_equal(decoded.points_in_frame("odom")[:, 0], 1.5)
+
+    def test_unsupported_encoding(self):
+        response = make_point_cloud_response(np.zeros((1, 3)))
+        response.point_cloud.encoding = point_cloud_pb2.PointCloud.ENCODING_XYZ_4SC
+        with pytest.raises(UnsupportedPointCloudEncodingError):
+            decode_point_cloud(response.point_cloud)
+
+    def test_truncated_cloud(self):
+        response = make_point_cloud_response(np.zeros((4, 3)))
+        response.point_cloud.data = response.point_cloud.data[:-5]
+        with pytest.raises(PointCloudDecodeError):
+            decode_point_cloud(response.point_cloud)
+        response.point_cloud.num_points = 0
+        with pytest.raises(PointCloudDecodeError):
+            decode_point_cloud(response.point_cloud)
+
+    def test_responses_skip_bad_clouds(self):
+        truncated = make_point_cloud_response(np.zeros((4, 3)))
+        truncated.point_cloud.num_points = 5
+        good = make_point_cloud_response(np.zeros((2, 3)))
+        decoded = decode_point_cloud_responses([truncated, good])
+        assert [len(point_cloud.points) for point_cloud in decoded] == [2]
+
+
+class TestPointCloudAccumulator:
+    def test_keeps_last_scans_in_odom(self):
+        accumulator = PointCloudAccumulator(max_scans=2)
+        for x in (1.0, 2.0, 3.0):
+            accumulator.add_responses(
+                [make_point_cloud_response(np.zeros((1, 3)), odom_tform_sensor_x=x)]
+            )
+        assert len(accumulator) == 2
+        np.testing.assert_array_equal(accumulator.points()[:, 0], [2.0, 3.0])
+        accumulator.clear()
+        assert accumulator.points().shape == (0, 3)
+
+
+class FakeFuture(concurrent.futures.Future):
+    """Future with the interface of the FutureWrapper returned by the async RPCs of the SDK"""
+
+    @property
+    def original_future(self):
+        return self
+
+
+class FakePointCloudClient:
+    """Point cloud client returning the given responses, one per query"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.queries = 0
+
+    def get_point_cloud_async(self, point_cloud_requests):
+        future = FakeFuture()
+        future.set_result([self.responses[self.queries]])
+        self.queries += 1
+        return future
+
+
+class TestAsyncPointCloudService:
+    def test_bad_point_cloud_is_dropped(self):
+        # The snapshot of the bad cloud has no transform to odom
+        bad = make_point_cloud_response(np.zeros((1, 3)))
+        bad.point_cloud.source.frame_name_sensor = "unknown"
+        good = make_point_cloud_response(np.zeros((1, 3)), odom_tform_sensor_x=1.0)
+        client = FakePointCloudClient([bad, bad, good])
+        task = AsyncPointCloudService(
+            client, logging.getLogger("test"), 1000.0, lambda future: None, ["request"]
+        )
+        task.accumulator = PointCloudAccumulator(max_scans=2)
+        for _ in range(3):
+            task.update()  # Starts a query
+            task.update()  # Handles its result
+            assert task._future is None
+            task._last_call = 0.0
+        assert client.queries == 3
+        assert len(task.accumulator) == 1
+        np.testing.assert_array_equal(task.accumulator.points()[:, 0], [1.0])
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import math
+
+import numpy as np
+import pytest
+
+from spot_wrapper.point_cloud_decoding import decode_point_cloud, deskew_point_cloud
+from spot_wrapper.pose_history import PoseHistory
+from test_point_cloud_decoding import make_point_cloud_response
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0)
+
+
+def yaw_quaternion(yaw: float):
+    return math.cos(yaw / 2.0), 0.0, 0.0, math.sin(yaw / 2.0)
+
+
+class TestPoseHistory:
+    def test_interpolates_position_and_rotation(self):
+        history = PoseHistory()
+        history.add(10.0, (0.0, 0.0, 0.0), yaw_quaternion(0.0))
+        history.add(11.0, (2.0, 0.0, 0.0), yaw_quaternion(math.pi / 2.0))
+        positions, rotations = history.interpolate(np.array([10.5, 12.0]))
+        np.testing.assert_allclose(positions, [[1.0, 0.0, 0.0], [2.0, 0.0, 0.0]])
+        yaw = math.atan2(rotations[0, 1, 0], rotations[0, 0, 0])
+        assert yaw == pytest.approx(math.pi / 4.0)
+
+    def test_drops_poses_outside_of_window(self):
+        history = PoseHistory(window_sec=1.0)
+        for stamp in np.arange(0.0, 3.0, 0.25):
+            history.add(stamp, (stamp, 0.0, 0.0), IDENTITY)
+        assert history.time_range == (1.75, 2.75)
+
+    def test_empty_history(self):
+        with pytest.raises(ValueError):
+            PoseHistory().interpolate(np.array([0.0]))
+
+
+class TestDeskew:
+    def test_static_point_seen_while_walking(self):
+        # The body walks along x at 1 m/s while the lidar, at the body origin, scans a wall point at x = 5 in odom
+        history = PoseHistory()
+        for stamp in np.arange(9.0, 11.01, 0.02):
+            history.add(stamp, (stamp - 10.0, 0.0, 0.0), IDENTITY)
+
+        point_times = 10.0 - 0.1 + np.arange(4) * 0.025
+        sensor_points = np.zeros((4, 3))
+        sensor_points[:, 0] = 5.0 - (point_times - 10.0)
+        response = make_point_cloud_response(sensor_points, seconds=10)
+        # The test cloud has its sensor frame attached to odom, reattach it to the body
+        edges = response.point_cloud.source.transforms_snapshot.child_to_parent_edge_map
+        edges["body"].parent_frame_name = "odom"
+        edges["body"].parent_tform_child.rotation.w = 1.0
+        edges["sensor"].parent_frame_name = "body"
+
+        points = deskew_point_cloud(
+            decode_point_cloud(response.point_cloud), history, scan_duration=0.1
+        )
+        np.testing.assert_allclose(points[:, 0], 5.0, atol=1e-5)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import pytest
+import logging
+import random
+
+from bosdyn.client import RpcError
+from bosdyn.client.auth import InvalidLoginError
+
+from spot_wrapper.reconnect import (
+    BackoffPolicy,
+    Reconnector,
+    RetryCancelled,
+)
+from spot_wrapper.wrapper import SpotWrapper
+
+FAST_POLICY = BackoffPolicy(initial_delay=0.001, max_delay=0.004, jitter=0.0)
+
+
+class FakeTimeSync:
+    def wait_for_sync(self, timeout_sec):
+        pass
+
+
+class FakeRobot:
+    """Robot which refuses the first refused_attempts authentication attempts"""
+
+    address = "fake-robot"
+
+    def __init__(self, refused_attempts, password="password"):
+        self.refused_attempts = refused_attempts
+        self.password = password
+        self.attempts = 0
+        self.time_sync = FakeTimeSync()
+
+    def authenticate(self, username, password):
+        self.attempts += 1
+        if self.attempts <= self.refused_attempts:
+            raise RpcError(ConnectionError("robot is booting"))
+        if password != self.password:
+            raise InvalidLoginError(None, "invalid login")
+
+
+class TestBackoffPolicy:
+    def test_delay_grows_and_is_capped(self):
+        policy = BackoffPolicy(initial_delay=0.5, max_delay=4.0, jitter=0.0)
+        assert [policy.delay(attempt) for attempt in range(1, 6)] == [
+            0.5,
+            1.0,
+            2.0,
+            4.0,
+            4.0,
+        ]
+
+    def test_jitter_stays_within_bounds(self):
+        policy = BackoffPolicy(initial_delay=1.0, max_delay=1.0, jitter=0.5)
+        rng = random.Random(0)
+        for _ in range(100):
+            assert 0.5 <= policy.delay(1, rng) <= 1.0
+
+
+class TestAuthenticate:
+    def setup_method(self):
+        self.logger = logging.Logger("test_reconnect", level=logging.INFO)
+
+    def test_succeeds_after_refused_attempts(self):
+        robot = FakeRobot(refused_attempts=3)
+        assert SpotWrapper.authenticate(
+            robot, "user", "password", self.logger, FAST_POLICY
+        )
+        assert robot.attempts == 4
+
+    def test_invalid_login_is_not_retried(self):
+        robot = FakeRobot(refused_attempts=0)
+        with pytest.raises(InvalidLoginError):
+            SpotWrapper.authenticate(robot, "user", "wrong", self.logger, FAST_POLICY)
+        assert robot.attempts == 1
+
+    def test_gives_up_at_deadline(self):
+        robot = FakeRobot(refused_attempts=1000)
+        policy = BackoffPolicy(initial_delay=0.001, max_delay=0.004, deadline=0.05)
+        assert not SpotWrapper.authenticate(
+            robot, "user", "password", self.logger, policy
+        )
+        assert 1 < robot.attempts < 1000
+
+    def test_background_authentication(self):
+        robot = FakeRobot(refused_attempts=5)
+        future = SpotWrapper.authenticate_in_background(
+            robot, "user", "password", self.logger, FAST_POLICY
+        )
+        assert future.result(timeout=5.0)
+        assert robot.attempts == 6
+
+
+class TestReconnector:
+    def test_stop_cancels_background_retries(self):
+        logger = logging.Logger("test_reconnect", level=logging.INFO)
+        reconnector = Reconnector(logger, BackoffPolicy(initial_delay=10.0))
+
+        def _always_fails():
+            raise RpcError(ConnectionError("robot is booting"))
+
+        future = reconnector.run_in_background(_always_fails, "test")
+        reconnector.stop()
+        with pytest.raises(RetryCancelled):
+            future.result(timeout=5.0)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import logging
+import threading
+import time
+
+import pytest
+from bosdyn.client.async_tasks import AsyncPeriodicQuery
+
+from spot_wrapper.scheduler import AsyncTaskScheduler, TaskStatistics
+
+
+class FakeFuture(concurrent.futures.Future):
+    """Future with the interface of the FutureWrapper returned by the async RPCs of the SDK"""
+
+    @property
+    def original_future(self):
+        return self
+
+
+class FakeQuery(AsyncPeriodicQuery):
+    """Periodic query whose result arrives after a latency, recording when queries start and results are handled"""
+
+    def __init__(self, name, rate, latency=0.0):
+        super(FakeQuery, self).__init__(
+            name, None, logging.getLogger("test"), period_sec=1.0 / rate
+        )
+        self.latency = latency
+        self.started = []
+        self.completed = []
+        self.handled = []
+
+    def _start_query(self):
+        self.started.append(time.time())
+        future = FakeFuture()
+        if self.latency > 0.0:
+            threading.Timer(self.latency, self._complete, (future,)).start()
+        else:
+            self._complete(future)
+        return future
+
+    def _complete(self, future):
+        self.completed.append(time.time())
+        future.set_result(len(self.completed))
+
+    def _handle_result(self, result):
+        self.handled.append(time.time())
+        self._proto = result
+
+
+def run_scheduler(tasks, duration):
+    scheduler = AsyncTaskScheduler(tasks, logging.getLogger("test"))
+    scheduler.start()
+    time.sleep(duration)
+    scheduler.stop(timeout=1.0)
+    return scheduler
+
+
+class TestTaskStatistics:
+    def test_rates_and_lateness(self):
+        statistics = TaskStatistics(name="task", period=0.1)
+        assert statistics.requested_rate == 10.0
+        assert statistics.achieved_rate == 0.0
+        for i, lateness in enumerate([0.0, 0.02, 0.01]):
+            statistics.record_run(1.0 + 0.2 * i, lateness)
+        assert statistics.achieved_rate == pytest.approx(5.0)
+        assert statistics.mean_lateness == pytest.approx(0.01)
+        assert statistics.max_lateness == 0.02
+
+
+class TestAsyncTaskScheduler:
+    def test_runs_each_task_at_its_rate(self):
+        fast = FakeQuery("fast", 50.0)
+        slow = FakeQuery("slow", 10.0)
+        scheduler = run_scheduler([fast, slow], 1.0)
+        statistics = scheduler.statistics()
+        # Generous bounds, as the test may run on a loaded machine
+        assert 25.0 < statistics["fast"].achieved_rate <= 52.0
+        assert 5.0 < statistics["slow"].achieved_rate <= 10.5
+        assert statistics["fast"].runs == len(fast.started)
+        assert statistics["fast"].mean_lateness < 0.1
+        assert statistics["slow"].mean_lateness < 0.1
+        assert fast.proto == len(fast.completed)
+
+    def test_results_are_handled_when_the_query_completes(self):
+        # The query takes longer than the period, so results are handled as soon as they arrive rather than at the
+        # next deadline
+        task = FakeQuery("slow-query", 20.0, latency=0.15)
+        run_scheduler([task], 0.6)
+        assert len(task.handled) >= 2
+        for completed, handled in zip(task.completed, task.handled):
+            assert handled - completed < 0.1
+        # A new query is never started while one is in flight
+        for started, completed in zip(task.started[1:], task.completed):
+            assert started >= completed
+
+    def test_stop_and_restart(self):
+        task = FakeQuery("task", 50.0)
+        scheduler = run_scheduler([task], 0.2)
+        assert not scheduler.running
+        assert not any(
+            thread.name == "spot-task-scheduler" for thread in threading.enumerate()
+        )
+        runs = len(task.started)
+        time.sleep(0.1)
+        assert len(task.started) == runs
+
+        scheduler.start()
+        assert scheduler.running
+        time.sleep(0.2)
+        scheduler.stop(timeout=1.0)
+        assert len(task.started) > runs
+        assert scheduler.statistics()["task"].runs == len(task.started)
+
+    def test_failing_task_does_not_stop_the_others(self):
+        class FailingQuery(FakeQuery):
+            def _handle_result(self, result):
+                raise ValueError("bad result")
+
+        failing = FailingQuery("failing", 50.0)
+        task = FakeQuery("task", 50.0)
+        run_scheduler([failing, task], 0.3)
+        assert len(failing.started) > 2
+        assert len(task.handled) > 2
+
+    def test_added_tasks_are_due_immediately(self):
+        scheduler = AsyncTaskScheduler([], logging.getLogger("test"))
+        scheduler.start()
+        task = FakeQuery("late", 0.1)
+        scheduler.add_task(task)
+        time.sleep(0.1)
+        scheduler.stop(timeout=1.0)
+        assert len(task.started) == 1
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import logging
+
+from bosdyn.api import image_pb2
+
+import spot_wrapper.spot_images as spot_images_module
+from spot_wrapper.robot_capabilities import RobotCapabilities
+from spot_wrapper.spot_images import SpotImages
+
+
+class FakeFuture(concurrent.futures.Future):
+    """Future with the interface of the FutureWrapper returned by the async RPCs of the SDK"""
+
+    @property
+    def original_future(self):
+        return self
+
+
+class FakeImageClient:
+    """Image client recording the request lists it is called with"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_image_async(self, image_requests):
+        future = FakeFuture()
+        future.set_result(self.get_image(image_requests))
+        return future
+
+    def get_image(self, image_requests):
+        self.requests.append(image_requests)
+        return [
+            image_pb2.ImageResponse(
+                source=image_pb2.ImageSource(name=request.image_source_name)
+            )
+            for request in image_requests
+        ]
+
+
+def make_spot_images(has_arm=True, rates=None):
+    client = FakeImageClient()
+    robot_params = {
+        "capabilities": RobotCapabilities(has_arm=has_arm),
+        "rates": rates or {},
+        "callbacks": {},
+    }
+    spot_images = SpotImages(
+        None, logging.getLogger("test"), robot_params, {"image_client": client}
+    )
+    return spot_images, client
+
+
+class TestSingleImageRequests:
+    def test_getters_reuse_the_same_request(self, monkeypatch):
+        spot_images, client = make_spot_images()
+
+        def build_image_request(*args, **kwargs):
+            raise AssertionError("The request should have been built at startup")
+
+        monkeypatch.setattr(
+            spot_images_module, "build_image_request", build_image_request
+        )
+        for _ in range(3):
+            spot_images.get_frontleft_rgb_image()
+            spot_images.get_back_rgb_image()
+            spot_images.get_hand_rgb_image()
+        assert len(client.requests) == 9
+        frontleft, back, hand = client.requests[:3]
+        assert all(requests is frontleft for requests in client.requests[0::3])
+        assert all(requests is back for requests in client.requests[1::3])
+        assert all(requests is hand for requests in client.requests[2::3])
+        assert frontleft[0].image_source_name == "frontleft_fisheye_image"
+        assert frontleft[0].image_format == image_pb2.Image.FORMAT_RAW
+        assert hand[0].quality_percent == 50
+
+        # get_image shares the requests of the getters with the same arguments
+        spot_images.get_image("frontleft", image_format=image_pb2.Image.FORMAT_RAW)
+        assert client.requests[-1] is frontleft
+
+    def test_other_requests_are_built_once(self):
+        spot_images, client = make_spot_images()
+        for _ in range(2):
+            response = spot_images.get_image("left", "depth")
+        assert response.source.name == "left_depth"
+        assert client.requests[0] is client.requests[1]
+
+    def test_unknown_camera(self):
+        spot_images, client = make_spot_images(has_arm=False)
+        assert spot_images.get_image("tail") is None
+        assert spot_images.get_image("frontleft", "thermal") is None
+        assert spot_images.get_hand_rgb_image() is None
+        assert client.requests == []
+
+
+class TestImageTasks:
+    def test_each_group_has_its_own_task_and_rate(self):
+        spot_images, client = make_spot_images(
+            rates={"visual_images": 5.0, "depth_images": 0.0}
+        )
+        tasks = spot_images.image_tasks
+        assert sorted(tasks) == ["depth", "depth_registered", "visual"]
+        assert tasks["visual"]._period_sec == 0.2
+        assert tasks["visual"]._query_name == "visual_images"
+
+        for _ in range(2):
+            for task in tasks.values():
+                task.update()
+        # Groups with a rate of 0, or without a rate, are never queried
+        assert len(client.requests) == 1
+        assert [request.image_source_name for request in client.requests[0]] == [
+            "frontleft_fisheye_image",
+            "frontright_fisheye_image",
+            "left_fisheye_image",
+            "right_fisheye_image",
+            "back_fisheye_image",
+            "hand_color_image",
+        ]
+        bundle = spot_images.latest_images("visual")
+        assert bundle.hand.source.name == "hand_color_image"
+        assert spot_images.latest_images("depth") is None
+        assert spot_images.latest_images("depth_registered") is None
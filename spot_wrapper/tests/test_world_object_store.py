@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import logging
+
+from bosdyn.api import world_object_pb2
+
+from spot_wrapper.spot_world_objects import AsyncWorldObjects, SpotWorldObjects
+from spot_wrapper.world_object_store import WorldObjectStore
+
+
+def make_tag(object_id: int, tag_id: int) -> world_object_pb2.WorldObject:
+    world_object = world_object_pb2.WorldObject(id=object_id)
+    world_object.apriltag_properties.tag_id = tag_id
+    return world_object
+
+
+def make_dock(object_id: int) -> world_object_pb2.WorldObject:
+    world_object = world_object_pb2.WorldObject(id=object_id)
+    world_object.dock_properties.dock_id = 520
+    return world_object
+
+
+class TestWorldObjectStore:
+    def test_indexes(self):
+        store = WorldObjectStore()
+        store.merge([make_tag(1, 201), make_tag(2, 202), make_dock(3)], 0.0)
+        assert len(store) == 3
+        assert store.get(3).dock_properties.dock_id == 520
+        assert store.get_by_tag_id(202).id == 2
+        assert store.get_by_tag_id(203) is None
+        tags = store.get_by_type(world_object_pb2.WORLD_OBJECT_APRILTAG)
+        assert sorted(tag.id for tag in tags) == [1, 2]
+
+    def test_update_replaces_object(self):
+        store = WorldObjectStore()
+        store.merge([make_tag(1, 201)], 0.0)
+        store.merge([make_tag(1, 205)], 1.0)
+        assert len(store) == 1
+        assert store.get_by_tag_id(201) is None
+        assert store.get_by_tag_id(205).id == 1
+
+    def test_expires_objects_not_seen_within_ttl(self):
+        store = WorldObjectStore(ttl_sec=5.0)
+        store.merge([make_tag(1, 201), make_tag(2, 202)], 0.0)
+        store.merge([make_tag(2, 202)], 4.0)
+        store.merge([], 6.0)
+        assert 1 not in store
+        assert store.get_by_tag_id(201) is None
+        assert store.get_by_tag_id(202).id == 2
+        store.expire(now=10.0)
+        assert len(store) == 0
+
+
+class FakeFuture:
+    def __init__(self, response):
+        self._response = response
+        self.original_future = self
+
+    def add_done_callback(self, callback):
+        callback(self)
+
+    def done(self):
+        return True
+
+    def result(self):
+        return self._response
+
+
+class FakeWorldObjectClient:
+    def __init__(self):
+        self.time_start_points = []
+        self.object_types = []
+        self.responses = []
+
+    def list_world_objects_async(self, object_type=None, time_start_point=None):
+        self.time_start_points.append(time_start_point)
+        self.object_types.append(object_type)
+        return FakeFuture(self.responses.pop(0))
+
+
+class TestIncrementalPolling:
+    def test_asks_for_updates_since_last_query(self):
+        client = FakeWorldObjectClient()
+        client.responses = [
+            world_object_pb2.ListWorldObjectResponse(
+                world_objects=[make_tag(1, 201), make_tag(2, 202)]
+            ),
+            world_object_pb2.ListWorldObjectResponse(world_objects=[make_tag(2, 202)]),
+        ]
+        task = AsyncWorldObjects(
+            client, logging.getLogger("test"), 10.0, None, overlap_sec=1.0
+        )
+        task.set_store(WorldObjectStore())
+        task._period_sec = 0.0
+        for _ in range(4):
+            task.update()
+
+        assert client.time_start_points[0] is None
+        assert client.time_start_points[1] is not None
+        assert len(task.store) == 2
+        assert len(task.proto.world_objects) == 1
+
+    def test_tasks_by_type_share_a_store(self):
+        client = FakeWorldObjectClient()
+        client.responses = [
+            world_object_pb2.ListWorldObjectResponse(world_objects=[make_tag(1, 201)]),
+            world_object_pb2.ListWorldObjectResponse(world_objects=[make_dock(2)]),
+        ]
+        spot_world_objects = SpotWorldObjects(
+            None,
+            logging.getLogger("test"),
+            {
+                "rates": {
+                    "world_objects_apriltag": 10.0,
+                    "world_objects_dock": 0.2,
+                },
+                "callbacks": {},
+            },
+            {"world_objects_client": client},
+        )
+        tasks = spot_world_objects.async_tasks
+        assert len(tasks) == 2
+        for task in tasks:
+            task.update()
+            task.update()
+
+        assert client.object_types == [
+            [world_object_pb2.WORLD_OBJECT_APRILTAG],
+            [world_object_pb2.WORLD_OBJECT_DOCK],
+        ]
+        store = spot_world_objects.world_object_store
+        assert store.get_by_tag_id(201).id == 1
+        assert len(store.get_by_type(world_object_pb2.WORLD_OBJECT_DOCK)) == 1
+
+    def test_rates_by_type_replace_the_unfiltered_query(self):
+        def task_names(rates):
+            spot_world_objects = SpotWorldObjects(
+                None,
+                logging.getLogger("test"),
+                {"rates": rates, "callbacks": {}},
+                {"world_objects_client": FakeWorldObjectClient()},
+            )
+            return [task._query_name for task in spot_world_objects.async_tasks]
+
+        assert task_names({}) == ["world-objects"]
+        assert task_names({"world_objects_apriltag": 1.0}) == ["world-objects-apriltag"]
+        # The unfiltered query still runs if it is given a rate
+        assert task_names({"world_objects": 2.0, "world_objects_apriltag": 1.0}) == [
+            "world-objects",
+            "world-objects-apriltag",
+        ]
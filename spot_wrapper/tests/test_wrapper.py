@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+import concurrent.futures
+import logging
+import threading
+import time
+from unittest import mock
+
+import pytest
+from bosdyn.api import basic_command_pb2
+from bosdyn.api import image_pb2
+from bosdyn.api import payload_pb2
+from bosdyn.api import robot_command_pb2
+from bosdyn.api import robot_state_pb2
+from bosdyn.client.exceptions import PermissionDeniedError
+from bosdyn.client.image import ImageClient
+from bosdyn.client.map_processing import MapProcessingServiceClient
+from bosdyn.client.payload import PayloadClient
+from bosdyn.client.robot_state import RobotStateClient
+from bosdyn.client.spot_check import SpotCheckClient
+
+import spot_wrapper.wrapper as wrapper_module
+from spot_wrapper.robot_capabilities import RobotCapabilities
+from spot_wrapper.wrapper import SpotWrapper
+
+
+def completed_future(result) -> concurrent.futures.Future:
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
+
+
+class FakeRobot:
+    """Robot whose clients are mocks, recording the services clients were created for"""
+
+    address = "fake-robot"
+
+    def __init__(self, state=None):
+        self.state = state if state is not None else robot_state_pb2.RobotState()
+        self.ensured_services = []
+        self.clients = {}
+        self.time_sync = mock.MagicMock()
+
+    def authenticate(self, username, password):
+        pass
+
+    def sync_with_directory(self):
+        pass
+
+    def power_on(self):
+        self.state.power_state.motor_power_state = robot_state_pb2.PowerState.STATE_ON
+
+    def ensure_client(self, service_name):
+        self.ensured_services.append(service_name)
+        if service_name not in self.clients:
+            client = mock.MagicMock(name=service_name)
+            client.get_robot_state.side_effect = lambda **kwargs: self.state
+            client.get_robot_state_async.side_effect = (
+                lambda **kwargs: completed_future(self.state)
+            )
+            client.list_image_sources_async.return_value = completed_future([])
+            client.list_payloads_async.return_value = completed_future([])
+            self.clients[service_name] = client
+        return self.clients[service_name]
+
+
+class FakeFuture(concurrent.futures.Future):
+    """Future with the interface of the FutureWrapper returned by the async RPCs of the SDK"""
+
+    @property
+    def original_future(self):
+        return self
+
+
+class FakeCommandClient:
+    """Robot command client answering trajectory feedback requests after a latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.status = (
+            basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_GOING_TO_GOAL
+        )
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def robot_command_feedback_async(self, command_id):
+        with self._lock:
+            self.requests.append(command_id)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        response = robot_command_pb2.RobotCommandFeedbackResponse()
+        response.feedback.synchronized_feedback.mobility_command_feedback.se2_trajectory_feedback.status = (
+            self.status
+        )
+        future = FakeFuture()
+        threading.Timer(self.latency, self._respond, (future, response)).start()
+        return future
+
+    def _respond(self, future, response):
+        with self._lock:
+            self.in_flight -= 1
+        future.set_result(response)
+
+
+def make_wrapper(monkeypatch, robot: FakeRobot, **kwargs) -> SpotWrapper:
+    sdk = mock.MagicMock()
+    sdk.create_robot.return_value = robot
+    monkeypatch.setattr(wrapper_module, "create_standard_sdk", lambda name: sdk)
+    wrapper = SpotWrapper(
+        "user", "password", "hostname", "spot", logging.getLogger("test"), **kwargs
+    )
+    assert wrapper.is_valid
+    return wrapper
+
+
+class TestLazyRobotClients:
+    def test_rarely_used_clients_are_created_on_first_access(self, monkeypatch):
+        robot = FakeRobot()
+        wrapper = make_wrapper(monkeypatch, robot)
+        lazy_services = [
+            MapProcessingServiceClient.default_service_name,
+            SpotCheckClient.default_service_name,
+        ]
+        for service_name in lazy_services:
+            assert service_name not in robot.ensured_services
+        assert sorted(wrapper._robot_clients.pending) == [
+            "choreography_client",
+            "map_processing_client",
+            "spot_check_client",
+        ]
+        assert "robot_state_client" in wrapper.client_creation_times
+        assert "map_processing_client" not in wrapper.client_creation_times
+
+        client = wrapper._robot_clients["map_processing_client"]
+        assert client is robot.clients[MapProcessingServiceClient.default_service_name]
+        assert wrapper._robot_clients["map_processing_client"] is client
+        assert robot.ensured_services.count(lazy_services[0]) == 1
+        assert lazy_services[1] not in robot.ensured_services
+        assert "map_processing_client" in wrapper.client_creation_times
+        assert "spot_check_client" in wrapper._robot_clients
+        assert sorted(wrapper._robot_clients.pending) == [
+            "choreography_client",
+            "spot_check_client",
+        ]
+
+    def test_choreography_client_needs_a_license(self, monkeypatch):
+        wrapper = make_wrapper(monkeypatch, FakeRobot())
+        assert wrapper._robot_clients.get("choreography_client") is None
+        assert wrapper.spot_dance is None
+        with pytest.raises(KeyError):
+            wrapper._robot_clients["unknown_client"]
+
+
+class TestTaskScheduler:
+    def test_update_tasks_does_nothing_while_the_scheduler_runs(self, monkeypatch):
+        wrapper = make_wrapper(monkeypatch, FakeRobot())
+        update = mock.MagicMock()
+        monkeypatch.setattr(wrapper._async_tasks, "update", update)
+        wrapper.start_task_scheduler()
+        try:
+            wrapper.updateTasks()
+            update.assert_not_called()
+        finally:
+            wrapper.stop_task_scheduler()
+        wrapper.updateTasks()
+        update.assert_called_once_with()
+
+
+class TestAsyncIdle:
+    LATENCY = 0.1
+
+    def make_idle_task(self, monkeypatch):
+        wrapper = make_wrapper(monkeypatch, FakeRobot())
+        client = FakeCommandClient(self.LATENCY)
+        wrapper._idle_task._client = client
+        return wrapper, wrapper._idle_task, client
+
+    def wait_for_feedback(self, wrapper, idle_task):
+        deadline = time.time() + 5.0
+        while idle_task._pending_feedback and time.time() < deadline:
+            time.sleep(0.005)
+        # Requests are removed from the pending ones under the lock, before the feedback is applied
+        with wrapper._command_lock:
+            pass
+
+    def test_ticks_do_not_wait_for_feedback(self, monkeypatch):
+        wrapper, idle_task, client = self.make_idle_task(monkeypatch)
+        client.latency = 0.5
+        wrapper._last_trajectory_command = 1
+        for _ in range(5):
+            idle_task._start_query()
+        # The ticks returned before the feedback arrived, and only one request is in flight for a command
+        assert client.in_flight == 1
+        assert client.requests == [1]
+        self.wait_for_feedback(wrapper, idle_task)
+        assert client.max_in_flight == 1
+
+    def test_trajectory_feedback_sets_is_moving_on_the_next_tick(self, monkeypatch):
+        wrapper, idle_task, client = self.make_idle_task(monkeypatch)
+        wrapper._last_trajectory_command = 1
+        idle_task._start_query()
+        assert not wrapper._robot_params["is_moving"]
+        self.wait_for_feedback(wrapper, idle_task)
+        idle_task._start_query()
+        assert wrapper._robot_params["is_moving"]
+
+        client.status = basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_AT_GOAL
+        self.wait_for_feedback(wrapper, idle_task)
+        idle_task._start_query()
+        self.wait_for_feedback(wrapper, idle_task)
+        assert wrapper._last_trajectory_command is None
+        assert wrapper._robot_params["at_goal"]
+        idle_task._start_query()
+        assert not wrapper._robot_params["is_moving"]
+
+    def test_feedback_of_a_replaced_command_is_ignored(self, monkeypatch):
+        wrapper, idle_task, client = self.make_idle_task(monkeypatch)
+        client.status = basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_AT_GOAL
+        wrapper._last_trajectory_command = 1
+        idle_task._start_query()
+        # A new trajectory command is sent while the feedback of the previous one is in flight
+        with wrapper._command_lock:
+            wrapper._last_trajectory_command = 2
+        self.wait_for_feedback(wrapper, idle_task)
+        assert wrapper._last_trajectory_command == 2
+        assert not wrapper._robot_params["at_goal"]
+
+        idle_task._start_query()
+        self.wait_for_feedback(wrapper, idle_task)
+        assert client.requests == [1, 2]
+        assert wrapper._last_trajectory_command is None
+
+
+class TestCachedRobotState:
+    def make_wrapper(self, monkeypatch):
+        robot = FakeRobot()
+        wrapper = make_wrapper(
+            monkeypatch, robot, start_estop=False, robot_state_max_age=10.0
+        )
+        state_client = robot.clients[RobotStateClient.default_service_name]
+        state_client.get_robot_state.reset_mock()
+        return wrapper, robot, state_client
+
+    def test_fresh_state_skips_the_rpc(self, monkeypatch):
+        wrapper, robot, state_client = self.make_wrapper(monkeypatch)
+        state = robot_state_pb2.RobotState()
+        wrapper._robot_state_task.cache_state(state)
+        assert wrapper.get_robot_state() is state
+        assert not wrapper.check_is_powered_on()
+        state_client.get_robot_state.assert_not_called()
+
+    def test_stale_state_falls_back_to_the_rpc(self, monkeypatch):
+        wrapper, robot, state_client = self.make_wrapper(monkeypatch)
+        # A state received 20 seconds ago
+        wrapper._robot_state_task._cached_state = (
+            time.time() - 20.0,
+            robot_state_pb2.RobotState(),
+        )
+        assert wrapper.get_robot_state() is robot.state
+        assert state_client.get_robot_state.call_count == 1
+        # The state received is cached for the next caller
+        assert wrapper.get_robot_state() is robot.state
+        assert wrapper.get_robot_state(max_age=0.0) is robot.state
+        assert state_client.get_robot_state.call_count == 2
+
+    def test_power_commands_clear_the_cache(self, monkeypatch):
+        wrapper, robot, state_client = self.make_wrapper(monkeypatch)
+        assert not wrapper.check_is_powered_on()
+        assert wrapper.power_on() == (True, "Success")
+        assert wrapper._robot_state_task.get_cached_state(10.0) is None
+        # The new power state is requested rather than read from the cache
+        assert wrapper.check_is_powered_on()
+        assert state_client.get_robot_state.call_count == 2
+
+        assert wrapper.safe_power_off()[0]
+        assert wrapper._robot_state_task.get_cached_state(10.0) is None
+
+
+class TestRobotCapabilities:
+    def make_robot(self) -> FakeRobot:
+        robot = FakeRobot()
+        payloads = [
+            payload_pb2.Payload(name="Spot CORE", is_enabled=True),
+            payload_pb2.Payload(name="Spot EAP", is_enabled=False),
+        ]
+        robot.ensure_client(
+            PayloadClient.default_service_name
+        ).list_payloads_async.side_effect = lambda **kwargs: completed_future(payloads)
+        robot.ensure_client(
+            ImageClient.default_service_name
+        ).list_image_sources_async.side_effect = lambda **kwargs: completed_future(
+            [image_pb2.ImageSource(name="frontleft_fisheye_image")]
+        )
+        robot.ensured_services.clear()
+        return robot
+
+    def test_from_robot(self):
+        robot = self.make_robot()
+        capabilities = RobotCapabilities.from_robot(robot)
+        assert not capabilities.has_arm
+        assert capabilities.has_payload("CORE")
+        assert not capabilities.has_payload("EAP")
+        assert capabilities.has_image_source("frontleft_fisheye_image")
+        assert not capabilities.has_image_source("hand_color_image")
+
+        robot.state.manipulator_state.SetInParent()
+        assert RobotCapabilities.from_robot(robot).has_arm
+
+    def test_payloads_which_cannot_be_listed(self, monkeypatch, caplog):
+        robot = self.make_robot()
+        payload_client = robot.ensure_client(PayloadClient.default_service_name)
+
+        def list_payloads_async(**kwargs):
+            future = concurrent.futures.Future()
+            future.set_exception(PermissionDeniedError(None, "Permission denied"))
+            return future
+
+        payload_client.list_payloads_async.side_effect = list_payloads_async
+        wrapper = make_wrapper(monkeypatch, robot)
+        # Client creation is not retried, and the robot is taken to have no payload
+        assert payload_client.list_payloads_async.call_count == 1
+        assert wrapper.capabilities.payloads == ()
+        assert wrapper.capabilities.has_image_source("frontleft_fisheye_image")
+        assert "Unable to list the payloads" in caplog.text
+
+    def test_fetched_once_and_refreshed_on_request(self, monkeypatch):
+        robot = self.make_robot()
+        wrapper = make_wrapper(monkeypatch, robot)
+        payload_client = robot.clients[PayloadClient.default_service_name]
+        # The components of the wrapper share the capabilities queried at startup
+        assert payload_client.list_payloads_async.call_count == 1
+        assert wrapper._robot_params["capabilities"] is wrapper.capabilities
+        assert not wrapper.has_arm()
+        assert wrapper.spot_images._robot_params["capabilities"] is wrapper.capabilities
+        assert payload_client.list_payloads_async.call_count == 1
+
+        robot.state.manipulator_state.SetInParent()
+        assert not wrapper.has_arm()
+        capabilities = wrapper.refresh_capabilities(timeout=1.0)
+        assert payload_client.list_payloads_async.call_count == 2
+        payload_client.list_payloads_async.assert_called_with(timeout=1.0)
+        assert capabilities.has_arm and wrapper.has_arm()
+        assert wrapper._robot_params["capabilities"] is capabilities
+
+    def test_has_arm_timeout_is_deprecated(self, monkeypatch):
+        wrapper = make_wrapper(monkeypatch, self.make_robot())
+        with pytest.deprecated_call():
+            assert not wrapper.has_arm(timeout=1.0)
+
+
+class TestImageTasks:
+    def test_one_spot_images_instance_runs_the_image_tasks(self, monkeypatch):
+        robot = FakeRobot()
+        image_client = robot.ensure_client(ImageClient.default_service_name)
+
+        def get_image_async(image_requests):
+            future = FakeFuture()
+            future.set_result(
+                [image_pb2.ImageResponse() for _ in range(len(image_requests))]
+            )
+            return future
+
+        image_client.get_image_async.side_effect = get_image_async
+        wrapper = make_wrapper(
+            monkeypatch, robot, rates={"depth_images": 5.0, "visual_images": 0.0}
+        )
+        assert wrapper.spot_image is wrapper.spot_images
+        for task in wrapper.spot_images.image_tasks.values():
+            assert task in wrapper._async_tasks._tasks
+
+        wrapper.updateTasks()
+        wrapper.updateTasks()
+        assert image_client.get_image_async.call_count == 1
+        assert len(wrapper.depth_images) == 5
+        assert wrapper.camera_images is None
+        assert wrapper.depth_registered_images is None
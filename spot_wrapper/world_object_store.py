@@ -0,0 +1,145 @@
+import threading
+import time
+import typing
+
+from bosdyn.api import world_object_pb2
+
+
+def world_object_type(world_object: world_object_pb2.WorldObject) -> int:
+    """Return the WorldObjectType of a world object, which is given by the properties it has"""
+    if world_object.HasField("apriltag_properties"):
+        return world_object_pb2.WORLD_OBJECT_APRILTAG
+    if world_object.HasField("dock_properties"):
+        return world_object_pb2.WORLD_OBJECT_DOCK
+    if world_object.HasField("image_properties"):
+        return world_object_pb2.WORLD_OBJECT_IMAGE_COORDINATES
+    if world_object.HasField("drawable_properties"):
+        return world_object_pb2.WORLD_OBJECT_DRAWABLE
+    return world_object_pb2.WORLD_OBJECT_UNKNOWN
+
+
+class WorldObjectStore:
+    """Local copy of the world objects known by the robot, built from the incremental responses of the world objects
+    task.
+
+    Objects are indexed by id, by type and by fiducial tag id, so that lookups do not scan the objects. An object which
+    has not been received again for ttl seconds is considered to be no longer seen by the robot and is dropped.
+
+    Objects are merged by the world objects task and read from other threads, so access is serialized with a lock.
+    """
+
+    def __init__(self, ttl_sec: typing.Optional[float] = 30.0):
+        """
+        Args:
+            ttl_sec: Objects which have not been received for this many seconds are dropped. If None, they are kept.
+        """
+        self._ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._objects: typing.Dict[int, world_object_pb2.WorldObject] = {}
+        self._last_seen: typing.Dict[int, float] = {}
+        self._ids_by_type: typing.Dict[int, typing.Set[int]] = {}
+        self._id_by_tag_id: typing.Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __contains__(self, object_id: int) -> bool:
+        return object_id in self._objects
+
+    def _remove(self, object_id: int):
+        # Must be called with the lock held
+        world_object = self._objects.pop(object_id)
+        del self._last_seen[object_id]
+        self._ids_by_type[world_object_type(world_object)].discard(object_id)
+        if world_object.HasField("apriltag_properties"):
+            tag_id = world_object.apriltag_properties.tag_id
+            if self._id_by_tag_id.get(tag_id) == object_id:
+                del self._id_by_tag_id[tag_id]
+
+    def merge(
+        self,
+        world_objects: typing.Iterable[world_object_pb2.WorldObject],
+        received_time: typing.Optional[float] = None,
+    ):
+        """Add or replace world objects, and drop the objects which have expired.
+
+        Args:
+            world_objects: Objects received from the robot
+            received_time: Local time at which the objects were received. Defaults to now.
+        """
+        received_time = time.time() if received_time is None else received_time
+        with self._lock:
+            for world_object in world_objects:
+                object_id = world_object.id
+                if object_id in self._objects:
+                    self._remove(object_id)
+                self._objects[object_id] = world_object
+                self._last_seen[object_id] = received_time
+                self._ids_by_type.setdefault(
+                    world_object_type(world_object), set()
+                ).add(object_id)
+                if world_object.HasField("apriltag_properties"):
+                    self._id_by_tag_id[world_object.apriltag_properties.tag_id] = (
+                        object_id
+                    )
+            self._expire(received_time)
+
+    def _expire(self, now: float):
+        # Must be called with the lock held. Objects are kept in the order they were last merged, so the expired
+        # objects are at the start of the dictionary.
+        if self._ttl_sec is None:
+            return
+        expired = []
+        for object_id, last_seen in self._last_seen.items():
+            if now - last_seen <= self._ttl_sec:
+                break
+            expired.append(object_id)
+        for object_id in expired:
+            self._remove(object_id)
+
+    def expire(self, now: typing.Optional[float] = None):
+        """Drop the objects which have not been received for ttl seconds
+
+        Args:
+            now: Local time to compare against. Defaults to now.
+        """
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+
+    def clear(self):
+        with self._lock:
+            self._objects = {}
+            self._last_seen = {}
+            self._ids_by_type = {}
+            self._id_by_tag_id = {}
+
+    def get(self, object_id: int) -> typing.Optional[world_object_pb2.WorldObject]:
+        """Return the world object with an id, or None"""
+        return self._objects.get(object_id)
+
+    def get_by_tag_id(
+        self, tag_id: int
+    ) -> typing.Optional[world_object_pb2.WorldObject]:
+        """Return the world object of the fiducial with a tag id, or None"""
+        with self._lock:
+            object_id = self._id_by_tag_id.get(tag_id)
+            return self._objects.get(object_id) if object_id is not None else None
+
+    def get_by_type(
+        self, object_type: int
+    ) -> typing.List[world_object_pb2.WorldObject]:
+        """Return the world objects of a type, such as world_object_pb2.WORLD_OBJECT_APRILTAG"""
+        with self._lock:
+            return [
+                self._objects[object_id]
+                for object_id in self._ids_by_type.get(object_type, ())
+            ]
+
+    def world_objects(self) -> typing.List[world_object_pb2.WorldObject]:
+        """Return all world objects"""
+        with self._lock:
+            return list(self._objects.values())
+
+    def last_seen(self, object_id: int) -> typing.Optional[float]:
+        """Return the local time at which an object was last received, or None"""
+        return self._last_seen.get(object_id)
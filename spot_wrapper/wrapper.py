@@ -1,8 +1,11 @@
+import concurrent.futures
 import functools
 import logging
+import threading
 import time
 import traceback
 import typing
+import warnings
 
 import bosdyn.client.auth
 from bosdyn.api import image_pb2
@@ -57,7 +60,14 @@ from .spot_eap import SpotEAP
 from .spot_docking import SpotDocking
 from .spot_graph_nav import SpotGraphNav
 from .spot_check import SpotCheck
-from .spot_images import SpotImages
+from .spot_images import SpotImages, ImageBundle, ImageWithHandBundle
+from .reconnect import BackoffPolicy, Reconnector, RetryDeadlineExceeded
+from .scheduler import AsyncTaskScheduler, TaskStatistics
+from .robot_capabilities import RobotCapabilities
+from .frame_buffer import ImageFrameBuffers
+from .point_cloud_decoding import DecodedPointCloud, PointCloudAccumulator
+from .pose_history import PoseHistory
+from .world_object_store import WorldObjectStore
 
 SPOT_CLIENT_NAME = "ros_spot"
 MAX_COMMAND_DURATION = 1e5
@@ -103,11 +113,15 @@ class MissingSpotArm(Exception):
 class AsyncRobotState(AsyncPeriodicQuery):
     """Class to get robot state at regular intervals.  get_robot_state_async query sent to the robot at every tick.  Callback registered to defined callback function.
 
+    The latest state is also cached along with the time it was received, so that commands which need the current
+    state can reuse it instead of requesting it from the robot.
+
     Attributes:
         client: The Client to a service on the robot
         logger: Logger object
         rate: Rate (Hz) to trigger the query
         callback: Callback function to call when the results of the query are available
+        pose_history: If set, the pose of the body in odom of every state is added to this history
     """
 
     def __init__(self, client, logger, rate, callback):
@@ -117,13 +131,54 @@ class AsyncRobotState(AsyncPeriodicQuery):
         self._callback = None
         if rate > 0.0:
             self._callback = callback
+        # Tuple of (receive time, state) so that both are always replaced together
+        self._cached_state = (0.0, None)
+        self.pose_history: typing.Optional[PoseHistory] = None
 
     def _start_query(self):
         if self._callback:
             callback_future = self._client.get_robot_state_async()
+            callback_future.add_done_callback(self._cache_result)
             callback_future.add_done_callback(self._callback)
             return callback_future
 
+    def _cache_result(self, future):
+        try:
+            self.cache_state(future.result())
+        except (ResponseError, RpcError):
+            # Errors are logged when the result is handled in update()
+            pass
+
+    def cache_state(self, state: robot_state_pb2.RobotState):
+        """Store a robot state received from the robot
+
+        Args:
+            state: The robot state
+        """
+        self._cached_state = (time.time(), state)
+        if self.pose_history is not None:
+            self.pose_history.add_state(state)
+
+    def clear_cached_state(self):
+        """Discard the cached robot state, for example after a command which changes the power state"""
+        self._cached_state = (0.0, None)
+
+    def get_cached_state(
+        self, max_age: float
+    ) -> typing.Optional[robot_state_pb2.RobotState]:
+        """Return the latest robot state if it was received at most max_age seconds ago
+
+        Args:
+            max_age: Maximum age of the state in seconds
+
+        Returns:
+            The latest robot state, or None if there is no state which is recent enough
+        """
+        receive_time, state = self._cached_state
+        if state is None or time.time() - receive_time > max_age:
+            return None
+        return state
+
 
 class AsyncMetrics(AsyncPeriodicQuery):
     """Class to get robot metrics at regular intervals.  get_robot_metrics_async query sent to the robot at every tick.  Callback registered to defined callback function.
@@ -178,6 +233,9 @@ class AsyncLease(AsyncPeriodicQuery):
 class AsyncIdle(AsyncPeriodicQuery):
     """Class to check if the robot is moving, and if not, command a stand with the set mobility parameters
 
+    Feedback for the tracked stand, sit and trajectory commands is requested asynchronously and in parallel, and
+    applied from the future callbacks, so a tick never waits for a round trip to the robot.
+
     Attributes:
         client: The Client to a service on the robot
         logger: Logger object
@@ -189,48 +247,17 @@ class AsyncIdle(AsyncPeriodicQuery):
         super(AsyncIdle, self).__init__("idle", client, logger, period_sec=1.0 / rate)
 
         self._spot_wrapper = spot_wrapper
+        # Feedback requests which are in flight, keyed by the wrapper attribute holding the command id
+        self._pending_feedback = {}
+        # Whether the latest trajectory feedback says the robot is still moving towards the goal
+        self._trajectory_is_moving = False
 
     def _start_query(self):
-        if self._spot_wrapper._last_stand_command != None:
-            try:
-                response = self._client.robot_command_feedback(
-                    self._spot_wrapper._last_stand_command
-                )
-                status = (
-                    response.feedback.synchronized_feedback.mobility_command_feedback.stand_feedback.status
-                )
-                self._spot_wrapper._robot_params["is_sitting"] = False
-                if status == basic_command_pb2.StandCommand.Feedback.STATUS_IS_STANDING:
-                    self._spot_wrapper._robot_params["is_standing"] = True
-                    self._spot_wrapper._last_stand_command = None
-                elif (
-                    status == basic_command_pb2.StandCommand.Feedback.STATUS_IN_PROGRESS
-                ):
-                    self._spot_wrapper._robot_params["is_standing"] = False
-                else:
-                    self._logger.warning("Stand command in unknown state")
-                    self._spot_wrapper._robot_params["is_standing"] = False
-            except (ResponseError, RpcError) as e:
-                self._logger.error("Error when getting robot command feedback: %s", e)
-                self._spot_wrapper._last_stand_command = None
-
-        if self._spot_wrapper._last_sit_command != None:
-            try:
-                self._spot_wrapper._robot_params["is_standing"] = False
-                response = self._client.robot_command_feedback(
-                    self._spot_wrapper._last_sit_command
-                )
-                if (
-                    response.feedback.synchronized_feedback.mobility_command_feedback.sit_feedback.status
-                    == basic_command_pb2.SitCommand.Feedback.STATUS_IS_SITTING
-                ):
-                    self._spot_wrapper._robot_params["is_sitting"] = True
-                    self._spot_wrapper._last_sit_command = None
-                else:
-                    self._spot_wrapper._robot_params["is_sitting"] = False
-            except (ResponseError, RpcError) as e:
-                self._logger.error("Error when getting robot command feedback: %s", e)
-                self._spot_wrapper._last_sit_command = None
+        self._request_feedback("_last_stand_command", self._handle_stand_feedback)
+        self._request_feedback("_last_sit_command", self._handle_sit_feedback)
+        self._request_feedback(
+            "_last_trajectory_command", self._handle_trajectory_feedback
+        )
 
         is_moving = False
 
@@ -240,56 +267,9 @@ class AsyncIdle(AsyncPeriodicQuery):
             else:
                 self._spot_wrapper._last_velocity_command_time = None
 
-        if self._spot_wrapper._last_trajectory_command != None:
-            try:
-                response = self._client.robot_command_feedback(
-                    self._spot_wrapper._last_trajectory_command
-                )
-                status = (
-                    response.feedback.synchronized_feedback.mobility_command_feedback.se2_trajectory_feedback.status
-                )
-                # STATUS_AT_GOAL always means that the robot reached the goal. If the trajectory command did not
-                # request precise positioning, then STATUS_NEAR_GOAL also counts as reaching the goal
-                if (
-                    status
-                    == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_AT_GOAL
-                    or (
-                        status
-                        == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_NEAR_GOAL
-                        and not self._spot_wrapper._last_trajectory_command_precise
-                    )
-                ):
-                    self._spot_wrapper._robot_params["at_goal"] = True
-                    # Clear the command once at the goal
-                    self._spot_wrapper._last_trajectory_command = None
-                    self._spot_wrapper._trajectory_status_unknown = False
-                elif (
-                    status
-                    == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_GOING_TO_GOAL
-                ):
-                    is_moving = True
-                elif (
-                    status
-                    == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_NEAR_GOAL
-                ):
-                    is_moving = True
-                    self._spot_wrapper._robot_params["near_goal"] = True
-                elif (
-                    status
-                    == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_UNKNOWN
-                ):
-                    self._spot_wrapper._trajectory_status_unknown = True
-                    self._spot_wrapper._last_trajectory_command = None
-                else:
-                    self._logger.error(
-                        "Received trajectory command status outside of expected range, value is {}".format(
-                            status
-                        )
-                    )
-                    self._spot_wrapper._last_trajectory_command = None
-            except (ResponseError, RpcError) as e:
-                self._logger.error("Error when getting robot command feedback: %s", e)
-                self._spot_wrapper._last_trajectory_command = None
+        if self._spot_wrapper._last_trajectory_command is None:
+            self._trajectory_is_moving = False
+        is_moving = is_moving or self._trajectory_is_moving
 
         self._spot_wrapper._robot_params["is_moving"] = is_moving
 
@@ -306,6 +286,103 @@ class AsyncIdle(AsyncPeriodicQuery):
         ):
             self._spot_wrapper.stand(False)
 
+    def _request_feedback(self, command_attribute, handler):
+        """Request feedback for the command whose id is stored in the given wrapper attribute, unless there is no
+        such command or a request for it is already in flight."""
+        command_id = getattr(self._spot_wrapper, command_attribute)
+        if command_id is None or command_attribute in self._pending_feedback:
+            return
+        try:
+            future = self._client.robot_command_feedback_async(command_id)
+        except (ResponseError, RpcError) as e:
+            self._logger.error("Error when getting robot command feedback: %s", e)
+            with self._spot_wrapper._command_lock:
+                if getattr(self._spot_wrapper, command_attribute) == command_id:
+                    setattr(self._spot_wrapper, command_attribute, None)
+            return
+        self._pending_feedback[command_attribute] = future
+        future.add_done_callback(
+            functools.partial(self._on_feedback, command_attribute, command_id, handler)
+        )
+
+    def _on_feedback(self, command_attribute, command_id, handler, future):
+        # The command may have been replaced or cleared while the request was in flight, in which case the feedback
+        # is out of date. The lock keeps it from being replaced while the feedback is applied, as handlers clear it.
+        with self._spot_wrapper._command_lock:
+            self._pending_feedback.pop(command_attribute, None)
+            if getattr(self._spot_wrapper, command_attribute) != command_id:
+                return
+            try:
+                response = future.result()
+            except (ResponseError, RpcError) as e:
+                self._logger.error("Error when getting robot command feedback: %s", e)
+                setattr(self._spot_wrapper, command_attribute, None)
+                return
+            handler(response)
+
+    def _handle_stand_feedback(self, response):
+        status = (
+            response.feedback.synchronized_feedback.mobility_command_feedback.stand_feedback.status
+        )
+        self._spot_wrapper._robot_params["is_sitting"] = False
+        if status == basic_command_pb2.StandCommand.Feedback.STATUS_IS_STANDING:
+            self._spot_wrapper._robot_params["is_standing"] = True
+            self._spot_wrapper._last_stand_command = None
+        elif status == basic_command_pb2.StandCommand.Feedback.STATUS_IN_PROGRESS:
+            self._spot_wrapper._robot_params["is_standing"] = False
+        else:
+            self._logger.warning("Stand command in unknown state")
+            self._spot_wrapper._robot_params["is_standing"] = False
+
+    def _handle_sit_feedback(self, response):
+        self._spot_wrapper._robot_params["is_standing"] = False
+        if (
+            response.feedback.synchronized_feedback.mobility_command_feedback.sit_feedback.status
+            == basic_command_pb2.SitCommand.Feedback.STATUS_IS_SITTING
+        ):
+            self._spot_wrapper._robot_params["is_sitting"] = True
+            self._spot_wrapper._last_sit_command = None
+        else:
+            self._spot_wrapper._robot_params["is_sitting"] = False
+
+    def _handle_trajectory_feedback(self, response):
+        status = (
+            response.feedback.synchronized_feedback.mobility_command_feedback.se2_trajectory_feedback.status
+        )
+        self._trajectory_is_moving = False
+        # STATUS_AT_GOAL always means that the robot reached the goal. If the trajectory command did not
+        # request precise positioning, then STATUS_NEAR_GOAL also counts as reaching the goal
+        if (
+            status == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_AT_GOAL
+            or (
+                status
+                == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_NEAR_GOAL
+                and not self._spot_wrapper._last_trajectory_command_precise
+            )
+        ):
+            self._spot_wrapper._robot_params["at_goal"] = True
+            # Clear the command once at the goal
+            self._spot_wrapper._last_trajectory_command = None
+            self._spot_wrapper._trajectory_status_unknown = False
+        elif (
+            status
+            == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_GOING_TO_GOAL
+        ):
+            self._trajectory_is_moving = True
+        elif status == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_NEAR_GOAL:
+            self._trajectory_is_moving = True
+            self._spot_wrapper._robot_params["near_goal"] = True
+        elif status == basic_command_pb2.SE2TrajectoryCommand.Feedback.STATUS_UNKNOWN:
+            self._spot_wrapper._trajectory_status_unknown = True
+            self._spot_wrapper._last_trajectory_command = None
+        else:
+            self._logger.error(
+                "Received trajectory command status outside of expected range, value is {}".format(
+                    status
+                )
+            )
+            self._spot_wrapper._last_trajectory_command = None
+
 
 class AsyncEStopMonitor(AsyncPeriodicQuery):
     """Class to check if the estop endpoint is still valid
@@ -348,6 +425,44 @@ class AsyncEStopMonitor(AsyncPeriodicQuery):
             pass
 
 
+class LazyRobotClients(dict):
+    """Dictionary of robot clients where some clients are only created the first time they are accessed.
+
+    Attributes:
+        clients: Clients which have already been created, keyed by name
+        factories: Zero-argument callables which create the remaining clients, keyed by name
+    """
+
+    def __init__(self, clients, factories):
+        super(LazyRobotClients, self).__init__(clients)
+        self._factories = dict(factories)
+        self._lock = threading.Lock()
+
+    def __missing__(self, key):
+        with self._lock:
+            # Another thread may have created the client while we were waiting for the lock
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+            client = self._factories[key]()
+            self[key] = client
+            del self._factories[key]
+            return client
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._factories
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @property
+    def pending(self) -> typing.List[str]:
+        """Names of the clients which have not been created yet"""
+        return list(self._factories)
+
+
 def try_claim(func=None, *, power_on=False):
     """
     Decorator which tries to acquire the lease before executing the wrapped function
@@ -398,6 +513,8 @@ class SpotWrapper:
         get_lease_on_action: bool = False,
         continually_try_stand: bool = True,
         rgb_cameras: bool = True,
+        backoff_policy: typing.Optional[BackoffPolicy] = None,
+        robot_state_max_age: float = 0.1,
     ):
         """
         Args:
@@ -418,6 +535,12 @@ class SpotWrapper:
             continually_try_stand: If the robot expects to be standing and is not, command a stand.  This can result
                                    in strange behavior if you use the wrapper and tablet together.
             rgb_cameras: If the robot has only body-cameras with greyscale images, this must be set to false.
+            backoff_policy: Backoff between attempts to authenticate and create clients while the robot is booting.
+                            The deadline applies to each of the two steps. If None, retries forever with a backoff
+                            capped at 15 seconds.
+            robot_state_max_age: Maximum age in seconds of the robot state received by the robot state task for it to
+                                 be used by commands which need the current state, such as trajectory_cmd. Older
+                                 states are requested from the robot instead.
         """
         self._username = username
         self._password = password
@@ -435,6 +558,8 @@ class SpotWrapper:
         self._logger = logger
         self._estop_timeout = estop_timeout
         self._start_estop = start_estop
+        self._backoff_policy = backoff_policy
+        self._robot_state_max_age = robot_state_max_age
         self._keep_alive = True
         self._lease_keepalive = None
         self._valid = True
@@ -453,6 +578,9 @@ class SpotWrapper:
         self._last_trajectory_command_precise = None
         self._last_velocity_command_time = None
         self._last_docking_command = None
+        # Held while the id of a tracked command is replaced, and while AsyncIdle applies the feedback of a command,
+        # so that feedback is never applied to a command which replaced the one it was requested for
+        self._command_lock = threading.Lock()
 
         try:
             self._sdk = create_standard_sdk(SPOT_CLIENT_NAME)
@@ -467,7 +595,11 @@ class SpotWrapper:
         self._robot = self._sdk.create_robot(self._hostname)
 
         authenticated = self.authenticate(
-            self._robot, self._username, self._password, self._logger
+            self._robot,
+            self._username,
+            self._password,
+            self._logger,
+            self._backoff_policy,
         )
         if not authenticated:
             self._valid = False
@@ -480,111 +612,24 @@ class SpotWrapper:
 
         # Clients
         self._logger.info("Creating clients...")
-        initialised = False
-        while not initialised:
-            try:
-                self._robot_state_client = self._robot.ensure_client(
-                    RobotStateClient.default_service_name
-                )
-                self._world_objects_client = self._robot.ensure_client(
-                    WorldObjectClient.default_service_name
-                )
-                self._robot_command_client = self._robot.ensure_client(
-                    RobotCommandClient.default_service_name
-                )
-                self._graph_nav_client = self._robot.ensure_client(
-                    GraphNavClient.default_service_name
-                )
-                self._map_processing_client = self._robot.ensure_client(
-                    MapProcessingServiceClient.default_service_name
-                )
-                self._power_client = self._robot.ensure_client(
-                    PowerClient.default_service_name
-                )
-                self._lease_client = self._robot.ensure_client(
-                    LeaseClient.default_service_name
-                )
-                self._lease_wallet = self._lease_client.lease_wallet
-                self._image_client = self._robot.ensure_client(
-                    ImageClient.default_service_name
-                )
-                self._estop_client = self._robot.ensure_client(
-                    EstopClient.default_service_name
-                )
-                self._docking_client = self._robot.ensure_client(
-                    DockingClient.default_service_name
-                )
-                self._spot_check_client = self._robot.ensure_client(
-                    SpotCheckClient.default_service_name
-                )
-                try:
-                    self._point_cloud_client = self._robot.ensure_client(
-                        VELODYNE_SERVICE_NAME
-                    )
-                except UnregisteredServiceError as e:
-                    self._point_cloud_client = None
-                    self._logger.info("Velodyne point cloud service is not available.")
+        self._client_creation_times = {}
 
-                self._license_client = self._robot.ensure_client(
-                    LicenseClient.default_service_name
+        def _log_client_retry(error, attempt, delay):
+            self._logger.warning(
+                "Unable to create client service: {}. This usually means the robot hasn't "
+                "finished booting yet. Will wait {:.1f} seconds and try again.".format(
+                    error, delay
                 )
+            )
 
-                if HAVE_CHOREOGRAPHY_MODULE:
-                    if self._license_client.get_feature_enabled(
-                        [ChoreographyClient.license_name]
-                    )[ChoreographyClient.license_name]:
-                        self._sdk.register_service_client(ChoreographyClient)
-                        self._choreography_client = self._robot.ensure_client(
-                            ChoreographyClient.default_service_name
-                        )
-                        self._is_licensed_for_choreography = True
-                    else:
-                        self._logger.info(
-                            f"Robot is not licensed for choreography: {e}"
-                        )
-                        self._is_licensed_for_choreography = False
-                        self._choreography_client = None
-                else:
-                    self._logger.info(f"Choreography is not available.")
-                    self._is_licensed_for_choreography = False
-                    self._choreography_client = None
-
-                if self._robot.has_arm():
-                    self._manipulation_api_client = self._robot.ensure_client(
-                        ManipulationApiClient.default_service_name
-                    )
-                else:
-                    self._manipulation_api_client = None
-                    self._logger.info("Manipulation API is not available.")
-
-                self._robot_clients = {
-                    "robot_state_client": self._robot_state_client,
-                    "robot_command_client": self._robot_command_client,
-                    "graph_nav_client": self._graph_nav_client,
-                    "map_processing_client": self._map_processing_client,
-                    "power_client": self._power_client,
-                    "lease_client": self._lease_client,
-                    "image_client": self._image_client,
-                    "estop_client": self._estop_client,
-                    "docking_client": self._docking_client,
-                    "spot_check_client": self._spot_check_client,
-                    "robot_command_method": self._robot_command,
-                    "world_objects_client": self._world_objects_client,
-                    "manipulation_api_client": self._manipulation_api_client,
-                    "choreography_client": self._choreography_client,
-                    "point_cloud_client": self._point_cloud_client,
-                }
-
-                initialised = True
-            except Exception as e:
-                sleep_secs = 15
-                self._logger.warning(
-                    "Unable to create client service: {}. This usually means the robot hasn't "
-                    "finished booting yet. Will wait {} seconds and try again.".format(
-                        e, sleep_secs
-                    )
-                )
-                time.sleep(sleep_secs)
+        try:
+            Reconnector(self._logger, self._backoff_policy).run(
+                self._create_clients, "client creation", _log_client_retry
+            )
+        except RetryDeadlineExceeded as e:
+            self._logger.error(f"Failed to create clients: {e}")
+            self._valid = False
+            return
 
         # Core Async Tasks
         self._async_task_list = []
@@ -637,12 +682,19 @@ class SpotWrapper:
             "estop_timeout": self._estop_timeout,
             "rates": self._rates,
             "callbacks": self._callbacks,
+            "capabilities": self._capabilities,
         }
-        self.spot_image = SpotImages(
-            self._robot, self._logger, self._robot_params, self._robot_clients
+        self._spot_images = SpotImages(
+            self._robot,
+            self._logger,
+            self._robot_params,
+            self._robot_clients,
+            self._rgb_cameras,
         )
+        # Kept for compatibility, the same instance as spot_images
+        self.spot_image = self._spot_images
 
-        if self._robot.has_arm():
+        if self._capabilities.has_arm:
             self._spot_arm = SpotArm(
                 self._robot,
                 self._logger,
@@ -664,13 +716,9 @@ class SpotWrapper:
         self._spot_check = SpotCheck(
             self._robot, self._logger, self._robot_params, self._robot_clients
         )
-        self._spot_images = SpotImages(
-            self._robot,
-            self._logger,
-            self._robot_params,
-            self._robot_clients,
-            self._rgb_cameras,
-        )
+        self._frame_buffers: typing.Optional[ImageFrameBuffers] = None
+
+        robot_tasks.extend(self._spot_images.image_tasks.values())
 
         if self._point_cloud_client:
             self._spot_eap = SpotEAP(
@@ -685,17 +733,184 @@ class SpotWrapper:
             self._robot, self._logger, self._robot_params, self._robot_clients
         )
         self._world_objects_task = self._spot_world_objects.async_task
-        robot_tasks.append(self._world_objects_task)
+        robot_tasks.extend(self._spot_world_objects.async_tasks)
 
-        if self._is_licensed_for_choreography:
-            self._spot_dance = SpotDance(
-                self._robot, self._choreography_client, self._logger
-            )
+        # Created on first use, see the spot_dance property
+        self._spot_dance = None
 
         self._async_tasks = AsyncTasks(robot_tasks)
+        self._task_scheduler = AsyncTaskScheduler(robot_tasks, self._logger)
+
+    def _timed_client(
+        self, name: str, create: typing.Callable[[], typing.Any]
+    ) -> typing.Any:
+        """Create a client and record how long it took in the client creation times"""
+        start = time.time()
+        client = create()
+        self._client_creation_times[name] = time.time() - start
+        return client
+
+    def _ensure_optional_client(self, service_name: str) -> typing.Any:
+        """Create a client for a service which may not be registered on the robot, returning None if it is not."""
+        try:
+            return self._robot.ensure_client(service_name)
+        except UnregisteredServiceError:
+            return None
+
+    def _check_choreography_license(self) -> bool:
+        if not HAVE_CHOREOGRAPHY_MODULE:
+            return False
+        license_client = self._robot.ensure_client(LicenseClient.default_service_name)
+        return license_client.get_feature_enabled([ChoreographyClient.license_name])[
+            ChoreographyClient.license_name
+        ]
+
+    def _ensure_choreography_client(self) -> typing.Optional["ChoreographyClient"]:
+        if not self._is_licensed_for_choreography:
+            return None
+        return self._robot.ensure_client(ChoreographyClient.default_service_name)
+
+    def _create_clients(self):
+        """Create the clients for the robot services.
+
+        Clients which are needed by the wrapper are created concurrently on a thread pool, so that startup time is
+        bounded by the slowest client rather than the sum of all of them. Clients which are rarely used are only
+        created the first time they are accessed through _robot_clients.
+        """
+        start = time.time()
+        # Synchronise with the directory once up front, rather than having each worker do it
+        self._robot.sync_with_directory()
+
+        eager_clients = {
+            "robot_state_client": RobotStateClient.default_service_name,
+            "world_objects_client": WorldObjectClient.default_service_name,
+            "robot_command_client": RobotCommandClient.default_service_name,
+            "graph_nav_client": GraphNavClient.default_service_name,
+            "power_client": PowerClient.default_service_name,
+            "lease_client": LeaseClient.default_service_name,
+            "image_client": ImageClient.default_service_name,
+            "estop_client": EstopClient.default_service_name,
+            "docking_client": DockingClient.default_service_name,
+            "license_client": LicenseClient.default_service_name,
+        }
+        jobs = {
+            name: functools.partial(self._robot.ensure_client, service_name)
+            for name, service_name in eager_clients.items()
+        }
+        jobs["point_cloud_client"] = functools.partial(
+            self._ensure_optional_client, VELODYNE_SERVICE_NAME
+        )
+        jobs["capabilities"] = functools.partial(
+            RobotCapabilities.from_robot, self._robot, logger=self._logger
+        )
+        jobs["choreography_license"] = self._check_choreography_license
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(jobs), thread_name_prefix="spot-client"
+        ) as executor:
+            futures = {
+                name: executor.submit(self._timed_client, name, job)
+                for name, job in jobs.items()
+            }
+            # Raises the first failure, which is handled by the retry loop in the constructor
+            results = {name: future.result() for name, future in futures.items()}
+
+        self._robot_state_client = results["robot_state_client"]
+        self._world_objects_client = results["world_objects_client"]
+        self._robot_command_client = results["robot_command_client"]
+        self._graph_nav_client = results["graph_nav_client"]
+        self._power_client = results["power_client"]
+        self._lease_client = results["lease_client"]
+        self._lease_wallet = self._lease_client.lease_wallet
+        self._image_client = results["image_client"]
+        self._estop_client = results["estop_client"]
+        self._docking_client = results["docking_client"]
+        self._license_client = results["license_client"]
+        self._point_cloud_client = results["point_cloud_client"]
+        self._capabilities = results["capabilities"]
+        self._manipulation_api_client = None
+        if self._capabilities.has_arm:
+            self._manipulation_api_client = self._timed_client(
+                "manipulation_api_client",
+                functools.partial(
+                    self._robot.ensure_client,
+                    ManipulationApiClient.default_service_name,
+                ),
+            )
+        self._is_licensed_for_choreography = results["choreography_license"]
+
+        if self._point_cloud_client is None:
+            self._logger.info("Velodyne point cloud service is not available.")
+        if self._manipulation_api_client is None:
+            self._logger.info("Manipulation API is not available.")
+        if not HAVE_CHOREOGRAPHY_MODULE:
+            self._logger.info("Choreography is not available.")
+        elif not self._is_licensed_for_choreography:
+            self._logger.info("Robot is not licensed for choreography.")
+
+        self._robot_clients = LazyRobotClients(
+            {
+                "robot_state_client": self._robot_state_client,
+                "robot_command_client": self._robot_command_client,
+                "graph_nav_client": self._graph_nav_client,
+                "power_client": self._power_client,
+                "lease_client": self._lease_client,
+                "image_client": self._image_client,
+                "estop_client": self._estop_client,
+                "docking_client": self._docking_client,
+                "robot_command_method": self._robot_command,
+                "world_objects_client": self._world_objects_client,
+                "manipulation_api_client": self._manipulation_api_client,
+                "point_cloud_client": self._point_cloud_client,
+            },
+            {
+                "map_processing_client": functools.partial(
+                    self._timed_client,
+                    "map_processing_client",
+                    functools.partial(
+                        self._robot.ensure_client,
+                        MapProcessingServiceClient.default_service_name,
+                    ),
+                ),
+                "spot_check_client": functools.partial(
+                    self._timed_client,
+                    "spot_check_client",
+                    functools.partial(
+                        self._robot.ensure_client, SpotCheckClient.default_service_name
+                    ),
+                ),
+                "choreography_client": functools.partial(
+                    self._timed_client,
+                    "choreography_client",
+                    self._ensure_choreography_client,
+                ),
+            },
+        )
+
+        self._logger.info(
+            "Created clients in {:.3f} seconds ({})".format(
+                time.time() - start,
+                ", ".join(
+                    "{}: {:.3f}s".format(name, duration)
+                    for name, duration in sorted(
+                        self._client_creation_times.items(),
+                        key=lambda item: item[1],
+                        reverse=True,
+                    )
+                ),
+            )
+        )
+
+    @staticmethod
+    def _authenticate_once(robot, username, password, logger):
+        logger.info("Trying to authenticate with robot...")
+        robot.authenticate(username, password)
+        robot.time_sync.wait_for_sync(10)
+        logger.info("Successfully authenticated.")
+        return True
 
     @staticmethod
-    def authenticate(robot, username, password, logger):
+    def authenticate(robot, username, password, logger, backoff_policy=None):
         """
         Authenticate with a robot through the bosdyn API. A blocking function which will wait until authenticated (if
         the robot is still booting) or login fails
@@ -705,32 +920,62 @@ class SpotWrapper:
             username: Username to authenticate with
             password: Password for the given username
             logger: Logger with which to print messages
+            backoff_policy: Backoff between attempts while the robot cannot be reached. If None, retries forever with
+                            a backoff capped at 15 seconds.
 
         Returns:
-
+            True if authenticated, False if the robot could not be reached before the deadline of the backoff policy
         """
-        authenticated = False
-        while not authenticated:
-            try:
-                logger.info("Trying to authenticate with robot...")
-                robot.authenticate(username, password)
-                robot.time_sync.wait_for_sync(10)
-                logger.info("Successfully authenticated.")
-                authenticated = True
-            except RpcError as err:
-                sleep_secs = 15
-                logger.warn(
-                    "Failed to communicate with robot: {}\nEnsure the robot is powered on and you can "
-                    "ping {}. Robot may still be booting. Will retry in {} seconds".format(
-                        err, robot.address, sleep_secs
-                    )
+
+        def _log_retry(err, attempt, delay):
+            logger.warning(
+                "Failed to communicate with robot: {}\nEnsure the robot is powered on and you can "
+                "ping {}. Robot may still be booting. Will retry in {:.1f} seconds".format(
+                    err, robot.address, delay
                 )
-                time.sleep(sleep_secs)
-            except bosdyn.client.auth.InvalidLoginError as err:
-                logger.error("Failed to log in to robot: {}".format(err))
-                raise err
+            )
+
+        try:
+            return Reconnector(logger, backoff_policy, retry_on=(RpcError,)).run(
+                functools.partial(
+                    SpotWrapper._authenticate_once, robot, username, password, logger
+                ),
+                "authentication",
+                _log_retry,
+            )
+        except bosdyn.client.auth.InvalidLoginError as err:
+            logger.error("Failed to log in to robot: {}".format(err))
+            raise err
+        except RetryDeadlineExceeded as err:
+            logger.error("Failed to authenticate with robot: {}".format(err))
+            return False
+
+    @staticmethod
+    def authenticate_in_background(
+        robot, username, password, logger, backoff_policy=None
+    ) -> concurrent.futures.Future:
+        """
+        Non-blocking version of authenticate, which retries on a background thread.
 
-        return authenticated
+        Args:
+            robot: Robot object which we are authenticating with
+            username: Username to authenticate with
+            password: Password for the given username
+            logger: Logger with which to print messages
+            backoff_policy: Backoff between attempts while the robot cannot be reached
+
+        Returns:
+            Future which resolves to True once authenticated, or raises InvalidLoginError if login fails or
+            RetryDeadlineExceeded if the robot could not be reached before the deadline of the backoff policy
+        """
+        return Reconnector(
+            logger, backoff_policy, retry_on=(RpcError,)
+        ).run_in_background(
+            functools.partial(
+                SpotWrapper._authenticate_once, robot, username, password, logger
+            ),
+            "authentication",
+        )
 
     @property
     def robot_name(self) -> str:
@@ -748,7 +993,7 @@ class SpotWrapper:
     @property
     def spot_arm(self) -> SpotArm:
         """Return SpotArm instance"""
-        if not self._robot.has_arm():
+        if not self._capabilities.has_arm:
             raise MissingSpotArm()
         else:
             return self._spot_arm
@@ -778,6 +1023,20 @@ class SpotWrapper:
         """Return SpotCheck instance"""
         return self._spot_check
 
+    @property
+    def spot_dance(self) -> typing.Optional["SpotDance"]:
+        """Return SpotDance instance, or None if the robot is not licensed for choreography"""
+        if self._spot_dance is None and self._is_licensed_for_choreography:
+            self._spot_dance = SpotDance(
+                self._robot, self._robot_clients["choreography_client"], self._logger
+            )
+        return self._spot_dance
+
+    @property
+    def client_creation_times(self) -> typing.Dict[str, float]:
+        """Return the time in seconds it took to create each robot client"""
+        return dict(self._client_creation_times)
+
     @property
     def logger(self) -> logging.Logger:
         """Return logger instance of the SpotWrapper"""
@@ -813,16 +1072,47 @@ class SpotWrapper:
         """Return most recent proto from _world_objects_task"""
         return self.spot_world_objects.async_task.proto
 
+    @property
+    def world_object_store(self) -> typing.Optional[WorldObjectStore]:
+        """Return the store of world objects kept by incremental polling, or None if it was not started"""
+        return self.spot_world_objects.world_object_store
+
     @property
     def hand_images(self) -> typing.List[image_pb2.ImageResponse]:
         """Return latest proto from the _hand_image_task"""
         return self.spot_arm.hand_image_task.proto
 
+    @property
+    def camera_images(
+        self,
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        """Return latest bundle from the periodic visual image task"""
+        return self.spot_images.latest_images("visual")
+
+    @property
+    def depth_images(
+        self,
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        """Return latest bundle from the periodic depth image task"""
+        return self.spot_images.latest_images("depth")
+
+    @property
+    def depth_registered_images(
+        self,
+    ) -> typing.Optional[typing.Union[ImageBundle, ImageWithHandBundle]]:
+        """Return latest bundle from the periodic depth_registered image task"""
+        return self.spot_images.latest_images("depth_registered")
+
     @property
     def point_clouds(self) -> typing.List[point_cloud_pb2.PointCloudResponse]:
         """Return latest proto from the _point_cloud_task"""
         return self.spot_eap_lidar.async_task.proto
 
+    @property
+    def decoded_point_clouds(self) -> typing.List[DecodedPointCloud]:
+        """Return the latest point clouds from the _point_cloud_task as NumPy arrays, without copying the points"""
+        return self.spot_eap_lidar.decoded_point_clouds
+
     @property
     def is_standing(self) -> bool:
         """Return boolean of standing state"""
@@ -850,7 +1140,38 @@ class SpotWrapper:
         return self._robot.is_estopped(timeout=timeout)
 
     def has_arm(self, timeout=None):
-        return self._robot.has_arm(timeout=timeout)
+        """Return whether the robot has an arm, from the capabilities queried at startup or by refresh_capabilities.
+
+        Args:
+            timeout: Deprecated and ignored, as no RPC is made. Use refresh_capabilities to query the robot again.
+        """
+        if timeout is not None:
+            warnings.warn(
+                "The timeout argument of has_arm is ignored and will be removed, as the capabilities are cached. Use "
+                "refresh_capabilities to query the robot again.",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+        return self._capabilities.has_arm
+
+    @property
+    def capabilities(self) -> RobotCapabilities:
+        """Return the hardware configuration of the robot, as queried at startup or by refresh_capabilities"""
+        return self._capabilities
+
+    def refresh_capabilities(self, timeout=None) -> RobotCapabilities:
+        """Query the hardware configuration of the robot again, for example after a payload was attached.
+
+        Components which were configured from the previous capabilities, such as the arm, are not recreated.
+
+        Args:
+            timeout: Number of seconds to wait for each RPC response
+        """
+        self._capabilities = RobotCapabilities.from_robot(
+            self._robot, timeout, self._logger
+        )
+        self._robot_params["capabilities"] = self._capabilities
+        return self._capabilities
 
     @property
     def time_skew(self) -> Timestamp:
@@ -902,12 +1223,115 @@ class SpotWrapper:
             return False, str(err)
 
     def updateTasks(self):
-        """Loop through all periodic tasks and update their data if needed."""
+        """Loop through all periodic tasks and update their data if needed.
+
+        This does nothing while the task scheduler is running, as the tasks are then updated on its thread.
+        """
+        if self._task_scheduler.running:
+            return
         try:
             self._async_tasks.update()
         except Exception as e:
             self._logger.error(f"Update tasks failed with error: {str(e)}")
 
+    def _periodic_image_tasks(self) -> typing.List[AsyncPeriodicQuery]:
+        image_tasks = list(self._spot_images.image_tasks.values())
+        if self._spot_arm is not None:
+            image_tasks.append(self._spot_arm.hand_image_task)
+        return image_tasks
+
+    def start_frame_buffers(self, capacity: int = 30) -> ImageFrameBuffers:
+        """Keep the most recent images received by the periodic image tasks in a ring buffer for each image source,
+        so the image nearest a given time can be looked up.
+
+        Args:
+            capacity: Number of images to keep for each image source
+
+        Returns:
+            The buffers, which are also available from frame_buffers
+        """
+        self._frame_buffers = ImageFrameBuffers(
+            capacity, self.robotToLocalTime, self._logger
+        )
+        for task in self._periodic_image_tasks():
+            task.frame_buffers = self._frame_buffers
+        return self._frame_buffers
+
+    def stop_frame_buffers(self):
+        """Stop adding images to the buffers started by start_frame_buffers"""
+        for task in self._periodic_image_tasks():
+            task.frame_buffers = None
+        self._frame_buffers = None
+
+    def start_pose_history(self, window_sec: float = 10.0) -> PoseHistory:
+        """Keep the pose of the body in odom from the states received by the robot state task over a sliding window,
+        so that it can be interpolated at the acquisition time of sensor data. The robot state task only runs if it
+        has a positive rate and a callback.
+
+        Args:
+            window_sec: Length of the window in seconds
+
+        Returns:
+            The history, which is also available from pose_history
+        """
+        self._robot_state_task.pose_history = PoseHistory(window_sec)
+        return self._robot_state_task.pose_history
+
+    def stop_pose_history(self):
+        """Stop adding poses to the history started by start_pose_history"""
+        self._robot_state_task.pose_history = None
+
+    @property
+    def pose_history(self) -> typing.Optional[PoseHistory]:
+        """Return the history started by start_pose_history, or None"""
+        return self._robot_state_task.pose_history
+
+    def start_point_cloud_accumulation(
+        self,
+        max_scans: int,
+        scan_duration: float = 0.1,
+        max_age: typing.Optional[float] = None,
+        window_sec: float = 10.0,
+    ) -> PointCloudAccumulator:
+        """Accumulate the scans of the point cloud task into a rolling cloud in odom, de-skewed with the pose history.
+        The pose history is started if it is not running yet.
+
+        Args:
+            max_scans: Number of scans to keep
+            scan_duration: Time in seconds taken to capture a scan, 0.1 for a VLP-16 spinning at 10 Hz
+            max_age: If set, scans acquired more than this many seconds before the latest scan are dropped
+            window_sec: Length of the pose history window in seconds, if it is started
+
+        Returns:
+            The accumulator, which is also available from spot_eap_lidar.accumulator
+        """
+        pose_history = self.pose_history or self.start_pose_history(window_sec)
+        return self.spot_eap_lidar.start_accumulating(
+            max_scans,
+            pose_history=pose_history,
+            scan_duration=scan_duration,
+            max_age=max_age,
+        )
+
+    @property
+    def frame_buffers(self) -> typing.Optional[ImageFrameBuffers]:
+        """Return the image buffers started by start_frame_buffers, or None"""
+        return self._frame_buffers
+
+    def start_task_scheduler(self):
+        """Run the periodic tasks on a dedicated background thread at their own rates, instead of when updateTasks
+        is called."""
+        self._task_scheduler.start()
+
+    def stop_task_scheduler(self):
+        """Stop the background thread started by start_task_scheduler. updateTasks must be called again afterwards."""
+        self._task_scheduler.stop()
+
+    @property
+    def task_statistics(self) -> typing.Dict[str, TaskStatistics]:
+        """Return the achieved rate and lateness of each periodic task run by the task scheduler"""
+        return self._task_scheduler.statistics()
+
     def resetEStop(self):
         """Get keepalive for eStop"""
         self._estop_endpoint = EstopEndpoint(
@@ -973,6 +1397,7 @@ class SpotWrapper:
 
     def disconnect(self):
         """Release control of robot as gracefully as posssible."""
+        self._task_scheduler.stop()
         if self._robot.time_sync:
             self._robot.time_sync.stop()
         self.releaseLease()
@@ -1019,7 +1444,8 @@ class SpotWrapper:
     def sit(self):
         """Stop the robot's motion and sit down if able."""
         response = self._robot_command(RobotCommandBuilder.synchro_sit_command())
-        self._last_sit_command = response[2]
+        with self._command_lock:
+            self._last_sit_command = response[2]
         return response[0], response[1]
 
     @try_claim(power_on=True)
@@ -1029,7 +1455,8 @@ class SpotWrapper:
             RobotCommandBuilder.synchro_stand_command(params=self._mobility_params)
         )
         if monitor_command:
-            self._last_stand_command = response[2]
+            with self._command_lock:
+                self._last_stand_command = response[2]
         return response[0], response[1]
 
     @try_claim(power_on=True)
@@ -1065,7 +1492,8 @@ class SpotWrapper:
             )
 
         if monitor_command:
-            self._last_stand_command = response[2]
+            with self._command_lock:
+                self._last_stand_command = response[2]
         return response[0], response[1]
 
     @try_claim(power_on=True)
@@ -1087,6 +1515,7 @@ class SpotWrapper:
     def safe_power_off(self):
         """Stop the robot's motion and sit if possible.  Once sitting, disable motor power."""
         response = self._robot_command(RobotCommandBuilder.safe_power_off_command())
+        self._robot_state_task.clear_cached_state()
         return response[0], response[1]
 
     def clear_behavior_fault(self, id):
@@ -1112,6 +1541,8 @@ class SpotWrapper:
                 self._robot.power_on()
             except Exception as e:
                 return False, f"Exception while powering on: {e}"
+            finally:
+                self._robot_state_task.clear_cached_state()
 
             return True, "Success"
 
@@ -1191,7 +1622,7 @@ class SpotWrapper:
         end_time = time.time() + cmd_duration
         if frame_name == "vision":
             vision_tform_body = frame_helpers.get_vision_tform_body(
-                self._robot_state_client.get_robot_state().kinematic_state.transforms_snapshot
+                self.get_robot_state().kinematic_state.transforms_snapshot
             )
             body_tform_goal = math_helpers.SE3Pose(
                 x=goal_x, y=goal_y, z=0, rot=math_helpers.Quat.from_yaw(goal_heading)
@@ -1209,7 +1640,7 @@ class SpotWrapper:
             )
         elif frame_name == "odom":
             odom_tform_body = frame_helpers.get_odom_tform_body(
-                self._robot_state_client.get_robot_state().kinematic_state.transforms_snapshot
+                self.get_robot_state().kinematic_state.transforms_snapshot
             )
             body_tform_goal = math_helpers.SE3Pose(
                 x=goal_x, y=goal_y, z=0, rot=math_helpers.Quat.from_yaw(goal_heading)
@@ -1228,7 +1659,8 @@ class SpotWrapper:
         else:
             raise ValueError("frame_name must be 'vision' or 'odom'")
         if response[0]:
-            self._last_trajectory_command = response[2]
+            with self._command_lock:
+                self._last_trajectory_command = response[2]
         return response[0], response[1]
 
     def robot_command(
@@ -1246,16 +1678,36 @@ class SpotWrapper:
     ) -> robot_command_pb2.RobotCommandFeedbackResponse:
         return self._robot_command_client.robot_command_feedback(cmd_id)
 
+    def get_robot_state(
+        self, max_age: typing.Optional[float] = None
+    ) -> robot_state_pb2.RobotState:
+        """Get the current robot state, reusing the latest state from the robot state task if it is recent enough.
+
+        Args:
+            max_age: Maximum age in seconds of a state received by the robot state task for it to be reused. Defaults
+                     to the robot_state_max_age given to the constructor.
+
+        Returns:
+            The robot state
+        """
+        if max_age is None:
+            max_age = self._robot_state_max_age
+        state = self._robot_state_task.get_cached_state(max_age)
+        if state is None:
+            state = self._robot_state_client.get_robot_state()
+            self._robot_state_task.cache_state(state)
+        return state
+
     def check_is_powered_on(self):
         """Determine if the robot is powered on or off."""
-        power_state = self._robot_state_client.get_robot_state().power_state
+        power_state = self.get_robot_state().power_state
         self._powered_on = power_state.motor_power_state == power_state.STATE_ON
         return self._powered_on
 
     @try_claim
     def execute_dance(self, data):
         if self._is_licensed_for_choreography:
-            return self._spot_dance.execute_dance(data)
+            return self.spot_dance.execute_dance(data)
         else:
             return False, "Spot is not licensed for choreography"
 
@@ -1263,7 +1715,7 @@ class SpotWrapper:
         self, animation_name: str, animation_file_content: str
     ) -> typing.Tuple[bool, str]:
         if self._is_licensed_for_choreography:
-            return self._spot_dance.upload_animation(
+            return self.spot_dance.upload_animation(
                 animation_name, animation_file_content
             )
         else:
@@ -1271,12 +1723,12 @@ class SpotWrapper:
 
     def list_all_moves(self) -> typing.Tuple[bool, str, typing.List[str]]:
         if self._is_licensed_for_choreography:
-            return self._spot_dance.list_all_moves()
+            return self.spot_dance.list_all_moves()
         else:
             return False, "Spot is not licensed for choreography", []
 
     def list_all_dances(self) -> typing.Tuple[bool, str, typing.List[str]]:
         if self._is_licensed_for_choreography:
-            return self._spot_dance.list_all_dances()
+            return self.spot_dance.list_all_dances()
         else:
             return False, "Spot is not licensed for choreography", []